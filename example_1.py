@@ -7,7 +7,7 @@ class ChillerNotificator(Notificator):
     def check_conditions(self):
         condition = self.update_values["hight_temperature_detector"] > 17.8
         message = "The water temerature is hight!!!!!"
-        return [condition], [message]
+        return [(condition, message)]
 
 
 #image_processor = utils.ImageProcessor() # create ImageProsessor
@@ -1,3 +1,16 @@
-from .telegram import TelegramApi
-from .file_logging import FileLogger
-from .notification import Notificator
\ No newline at end of file
+from .file_logging import BaseFileLogger, FileLogger, LogFormat
+from .change_logging import ChangeFilter, Deadband, reconstruct_rows
+from .columnar_logging import ColumnarLogger, ColumnarLogReader, ColumnType, convert_tsv_log
+from .rollup_logging import RollupAggregator, RollupReader, build_rollups
+from .notification import Notificator
+from .rules import RateOfChange, Range, Rule, RuleNotificator, Stuck, Threshold
+from .telegram import BotApiTransport, RateLimitError, TelegramNotifier, Transport, TransportError
+
+# TelegramApi needs telebot. It is imported on the first access
+
+
+def __getattr__(name: str):
+    if name == "TelegramApi":
+        from .telegram import TelegramApi
+        return TelegramApi
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
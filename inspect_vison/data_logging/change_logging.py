@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from datetime import datetime
+import typing as tp
+
+import numpy as np
+
+TimeColumn = "time"
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """
+    absolute: the change of a number to log it
+    relative: the change of a number relatively to its last logged value to log it
+    A number is logged if its change is more than absolute or more than relative. None disables the band,
+    and without both of them a number is logged on any change. Other values are logged on any change
+    """
+    absolute: float | None = None
+    relative: float | None = None
+
+    def exceeded(self, change: float, last_value: float) -> bool:
+        """
+        :param change: the absolute change of a number since it was logged
+        :param last_value: the last logged value
+        """
+        if self.absolute is None and self.relative is None:
+            return change > 0
+        return (self.absolute is not None and change > self.absolute) or \
+            (self.relative is not None and change > self.relative * abs(last_value))
+
+
+def is_number(value: tp.Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+class ChangeFilter:
+    """
+    Filter of log rows for change-only logging. The value of an object is kept in the row only if it is changed
+    beyond its deadband since it was logged last time. Other values are replaced by None, so rows are sparse.
+    The full row is logged at the first row, at the first row of each day and every heartbeat seconds.
+    So the values at any time are reconstructed by forward fill from the beginning of the day
+    """
+    def __init__(self, names: list[str], deadbands: dict[str, Deadband] | None = None,
+                 default_deadband: Deadband = Deadband(), heartbeat: float | None = 600.0):
+        """
+        :param names: the names of columns. The first one is time
+        :param deadbands: the deadbands of objects by names
+        :param default_deadband: the deadband of objects which are not in deadbands
+        :param heartbeat: the interval in seconds of full rows. None means only the first rows of days are full
+        """
+        self.names = [name for name in names if name != TimeColumn]
+        self.deadbands = {name: (deadbands or {}).get(name, default_deadband) for name in self.names}
+        self.heartbeat = heartbeat
+        self._last_values: dict[str, tp.Any] = {}
+        self._last_full_time: datetime | None = None
+        self.rows_number = 0
+        self.logged_rows = 0
+        self.logged_values = 0
+
+    def _is_changed(self, name: str, value: tp.Any) -> bool:
+        if name not in self._last_values:
+            return True
+        last_value = self._last_values[name]
+        if is_number(value) and is_number(last_value):
+            if np.isnan(value) or np.isnan(last_value):
+                return np.isnan(value) != np.isnan(last_value)
+            return self.deadbands[name].exceeded(abs(value - last_value), last_value)
+        return value != last_value
+
+    def _is_full_row_due(self, row_time: datetime) -> bool:
+        if self._last_full_time is None or row_time.date() != self._last_full_time.date():
+            return True
+        if self.heartbeat is None:
+            return False
+        return (row_time - self._last_full_time).total_seconds() >= self.heartbeat
+
+    def __call__(self, row: dict[str, tp.Any]) -> dict[str, tp.Any] | None:
+        """
+        :param row: the full row with time and values of all objects
+        :return: the sparse row to log or None if nothing should be logged
+        """
+        self.rows_number += 1
+        row_time = row.get(TimeColumn)
+        row_time = row_time if isinstance(row_time, datetime) else datetime.now()
+        full = self._is_full_row_due(row_time)
+        changed = {name: row.get(name) for name in self.names
+                   if full or self._is_changed(name, row.get(name))}
+        if not changed:
+            return None
+        if full:
+            self._last_full_time = row_time
+        self._last_values.update(changed)
+        self.logged_rows += 1
+        self.logged_values += len(changed)
+        sparse_row = {TimeColumn: row.get(TimeColumn, row_time)}
+        sparse_row.update({name: changed.get(name) for name in self.names})
+        return sparse_row
+
+    def statistics(self) -> dict[str, float]:
+        """
+        :return: the numbers of checked rows, logged rows and logged values,
+        and the ratio of logged values to all values
+        """
+        all_values = self.rows_number * len(self.names)
+        return {"rows": self.rows_number, "logged_rows": self.logged_rows, "logged_values": self.logged_values,
+                "ratio": self.logged_values / all_values if all_values else 0.0}
+
+
+def reconstruct_rows(rows: tp.Iterable[dict[str, tp.Any]]) -> tp.Iterator[dict[str, tp.Any]]:
+    """
+    Reconstruct full rows from sparse rows of the change-only log by forward fill.
+    Missing values are None or empty strings, as they are read from tab separated logs by csv.DictReader
+    :param rows: the sparse rows in time order from the beginning of a day
+    :return: the full rows. Values are the last logged values of objects
+    """
+    last_values: dict[str, tp.Any] = {}
+    for row in rows:
+        last_values.update({name: value for name, value in row.items() if value is not None and value != ""})
+        yield {name: last_values.get(name) for name in row}
+
+
+def forward_fill(values: np.ndarray, missing: np.ndarray) -> np.ndarray:
+    """
+    :param values: the column of values
+    :param missing: the mask of missing values
+    :return: the column where each missing value is replaced by the last not missing value before it.
+    Missing values at the beginning stay missing
+    """
+    indices = np.where(missing, 0, np.arange(len(values)))
+    np.maximum.accumulate(indices, out=indices)
+    filled = values[indices]
+    if len(values) and missing[0]:
+        leading = ~np.logical_or.accumulate(~missing)
+        filled[leading] = values[leading]
+    return filled
@@ -0,0 +1,433 @@
+import csv
+from datetime import datetime
+from enum import Enum
+import json
+import os
+from pathlib import Path
+import typing as tp
+
+import numpy as np
+
+from .change_logging import forward_fill
+from .file_logging import BaseFileLogger
+
+ColumnsSuffix = ".columns"
+TimeColumn = "time"
+# Each entry of the sidecar index is one chunk: first time, last time, first row and number of rows
+IndexDtype = np.dtype([("start", "<i8"), ("end", "<i8"), ("row", "<i8"), ("rows", "<i8")])
+MissingBool = 255
+MissingCategory = -1
+# The values of objects in the days when they were not logged, by the kind of numpy dtype
+MissingValues = {"f": np.nan, "b": False, "U": ""}
+
+
+class ColumnType(Enum):
+    Float = "float32"
+    Bool = "bool"
+    Category = "category"
+
+
+ColumnDtypes = {
+    ColumnType.Float: np.dtype("<f4"),
+    ColumnType.Bool: np.dtype("u1"),
+    ColumnType.Category: np.dtype("<i4"),
+}
+
+
+def infer_column_type(value: tp.Any) -> ColumnType:
+    """
+    :param value: the value of an object
+    :return: bool values are Bool, numbers are Float and all others, like digit strings, are Category
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return ColumnType.Bool
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return ColumnType.Float
+    return ColumnType.Category
+
+
+def to_timestamp(moment: datetime | np.datetime64) -> int:
+    """
+    :return: the time in microseconds since epoch
+    """
+    if isinstance(moment, np.datetime64):
+        return int(moment.astype("datetime64[us]").astype(np.int64))
+    return int(np.datetime64(moment, "us").astype(np.int64))
+
+
+class ColumnarLogger(BaseFileLogger):
+    """
+    The logger to typed binary columns. The log of each day is a folder with one raw file per column:
+    time in int64 microseconds, numbers in float32, bool values in uint8 and other values as int32 codes
+    of categories. Each flush appends one chunk to the columns and one entry to the sidecar time index,
+    so the reader finds the rows of a time range without reading the whole columns.
+    Types are inferred from the first logged row, but they can be given explicitly
+    """
+    def __init__(self, subdir_path: str | Path, names: list[str],
+                 column_types: dict[str, ColumnType] | None = None, asynchronous: bool = False,
+                 queue_size: int = 10000, batch_size: int = 1024, flush_interval: float = 10.0,
+                 block: bool = False) -> None:
+        """
+        :param subdir_path: the folder of logs. A new log folder is created each day
+        :param names: the names of columns. The first one must be time
+        :param column_types: the types of columns except time
+        :param asynchronous: write rows in a background thread, so a slow disk does not stall the caller
+        :param queue_size: the maximum number of rows waiting for the writer thread
+        :param batch_size: the maximum number of rows in one chunk
+        :param flush_interval: the maximum time in seconds between chunks
+        :param block: wait for the writer thread if the queue is full. Otherwise, the row is dropped
+        """
+        if names[0] != TimeColumn:
+            raise ValueError(f"The first column must be {TimeColumn}")
+        self.column_types = dict(column_types) if column_types is not None else {}
+        self.categories: dict[str, list[str]] = {}
+        self._codes: dict[str, dict[str, int]] = {}
+        self._rows: list[dict[str, tp.Any]] = []
+        self._log_path: Path | None = None
+        self._log_names: list[str] = list(names)
+        self._rows_number = 0
+        super().__init__(subdir_path, names, asynchronous=asynchronous, queue_size=queue_size,
+                         batch_size=batch_size, flush_interval=flush_interval, block=block)
+
+    def _open(self, date_text: str) -> None:
+        # The folder is created with the first chunk
+        self._log_path = self.subdir_path / f"{date_text}{ColumnsSuffix}"
+        schema = read_schema(self._log_path)
+        if schema is not None:
+            # Continue the existing log of the day with its types and categories.
+            # The objects which are not logged now get missing values, and new objects get them before now
+            self.column_types.update(schema["types"])
+            self.categories = schema["categories"]
+            self._rows_number = schema["rows"]
+            self._log_names = schema["names"] + [name for name in self.names if name not in schema["names"]]
+            repair_log(self._log_path, schema)
+        else:
+            self.categories = {}
+            self._rows_number = 0
+            self._log_names = list(self.names)
+        self._codes = {name: {category: code for code, category in enumerate(categories)}
+                       for name, categories in self.categories.items()}
+
+    def _write_row(self, row: dict[str, tp.Any]) -> None:
+        self._rows.append(row)
+
+    def _encode(self, name: str, values: list[tp.Any]) -> np.ndarray:
+        column_type = self.column_types[name]
+        if column_type is ColumnType.Float:
+            try:
+                return np.array(values, dtype=ColumnDtypes[column_type])
+            except (TypeError, ValueError):
+                pass
+            # Values which are not numbers are missing
+            column = np.empty(len(values), dtype=ColumnDtypes[column_type])
+            for i, value in enumerate(values):
+                try:
+                    column[i] = np.nan if value is None else float(value)
+                except (TypeError, ValueError):
+                    column[i] = np.nan
+            return column
+        if column_type is ColumnType.Bool:
+            return np.array([MissingBool if value is None else bool(value) for value in values],
+                            dtype=ColumnDtypes[column_type])
+        codes = self._codes.setdefault(name, {})
+        categories = self.categories.setdefault(name, [])
+        column = np.empty(len(values), dtype=ColumnDtypes[column_type])
+        for i, value in enumerate(values):
+            if value is None:
+                column[i] = MissingCategory
+                continue
+            value = str(value)
+            if value not in codes:
+                codes[value] = len(categories)
+                categories.append(value)
+            column[i] = codes[value]
+        return column
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        times = np.array([to_timestamp(row[TimeColumn]) if row.get(TimeColumn) is not None
+                          else to_timestamp(datetime.now()) for row in rows], dtype=np.int64)
+        columns = {TimeColumn: times}
+        for name in self._log_names[1:]:
+            values = [row.get(name) for row in rows]
+            if name not in self.column_types:
+                first = next((value for value in values if value is not None), None)
+                self.column_types[name] = infer_column_type(first)
+            columns[name] = self._encode(name, values)
+
+        os.makedirs(self._log_path, exist_ok=True)
+        for name, column in columns.items():
+            column_path = self._log_path / f"{name}.bin"
+            logged_rows = column_path.stat().st_size // column.itemsize if column_path.exists() else 0
+            with open(column_path, "ab") as file:
+                if name != TimeColumn and logged_rows < self._rows_number:
+                    # The object is added in the middle of the day
+                    missing = get_missing_code(self.column_types[name])
+                    np.full(self._rows_number - logged_rows, missing, dtype=column.dtype).tofile(file)
+                column.tofile(file)
+        index_entry = np.array([(times.min(), times.max(), self._rows_number, len(rows))], dtype=IndexDtype)
+        with open(self._log_path / "index.bin", "ab") as file:
+            index_entry.tofile(file)
+        self._rows_number += len(rows)
+        write_schema(self._log_path, self._log_names, self.column_types, self.categories, self._rows_number)
+
+    def _close_file(self) -> None:
+        pass
+
+
+def write_schema(log_path: Path, names: list[str], column_types: dict[str, ColumnType],
+                 categories: dict[str, list[str]], rows: int) -> None:
+    schema = {
+        "names": names,
+        "types": {name: column_type.value for name, column_type in column_types.items()},
+        "categories": categories,
+        "rows": rows,
+    }
+    # The schema is replaced atomically, so the reader never sees a partial file
+    temporary_path = log_path / "schema.json.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(schema, file)
+    os.replace(temporary_path, log_path / "schema.json")
+
+
+def get_missing_code(column_type: ColumnType) -> float | int:
+    """
+    :return: the encoded missing value of the column type
+    """
+    if column_type is ColumnType.Float:
+        return np.nan
+    if column_type is ColumnType.Bool:
+        return MissingBool
+    return MissingCategory
+
+
+def repair_log(log_path: Path, schema: dict[str, tp.Any]) -> None:
+    """
+    Cut the columns and the index to the rows of the schema. They are longer if the program was stopped
+    after the chunk was appended, but before the schema was replaced
+    :param log_path: the log folder of one day
+    :param schema: the schema from read_schema
+    """
+    rows = schema["rows"]
+    dtypes = {TimeColumn: np.dtype("<i8")}
+    dtypes.update({name: ColumnDtypes[column_type] for name, column_type in schema["types"].items()})
+    for name, dtype in dtypes.items():
+        column_path = log_path / f"{name}.bin"
+        if column_path.exists() and column_path.stat().st_size > rows * dtype.itemsize:
+            os.truncate(column_path, rows * dtype.itemsize)
+    index_path = log_path / "index.bin"
+    if index_path.exists():
+        index = np.fromfile(index_path, dtype=IndexDtype)
+        complete = index["row"] + index["rows"] <= rows
+        if not complete.all() or index_path.stat().st_size % IndexDtype.itemsize:
+            index[complete].tofile(index_path)
+
+
+def read_schema(log_path: Path) -> dict[str, tp.Any] | None:
+    schema_path = Path(log_path) / "schema.json"
+    if not schema_path.exists():
+        return None
+    with open(schema_path) as file:
+        schema = json.load(file)
+    schema["types"] = {name: ColumnType(value) for name, value in schema["types"].items()}
+    return schema
+
+
+class ColumnarLogReader:
+    """
+    Reader of logs of ColumnarLogger. Only the chunks which overlap the time range are read,
+    and only the columns of the requested objects
+    """
+    def __init__(self, path: str | Path):
+        """
+        :param path: the folder of logs or the log folder of one day
+        """
+        path = Path(path)
+        if path.name.endswith(ColumnsSuffix):
+            self.log_paths = [path]
+        else:
+            self.log_paths = sorted(path.glob(f"*{ColumnsSuffix}"), key=self._get_date)
+
+    @staticmethod
+    def _get_date(log_path: Path) -> tuple[int, ...]:
+        return tuple(int(part) for part in log_path.name[:-len(ColumnsSuffix)].split("_"))
+
+    def names(self) -> list[str]:
+        """
+        :return: the names of all logged objects
+        """
+        names = []
+        for log_path in self.log_paths:
+            schema = read_schema(log_path)
+            if schema is not None:
+                names.extend(name for name in schema["names"][1:] if name not in names)
+        return names
+
+    def _read_day(self, log_path: Path, names: tp.Sequence[str], start: int | None, end: int | None,
+                  fill: bool = False) -> dict[str, np.ndarray] | None:
+        schema = read_schema(log_path)
+        if schema is None:
+            return None
+        # Only chunks described by the schema are complete
+        index = np.fromfile(log_path / "index.bin", dtype=IndexDtype)
+        index = index[index["row"] + index["rows"] <= schema["rows"]]
+        selected = np.ones(len(index), dtype=bool)
+        if start is not None:
+            selected &= index["end"] >= start
+        if end is not None:
+            selected &= index["start"] < end
+        if not selected.any():
+            return None
+        # Sparse logs are filled from the full row at the beginning of the day
+        first_row = 0 if fill else int(index["row"][selected].min())
+        last_row = int((index["row"] + index["rows"])[selected].max())
+
+        def read_column(name: str, dtype: np.dtype, missing: float | int = 0) -> np.ndarray:
+            column_path = log_path / f"{name}.bin"
+            # The columns of objects added in the middle of the day by older versions have no rows before them
+            logged_rows = column_path.stat().st_size // dtype.itemsize if column_path.exists() else 0
+            count = max(min(last_row, logged_rows) - first_row, 0)
+            column = np.fromfile(column_path, dtype=dtype, count=count, offset=first_row * dtype.itemsize) \
+                if count else np.empty(0, dtype=dtype)
+            if count < last_row - first_row:
+                column = np.concatenate([column, np.full(last_row - first_row - count, missing, dtype=dtype)])
+            return column
+
+        times = read_column(TimeColumn, np.dtype("<i8"))
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times < end
+        result = {TimeColumn: times[mask].astype("datetime64[us]")}
+        for name in names:
+            if name not in schema["types"]:
+                continue
+            column_type = schema["types"][name]
+            values = read_column(name, ColumnDtypes[column_type], get_missing_code(column_type))
+            if fill:
+                values = forward_fill(values, is_missing(values, column_type))
+            values = values[mask]
+            result[name] = decode_column(values, column_type, schema["categories"].get(name, []))
+        return result
+
+    def read(self, names: tp.Sequence[str] | None = None, start: datetime | None = None,
+             end: datetime | None = None, fill: bool = False) -> dict[str, np.ndarray]:
+        """
+        :param names: the names of objects. None means all objects
+        :param start: the start of the time range, inclusive. None means from the beginning
+        :param end: the end of the time range, exclusive. None means to the end
+        :return: time in datetime64[us] and values of objects: float32 for numbers with nan for missing values,
+        bool for bool values and str for categories with "" for missing values.
+        Objects which are absent in some days get missing values there
+        :param fill: reconstruct the values of change-only logs: each missing value is replaced
+        by the last logged value of the object in the day
+        """
+        names = self.names() if names is None else list(names)
+        start_time = None if start is None else to_timestamp(start)
+        end_time = None if end is None else to_timestamp(end)
+        days = []
+        for log_path in self.log_paths:
+            day = self._read_day(log_path, names, start_time, end_time, fill)
+            if day is not None and len(day[TimeColumn]):
+                days.append(day)
+        result = {TimeColumn: np.concatenate([day[TimeColumn] for day in days]) if days
+                  else np.empty(0, dtype="datetime64[us]")}
+        for name in names:
+            present = [day[name] for day in days if name in day]
+            if not present:
+                result[name] = np.full(len(result[TimeColumn]), np.nan, dtype=np.float32)
+                continue
+            missing = MissingValues[present[0].dtype.kind]
+            parts = [day[name] if name in day else np.full(len(day[TimeColumn]), missing, dtype=present[0].dtype)
+                     for day in days]
+            result[name] = np.concatenate(parts)
+        return result
+
+
+def is_missing(values: np.ndarray, column_type: ColumnType) -> np.ndarray:
+    """
+    :param values: the encoded column
+    :return: the mask of missing values
+    """
+    if column_type is ColumnType.Float:
+        return np.isnan(values)
+    if column_type is ColumnType.Bool:
+        return values == MissingBool
+    return values == MissingCategory
+
+
+def decode_column(values: np.ndarray, column_type: ColumnType, categories: list[str]) -> np.ndarray:
+    """
+    :return: the values in numpy types. Missing bool values are False
+    """
+    if column_type is ColumnType.Float:
+        return values
+    if column_type is ColumnType.Bool:
+        return values == 1
+    lookup = np.array(categories + [""], dtype=str)
+    return lookup[np.where(values == MissingCategory, len(categories), values)]
+
+
+def parse_tsv_value(text: str) -> tp.Any:
+    if text == "":
+        return None
+    if text in ("True", "False"):
+        return text == "True"
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_tsv_time(text: str, date: datetime | None) -> datetime:
+    """
+    :param text: time in the format of FileLogger or hours_minutes_seconds like 18_50_20
+    :param date: the date for the times without date
+    """
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        hours, minutes, seconds = (int(part) for part in text.split("_"))
+        date = datetime.now() if date is None else date
+        return date.replace(hour=hours, minute=minutes, second=seconds, microsecond=0)
+
+
+def convert_tsv_log(tsv_path: str | Path, output_path: str | Path, batch_size: int = 4096) -> None:
+    """
+    Convert a tab separated log of FileLogger to the columnar format
+    :param tsv_path: the path to the log. Its name is the date like 2024_5_6
+    :param output_path: the folder of columnar logs
+    :param batch_size: the number of rows in one chunk
+    """
+    tsv_path = Path(tsv_path)
+    try:
+        date = datetime(*(int(part) for part in tsv_path.name.split("_")))
+    except (TypeError, ValueError):
+        date = None
+    with open(tsv_path, newline="") as file:
+        reader = csv.DictReader(file, delimiter="\t")
+        rows = [row for row in reader]
+        names = list(reader.fieldnames or [])
+    if not names or names[0] != TimeColumn:
+        raise ValueError(f"{tsv_path} is not a log: the first column must be {TimeColumn}")
+
+    # The type of each column is the common type of all its values
+    parsed_rows = []
+    column_types = {}
+    for row in rows:
+        parsed_row = {TimeColumn: parse_tsv_time(row[TimeColumn], date)}
+        parsed_row.update({name: parse_tsv_value(row[name]) for name in names[1:]})
+        parsed_rows.append(parsed_row)
+    for name in names[1:]:
+        types = {infer_column_type(row[name]) for row in parsed_rows if row[name] is not None}
+        column_types[name] = types.pop() if len(types) == 1 else ColumnType.Category
+
+    os.makedirs(output_path, exist_ok=True)
+    logger = ColumnarLogger(output_path, names, column_types=column_types, batch_size=batch_size,
+                            flush_interval=float("inf"))
+    for row in parsed_rows:
+        logger.write_results(row)
+    logger.close()
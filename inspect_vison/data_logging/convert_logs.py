@@ -0,0 +1,16 @@
+import argparse
+
+from .columnar_logging import convert_tsv_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert tab separated logs to the columnar format")
+    parser.add_argument("logs", nargs="+", help="paths to tab separated logs")
+    parser.add_argument("output", help="the folder of columnar logs")
+    arguments = parser.parse_args()
+    for log in arguments.logs:
+        convert_tsv_log(log, arguments.output)
+
+
+if __name__ == "__main__":
+    main()
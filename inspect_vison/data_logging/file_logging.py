@@ -1,27 +1,87 @@
 import typing as tp
+from abc import ABC, abstractmethod
 import csv
 import os
 from datetime import datetime
+from enum import Enum
+import queue
+import threading
+import time
 import warnings
 from pathlib import Path
 
-class FileLogger:
-    def __init__(self, subdir_path: str | Path, names: list[str]) -> None:
+
+class LogFormat(Enum):
+    """
+    Tsv is a tab separated text file per day. Columnar is a folder of typed binary columns per day
+    """
+    Tsv = 0
+    Columnar = 1
+
+
+class BaseFileLogger(ABC):
+    """
+    The base of file loggers. It writes rows in the caller thread or in a background thread,
+    flushes them by size and time thresholds, and collects backpressure statistics.
+    Subclasses implement the format of files
+    """
+    def __init__(self, subdir_path: str | Path, names: list[str], asynchronous: bool = False,
+                 queue_size: int = 10000, batch_size: int = 256, flush_interval: float = 1.0,
+                 block: bool = True) -> None:
+        """
+        :param subdir_path: the folder of log files. A new file is created each day
+        :param names: the names of columns
+        :param asynchronous: write rows in a background thread, so a slow disk does not stall the caller
+        :param queue_size: the maximum number of rows waiting for the writer thread
+        :param batch_size: the rows are flushed to disk when this number of rows is written
+        :param flush_interval: the rows are flushed to disk when this time in seconds is passed since the last flush
+        :param block: wait for the writer thread if the queue is full, so no rows are lost.
+        Otherwise, the row is dropped and it is warned on the first dropped row
+        """
         self.subdir_path = self._get_subdir(subdir_path)
         self.names = names
         self.current_date = self._get_date_text()
-        file_path = self.subdir_path / Path(self.current_date)
-        self._file = open(file_path, "w", newline="")
-        self.writer = self._create_get_writer()
-
-    def _create_get_writer(self) -> csv.DictWriter:
-        file_path = self.subdir_path / self.current_date
-        if not self._file.closed:
-            self._file.close()
-        self._file = open(file_path, "w", newline="")
-        writer = csv.DictWriter(self._file, delimiter="\t", fieldnames = self.names)
-        writer.writeheader()
-        return writer
+        self._open(self.current_date)
+
+        self.asynchronous = asynchronous
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block = block
+        self._unflushed = 0
+        self._flush_time = time.perf_counter()
+
+        # Backpressure statistics
+        self.written_rows = 0
+        self.dropped_rows = 0
+        self.blocked_time = 0.0
+        self.max_queue_size = 0
+        self.error: Exception | None = None
+
+        self._queue: queue.Queue | None = None
+        self._thread: threading.Thread | None = None
+        if asynchronous:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._write_loop, name="file_logger", daemon=True)
+            self._thread.start()
+
+    @abstractmethod
+    def _open(self, date_text: str) -> None:
+        """
+        Open the log of the given day
+        """
+        pass
+
+    @abstractmethod
+    def _write_row(self, row: dict[str, tp.Any]) -> None:
+        pass
+
+    @abstractmethod
+    def _flush(self) -> None:
+        pass
+
+    @abstractmethod
+    def _close_file(self) -> None:
+        pass
 
     def _get_subdir(self, subdir_path: str | Path) -> str | Path:
         if not os.path.isdir(subdir_path):
@@ -29,24 +89,134 @@ class FileLogger:
             current_working_dir = Path(os.getcwd())
             directory_name = Path("inspect_vision")
             subdir_path = current_working_dir/directory_name
-            os.makedirs(subdir_path)
+            os.makedirs(subdir_path, exist_ok=True)
         return Path(subdir_path)
 
-    def _get_date_text(self) -> str:
-        today = datetime.now()
+    def _get_date_text(self, today: datetime | None = None) -> str:
+        today = datetime.now() if today is None else today
         return f"{today.year}_{today.month}_{today.day}"
 
-    def _data_updater(self):
-        today = self._get_date_text()
+    def _data_updater(self, today: datetime | None = None):
+        """
+        :param today: the time of the row. None means now
+        """
+        today = self._get_date_text(today)
         if today != self.current_date:
+            self._flush()
+            self._close_file()
             self.current_date = today
-            self.writer = self._create_get_writer()
+            self._open(today)
+
+    def _write_rows(self, rows: tp.Iterable[dict[str, tp.Any]]) -> None:
+        for row in rows:
+            row_time = row.get("time")
+            self._data_updater(row_time if isinstance(row_time, datetime) else None)
+            self._write_row(row)
+            self._unflushed += 1
+            self.written_rows += 1
+
+    def _flush_if_needed(self, force: bool = False) -> None:
+        if not self._unflushed:
+            return
+        if force or self._unflushed >= self.batch_size or \
+                time.perf_counter() - self._flush_time >= self.flush_interval:
+            self._flush()
+            self._unflushed = 0
+            self._flush_time = time.perf_counter()
+
+    def _write_loop(self) -> None:
+        """
+        The writer thread. It takes all waiting rows at once and writes them as one batch
+        """
+        stopped = False
+        while not stopped:
+            try:
+                rows = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                rows = []
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if rows and rows[-1] is None:
+                stopped = True
+            rows = [row for row in rows if row is not None]
+            try:
+                self._write_rows(rows)
+                self._flush_if_needed(force=stopped)
+            except Exception as error:
+                self.error = error
+                warnings.warn(f"The file logger can not write rows: {error}")
+                stopped = True
 
     def write_results(self, update_data: dict[str, tp.Any]):
-        self._data_updater()
-        self.writer.writerow(update_data)
+        if not self.asynchronous:
+            self._write_rows([update_data])
+            self._flush_if_needed()
+            return
+        if self.error is not None:
+            self.dropped_rows += 1
+            return
+        try:
+            self._queue.put_nowait(update_data)
+        except queue.Full:
+            if not self.block:
+                if not self.dropped_rows:
+                    warnings.warn("The queue of the file logger is full, rows are dropped until the disk catches up")
+                self.dropped_rows += 1
+                return
+            start = time.perf_counter()
+            # The writer can stop on an error while the caller waits, then the row is dropped
+            while True:
+                try:
+                    self._queue.put(update_data, timeout=self.flush_interval)
+                    break
+                except queue.Full:
+                    if self.error is not None:
+                        self.dropped_rows += 1
+                        break
+            self.blocked_time += time.perf_counter() - start
+        self.max_queue_size = max(self.max_queue_size, self._queue.qsize())
+
+    def statistics(self) -> dict[str, float]:
+        """
+        :return: the numbers of written, dropped and waiting rows, the maximum size of the queue,
+        and the total time in seconds the caller waited for the writer thread
+        """
+        return {"written": self.written_rows, "dropped": self.dropped_rows,
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "max_queued": self.max_queue_size, "blocked_time": self.blocked_time}
 
     def close(self):
-        self._file.close()
+        """
+        Write all waiting rows, flush and close the file
+        """
+        if self._thread is not None:
+            if self._thread.is_alive():
+                self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.current_date is not None:
+            self._flush_if_needed(force=True)
+            self._close_file()
+            self.current_date = None
 
 
+class FileLogger(BaseFileLogger):
+    """
+    The logger to tab separated text files named by the day
+    """
+    def _open(self, date_text: str) -> None:
+        self._file = open(self.subdir_path / date_text, "w", newline="")
+        self.writer = csv.DictWriter(self._file, delimiter="\t", fieldnames = self.names)
+        self.writer.writeheader()
+
+    def _write_row(self, row: dict[str, tp.Any]) -> None:
+        self.writer.writerow(row)
+
+    def _flush(self) -> None:
+        self._file.flush()
+
+    def _close_file(self) -> None:
+        self._file.close()
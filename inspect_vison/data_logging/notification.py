@@ -4,7 +4,7 @@ import warnings
 
 class Notificator(ABC):
     def __init__(self, update_values: dict[str, tp.Any] | None = None):
-        self.__update_values = update_values
+        self.update_values = update_values
         self.updated_flag = False
 
     def update(self, update_values):
@@ -13,10 +13,13 @@ class Notificator(ABC):
 
     @property
     def value(self):
-        return self.__update_values
+        return self.update_values
 
     @abstractmethod
     def check_conditions(self) -> list[tuple[bool, str]]:
+        """
+        :return: the pairs of condition and message. The message is sent if its condition is True
+        """
         pass
 
     def aware(self):
@@ -0,0 +1,282 @@
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import queue
+import threading
+import typing as tp
+import warnings
+
+import numpy as np
+
+from .columnar_logging import ColumnarLogReader, TimeColumn, to_timestamp
+
+RollupsFolder = "rollups"
+# One record is one bucket of one object: start time in microseconds, min, max, sum and number of values
+RollupDtype = np.dtype([("start", "<i8"), ("min", "<f8"), ("max", "<f8"), ("sum", "<f8"), ("count", "<i8")])
+Minute = 60
+Hour = 60 * Minute
+Day = 24 * Hour
+MicrosecondsPerSecond = 1_000_000
+
+
+def to_number(value: tp.Any) -> float:
+    """
+    :return: the value as float. bool values are 0 and 1, so their mean is the fraction of time they are True.
+    Values which are not numbers are nan
+    """
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def get_resolution_path(path: Path, resolution: int) -> Path:
+    return path / RollupsFolder / f"{resolution}s"
+
+
+class RollupAggregator:
+    """
+    Incremental min, max, mean and count of objects in time buckets of several resolutions.
+    Each row updates the open buckets, and a bucket is appended to the side files when the rows move past it.
+    The file of an object and a resolution is a sorted array of RollupDtype records,
+    so RollupReader reads any range of months without raw logs.
+    Buckets are aligned to the local midnight like the names of log files.
+    Closed buckets are appended by a background thread, so the capture loop does not open files
+    at the borders of buckets
+    """
+    DefaultResolutions = (Minute, Hour, Day)
+
+    def __init__(self, subdir_path: str | Path, names: list[str], resolutions: tp.Sequence[int] = DefaultResolutions,
+                 asynchronous: bool = True):
+        """
+        :param subdir_path: the folder of logs. The rollups are in its subfolder rollups
+        :param names: the names of columns. The first one is time
+        :param resolutions: the durations of buckets in seconds. A day must be a multiple of each of them
+        :param asynchronous: append closed buckets in a background thread. Otherwise, they are appended
+        in the caller thread
+        """
+        if any(resolution <= 0 or Day % resolution for resolution in resolutions):
+            raise ValueError("A day must be a multiple of each resolution")
+        self.path = Path(subdir_path)
+        self.names = [name for name in names if name != TimeColumn]
+        self.resolutions = list(resolutions)
+        self._bucket_sizes = np.array(self.resolutions, dtype=np.int64) * MicrosecondsPerSecond
+        for resolution in self.resolutions:
+            os.makedirs(get_resolution_path(self.path, resolution), exist_ok=True)
+        with open(self.path / RollupsFolder / "schema.json", "w") as file:
+            json.dump({"names": self.names, "resolutions": self.resolutions}, file)
+
+        shape = (len(self.resolutions), len(self.names))
+        self._starts: np.ndarray | None = None
+        self._min = np.full(shape, np.inf)
+        self._max = np.full(shape, -np.inf)
+        self._sum = np.zeros(shape)
+        self._count = np.zeros(shape, dtype=np.int64)
+        self.written_buckets = 0
+        self.error: Exception | None = None
+
+        # Buckets are closed a few times per minute at most, so the queue is not bounded
+        self._queue: queue.Queue | None = None
+        self._thread: threading.Thread | None = None
+        if asynchronous:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._write_loop, name="rollup_writer", daemon=True)
+            self._thread.start()
+
+    def _reset(self, resolution_index: int) -> None:
+        self._min[resolution_index] = np.inf
+        self._max[resolution_index] = -np.inf
+        self._sum[resolution_index] = 0.0
+        self._count[resolution_index] = 0
+
+    def _write_records(self, resolution_index: int, columns: np.ndarray, records: np.ndarray) -> None:
+        resolution_path = get_resolution_path(self.path, self.resolutions[resolution_index])
+        for column, record in zip(columns, records):
+            with open(resolution_path / f"{self.names[column]}.bin", "ab") as file:
+                record.tofile(file)
+        self.written_buckets += len(records)
+
+    def _write_loop(self) -> None:
+        """
+        The writer thread. It appends closed buckets until it gets None
+        """
+        while True:
+            bucket = self._queue.get()
+            if bucket is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self._write_records(*bucket)
+            except Exception as error:
+                self.error = error
+                warnings.warn(f"The rollup aggregator can not write buckets: {error}")
+
+    def _close_bucket(self, resolution_index: int) -> None:
+        """
+        Pass the records of the bucket to the writer and start a new bucket
+        """
+        counts = self._count[resolution_index]
+        columns = np.flatnonzero(counts)
+        records = np.empty(len(columns), dtype=RollupDtype)
+        records["start"] = self._starts[resolution_index]
+        records["min"] = self._min[resolution_index, columns]
+        records["max"] = self._max[resolution_index, columns]
+        records["sum"] = self._sum[resolution_index, columns]
+        records["count"] = counts[columns]
+        self._reset(resolution_index)
+        if not len(records):
+            return
+        if self._queue is None:
+            self._write_records(resolution_index, columns, records)
+        else:
+            self._queue.put((resolution_index, columns, records))
+
+    def update(self, row: dict[str, tp.Any]) -> None:
+        """
+        :param row: time and values of objects. Rows must be in time order
+        """
+        row_time = row.get(TimeColumn)
+        timestamp = to_timestamp(row_time if isinstance(row_time, datetime) else datetime.now())
+        starts = timestamp - timestamp % self._bucket_sizes
+        if self._starts is None:
+            self._starts = starts
+        for resolution_index in np.flatnonzero(starts != self._starts):
+            self._close_bucket(resolution_index)
+        self._starts = starts
+
+        values = np.array([to_number(row.get(name)) for name in self.names])
+        valid = ~np.isnan(values)
+        np.fmin(self._min, values, out=self._min)
+        np.fmax(self._max, values, out=self._max)
+        self._sum += np.where(valid, values, 0.0)
+        self._count += valid
+
+    def close(self) -> None:
+        """
+        Write the open buckets and wait for the writer thread.
+        If the program is started again within them, the reader merges the parts
+        """
+        if self._starts is not None:
+            for resolution_index in range(len(self.resolutions)):
+                self._close_bucket(resolution_index)
+            self._starts = None
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class RollupReader:
+    """
+    Reader of rollups of RollupAggregator
+    """
+    def __init__(self, path: str | Path):
+        """
+        :param path: the folder of logs
+        """
+        self.path = Path(path)
+        with open(self.path / RollupsFolder / "schema.json") as file:
+            schema = json.load(file)
+        self.resolutions = sorted(schema["resolutions"])
+
+    def names(self, resolution: int | None = None) -> list[str]:
+        """
+        :return: the names of objects with rollups
+        """
+        resolution = self.resolutions[0] if resolution is None else resolution
+        return sorted(path.stem for path in get_resolution_path(self.path, resolution).glob("*.bin"))
+
+    def _get_source_resolution(self, resolution: int) -> int:
+        sources = [source for source in self.resolutions if resolution % source == 0]
+        if not sources:
+            raise ValueError(f"The resolution must be a multiple of one of {self.resolutions}")
+        return max(sources)
+
+    def read(self, name: str, resolution: int = Hour, start: datetime | None = None,
+             end: datetime | None = None) -> dict[str, np.ndarray]:
+        """
+        :param name: the name of an object
+        :param resolution: the duration of buckets in seconds. It must be a multiple of one of the stored
+        resolutions. The buckets are combined from the largest of them
+        :param start: the start of the time range, inclusive. None means from the beginning
+        :param end: the end of the time range, exclusive. None means to the end
+        :return: start times of buckets in datetime64[us], and min, max, mean and count of values in them
+        """
+        source = self._get_source_resolution(resolution)
+        file_path = get_resolution_path(self.path, source) / f"{name}.bin"
+        if file_path.exists() and file_path.stat().st_size >= RollupDtype.itemsize:
+            records = np.memmap(file_path, dtype=RollupDtype, mode="r",
+                                shape=(file_path.stat().st_size // RollupDtype.itemsize,))
+        else:
+            records = np.empty(0, dtype=RollupDtype)
+        # The records are in time order, so the range is found by binary search and only it is read from disk
+        first = 0 if start is None else np.searchsorted(records["start"], to_timestamp(start), side="left")
+        last = len(records) if end is None else np.searchsorted(records["start"], to_timestamp(end), side="left")
+        records = np.array(records[first: last])
+
+        bucket_size = resolution * MicrosecondsPerSecond
+        bucket_starts = records["start"] - records["start"] % bucket_size
+        starts, borders = np.unique(bucket_starts, return_index=True)
+        if len(starts) == len(records):
+            minimum, maximum, total, count = records["min"], records["max"], records["sum"], records["count"]
+        else:
+            minimum = np.minimum.reduceat(records["min"], borders)
+            maximum = np.maximum.reduceat(records["max"], borders)
+            total = np.add.reduceat(records["sum"], borders)
+            count = np.add.reduceat(records["count"], borders)
+        return {TimeColumn: starts.astype("datetime64[us]"), "min": minimum, "max": maximum,
+                "mean": total / np.maximum(count, 1), "count": count}
+
+
+def aggregate(times: np.ndarray, values: np.ndarray, resolution: int) -> np.ndarray:
+    """
+    :param times: the times of values in datetime64 in time order
+    :param values: the values of an object. nan values are skipped
+    :param resolution: the duration of buckets in seconds
+    :return: the records of buckets with values
+    """
+    timestamps = times.astype("datetime64[us]").astype(np.int64)
+    valid = ~np.isnan(values)
+    timestamps, values = timestamps[valid], values[valid]
+    bucket_size = resolution * MicrosecondsPerSecond
+    starts, borders = np.unique(timestamps - timestamps % bucket_size, return_index=True)
+    records = np.empty(len(starts), dtype=RollupDtype)
+    if not len(starts):
+        return records
+    records["start"] = starts
+    records["min"] = np.minimum.reduceat(values, borders)
+    records["max"] = np.maximum.reduceat(values, borders)
+    records["sum"] = np.add.reduceat(values, borders)
+    records["count"] = np.diff(np.append(borders, len(values)))
+    return records
+
+
+def build_rollups(log_path: str | Path, resolutions: tp.Sequence[int] = RollupAggregator.DefaultResolutions) -> None:
+    """
+    Compute rollups of existing columnar logs. The existing rollups of these resolutions are replaced
+    :param log_path: the folder of columnar logs
+    :param resolutions: the durations of buckets in seconds
+    """
+    log_path = Path(log_path)
+    reader = ColumnarLogReader(log_path)
+    names = reader.names()
+    RollupAggregator(log_path, [TimeColumn] + names, resolutions, asynchronous=False)
+    for resolution in resolutions:
+        for file_path in get_resolution_path(log_path, resolution).glob("*.bin"):
+            os.remove(file_path)
+    for day_path in reader.log_paths:
+        # Sparse rows of change-only logs are filled, so missing bool values are not taken as False
+        data = ColumnarLogReader(day_path).read(names, fill=True)
+        for name in names:
+            values = data[name]
+            if values.dtype.kind == "U":
+                values = np.array([to_number(value) for value in values])
+            values = values.astype(np.float64)
+            for resolution in resolutions:
+                records = aggregate(data[TimeColumn], values, resolution)
+                with open(get_resolution_path(log_path, resolution) / f"{name}.bin", "ab") as file:
+                    records.tofile(file)
@@ -0,0 +1,193 @@
+from abc import ABC, abstractmethod
+from dataclasses import KW_ONLY, dataclass
+import time
+import typing as tp
+
+import numpy as np
+
+from .notification import Notificator
+from .rollup_logging import to_number
+
+
+@dataclass(frozen=True)
+class Rule(ABC):
+    """
+    The base of rules. The condition is checked on the value of the object with the given name.
+    hold: the alarm is raised only if the condition is true for this time in seconds
+    hysteresis: the alarm is cleared only when the checked quantity is back by this margin behind the limit,
+    so noise near the limit does not switch it on and off
+    message: the text of the alarm. It can contain {name} and {value}. None means the default text
+    """
+    name: str
+    _: KW_ONLY
+    hold: float = 0.0
+    hysteresis: float = 0.0
+    message: str | None = None
+
+    @abstractmethod
+    def limits(self) -> tuple[float, float]:
+        """
+        :return: the lower and upper limits of the checked quantity. The alarm is raised outside them
+        """
+        pass
+
+    @abstractmethod
+    def describe(self, value: float) -> str:
+        """
+        :return: the default text of the alarm
+        """
+        pass
+
+    def get_message(self, value: float) -> str:
+        if self.message is None:
+            return self.describe(value)
+        return self.message.format(name=self.name, value=value)
+
+
+@dataclass(frozen=True)
+class Threshold(Rule):
+    """
+    The alarm is raised when the value is above or below the given limit
+    """
+    above: float | None = None
+    below: float | None = None
+
+    def limits(self) -> tuple[float, float]:
+        return (-np.inf if self.below is None else self.below), (np.inf if self.above is None else self.above)
+
+    def describe(self, value: float) -> str:
+        # With hysteresis or hold, the value can be back within the limit when the alarm is raised
+        if self.above is not None and (self.below is None or value > self.below):
+            return f"{self.name} is {value:g}, above {self.above:g}"
+        return f"{self.name} is {value:g}, below {self.below:g}"
+
+
+@dataclass(frozen=True)
+class Range(Rule):
+    """
+    The alarm is raised when the value is out of the range [low, high]
+    """
+    low: float = -np.inf
+    high: float = np.inf
+
+    def limits(self) -> tuple[float, float]:
+        return self.low, self.high
+
+    def describe(self, value: float) -> str:
+        return f"{self.name} is {value:g}, out of range [{self.low:g}, {self.high:g}]"
+
+
+@dataclass(frozen=True)
+class RateOfChange(Rule):
+    """
+    The alarm is raised when the value changes faster than max_rate per second between evaluations
+    """
+    max_rate: float = np.inf
+
+    def limits(self) -> tuple[float, float]:
+        return -np.inf, self.max_rate
+
+    def describe(self, value: float) -> str:
+        return f"{self.name} changes too fast, it is {value:g} now"
+
+
+@dataclass(frozen=True)
+class Stuck(Rule):
+    """
+    The alarm is raised when the value does not change by more than tolerance for duration seconds
+    """
+    duration: float = np.inf
+    tolerance: float = 0.0
+
+    def limits(self) -> tuple[float, float]:
+        return -np.inf, self.duration
+
+    def describe(self, value: float) -> str:
+        return f"{self.name} is stuck at {value:g} for {self.duration:g} s"
+
+
+class RuleNotificator(Notificator):
+    """
+    Notificator defined by rules instead of code. The rules are compiled into arrays, so all of them are
+    evaluated by a few numpy operations on the vector of values. Each rule checks one quantity against limits:
+    the value for Threshold and Range, the rate of change for RateOfChange and the time without changes
+    for Stuck. Messages are sent once when an alarm is raised, not on every evaluation
+    """
+    def __init__(self, rules: tp.Sequence[Rule], every: float = 1.0):
+        """
+        :param rules: the rules
+        :param every: the time in seconds between evaluations. The values between them are not checked
+        """
+        super().__init__()
+        self.rules = list(rules)
+        self.every = every
+        self.names = list(dict.fromkeys(rule.name for rule in self.rules))
+        name_index = {name: i for i, name in enumerate(self.names)}
+        self._index = np.array([name_index[rule.name] for rule in self.rules], dtype=np.intp)
+        limits = np.array([rule.limits() for rule in self.rules], dtype=np.float64).reshape(-1, 2)
+        self._lower, self._upper = limits[:, 0], limits[:, 1]
+        self._hysteresis = np.array([rule.hysteresis for rule in self.rules], dtype=np.float64)
+        self._hold = np.array([rule.hold for rule in self.rules], dtype=np.float64)
+        self._is_rate = np.array([isinstance(rule, RateOfChange) for rule in self.rules])
+        self._is_stuck = np.array([isinstance(rule, Stuck) for rule in self.rules])
+        self._tolerance = np.array([getattr(rule, "tolerance", 0.0) for rule in self.rules], dtype=np.float64)
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forget the history of values and clear all alarms
+        """
+        rules_number = len(self.rules)
+        self._evaluation_time = -np.inf
+        self._previous_values: np.ndarray | None = None
+        self._stuck_values = np.full(rules_number, np.nan)
+        self._stuck_since = np.zeros(rules_number)
+        self._condition = np.zeros(rules_number, dtype=bool)
+        self._true_since = np.zeros(rules_number)
+        self.active = np.zeros(rules_number, dtype=bool)
+
+    def _get_vector(self, update_values: dict[str, tp.Any]) -> np.ndarray:
+        return np.array([to_number(update_values.get(name)) for name in self.names], dtype=np.float64)
+
+    def evaluate(self, update_values: dict[str, tp.Any], now: float) -> list[tuple[Rule, float]]:
+        """
+        :param update_values: the values of objects by names
+        :param now: the time in seconds
+        :return: the rules whose alarms are raised now with the values of their objects
+        """
+        values = self._get_vector(update_values)
+        rule_values = values[self._index]
+        quantity = rule_values.copy()
+
+        if self._previous_values is not None:
+            rates = np.abs(rule_values - self._previous_values[self._index]) / max(now - self._evaluation_time, 1e-9)
+        else:
+            rates = np.full(len(self.rules), np.nan)
+        quantity[self._is_rate] = rates[self._is_rate]
+
+        moved = ~(np.abs(rule_values - self._stuck_values) <= self._tolerance)
+        self._stuck_values = np.where(moved, rule_values, self._stuck_values)
+        self._stuck_since = np.where(moved, now, self._stuck_since)
+        stuck_time = np.where(np.isnan(rule_values), np.nan, now - self._stuck_since)
+        quantity[self._is_stuck] = stuck_time[self._is_stuck]
+
+        # Hysteresis: an alarm is set outside the limits and kept until the quantity is back by the margin
+        with np.errstate(invalid="ignore"):
+            outside = (quantity > self._upper) | (quantity < self._lower)
+            kept = (quantity > self._upper - self._hysteresis) | (quantity < self._lower + self._hysteresis)
+        condition = np.where(self._condition, kept, outside)
+        self._true_since = np.where(condition & ~self._condition, now, self._true_since)
+        self._condition = condition
+        active = condition & (now - self._true_since >= self._hold)
+        raised = np.flatnonzero(active & ~self.active)
+        self.active = active
+
+        self._previous_values = values
+        self._evaluation_time = now
+        return [(self.rules[i], float(rule_values[i])) for i in raised]
+
+    def check_conditions(self) -> list[tuple[bool, str]]:
+        now = time.monotonic()
+        if self.value is None or now - self._evaluation_time < self.every:
+            return []
+        return [(True, rule.get_message(value)) for rule, value in self.evaluate(self.value, now)]
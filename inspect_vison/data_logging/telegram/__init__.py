@@ -1 +1,10 @@
-from .telegram_api import TelegramApi
\ No newline at end of file
+from .notifier import BotApiTransport, RateLimitError, TelegramNotifier, TokenBucket, Transport, TransportError
+
+# TelegramApi needs telebot. It is imported on the first access
+
+
+def __getattr__(name: str):
+    if name == "TelegramApi":
+        from .telegram_api import TelegramApi
+        return TelegramApi
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,264 @@
+from abc import ABC, abstractmethod
+import json
+import queue
+import random
+import threading
+import time
+import typing as tp
+import urllib.error
+import warnings
+
+
+class TransportError(Exception):
+    """
+    The message is not sent, but it can be sent later
+    """
+    pass
+
+
+class RateLimitError(TransportError):
+    """
+    The server asks to wait retry_after seconds before the next message
+    """
+    def __init__(self, retry_after: float, message: str = ""):
+        super().__init__(message or f"Too many requests, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class Transport(ABC):
+    """
+    The way messages are delivered. It raises RateLimitError or TransportError if the message is not sent,
+    and any other exception if it can not be sent at all
+    """
+    @abstractmethod
+    def send(self, chat_id: int, text: str) -> None:
+        pass
+
+
+class BotApiTransport(Transport):
+    """
+    Sends messages by sendMessage of Telegram Bot API. base_url can point to a local server for tests
+    """
+    def __init__(self, token: str, base_url: str = "https://api.telegram.org", timeout: float = 10.0):
+        """
+        :param token: the token of the bot
+        :param base_url: the address of Bot API server
+        :param timeout: the timeout of one request in seconds
+        """
+        self.url = f"{base_url.rstrip('/')}/bot{token}/sendMessage"
+        self.timeout = timeout
+
+    def send(self, chat_id: int, text: str) -> None:
+        # http.client and ssl are imported only when the first message is sent
+        import urllib.request
+
+        data = json.dumps({"chat_id": chat_id, "text": text}).encode()
+        request = urllib.request.Request(self.url, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as error:
+            if error.code == 429:
+                try:
+                    retry_after = json.loads(error.read())["parameters"]["retry_after"]
+                except (ValueError, KeyError, TypeError):
+                    retry_after = float(error.headers.get("Retry-After", 1))
+                raise RateLimitError(float(retry_after)) from error
+            if error.code >= 500:
+                raise TransportError(f"Server error {error.code}") from error
+            raise
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as error:
+            raise TransportError(str(error)) from error
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket: rate tokens per second are added up to capacity, and each message takes one
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._time) * self.rate)
+        self._time = now
+
+    def reserve(self) -> float:
+        """
+        Take a token
+        :return: the time in seconds to wait before it can be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def pause(self, delay: float) -> None:
+        """
+        No tokens are given for delay seconds
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -delay * self.rate)
+
+
+class TelegramNotifier:
+    """
+    Outbound queue of messages. notify never waits for the network: the messages are sent to users
+    concurrently by worker threads. Identical messages within coalesce_window are sent once,
+    and the next one tells how many were skipped. The rate is limited by token buckets for all messages
+    and for each chat, failed messages are retried with exponential backoff, and the whole queue
+    waits as long as the server asks after 429 Too Many Requests
+    """
+    def __init__(self, transport: Transport, workers: int = 4, queue_size: int = 1000,
+                 coalesce_window: float = 60.0, rate: float = 25.0, burst: int = 25, chat_rate: float = 1.0,
+                 max_retries: int = 5, backoff: float = 1.0, max_backoff: float = 60.0):
+        """
+        :param transport: the transport of messages
+        :param workers: the number of threads sending messages
+        :param queue_size: the maximum number of waiting messages. New messages are dropped if it is full
+        :param coalesce_window: the time in seconds when the same text is not sent again
+        :param rate: the maximum number of messages per second to all users
+        :param burst: the maximum number of messages sent at once
+        :param chat_rate: the maximum number of messages per second to one user
+        :param max_retries: the number of retries of a failed message
+        :param backoff: the delay before the first retry in seconds. It is doubled on each retry
+        :param max_backoff: the maximum delay before a retry in seconds
+        """
+        self.transport = transport
+        self.coalesce_window = coalesce_window
+        self.chat_rate = chat_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate, burst)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._coalesced: dict[str, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stopped = threading.Event()
+        self._threads = [threading.Thread(target=self._work, name=f"telegram_notifier_{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _coalesce(self, text: str) -> str | None:
+        """
+        :return: the text to send or None if the same text was sent within the window
+        """
+        now = time.monotonic()
+        with self._lock:
+            sent_time, skipped = self._coalesced.get(text, (-float("inf"), 0))
+            if now - sent_time < self.coalesce_window:
+                self._coalesced[text] = (sent_time, skipped + 1)
+                self.coalesced += 1
+                return None
+            self._coalesced[text] = (now, 0)
+            # Texts from old windows are forgotten, so the dictionary does not grow
+            self._coalesced = {key: value for key, value in self._coalesced.items()
+                               if now - value[0] < self.coalesce_window or value[1]}
+        if skipped:
+            return f"{text}\n(repeated {skipped} times since the last message)"
+        return text
+
+    def notify(self, text: str, chat_ids: tp.Iterable[int], coalesce: bool = True) -> None:
+        """
+        Put the message to the queue for each user
+        :param text: the text of the message
+        :param chat_ids: the users
+        :param coalesce: skip the message if it was sent within coalesce_window
+        """
+        if coalesce:
+            text = self._coalesce(text)
+            if text is None:
+                return
+        for chat_id in chat_ids:
+            try:
+                self._queue.put_nowait((chat_id, text))
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+
+    def _get_chat_bucket(self, chat_id: int) -> TokenBucket:
+        with self._lock:
+            if chat_id not in self._chat_buckets:
+                self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1)
+            return self._chat_buckets[chat_id]
+
+    def _wait(self, delay: float) -> None:
+        if delay > 0:
+            self._stopped.wait(delay)
+
+    def _deliver(self, chat_id: int, text: str) -> bool:
+        chat_bucket = self._get_chat_bucket(chat_id)
+        for attempt in range(self.max_retries + 1):
+            if self._stopped.is_set():
+                return False
+            self._wait(max(self.bucket.reserve(), chat_bucket.reserve()))
+            try:
+                self.transport.send(chat_id, text)
+                return True
+            except RateLimitError as error:
+                self.bucket.pause(error.retry_after)
+                delay = error.retry_after
+            except TransportError:
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if attempt < self.max_retries:
+                with self._lock:
+                    self.retried += 1
+                self._wait(delay)
+        return False
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            chat_id, text = item
+            try:
+                delivered = self._deliver(chat_id, text)
+            except Exception as error:
+                warnings.warn(f"The message to {chat_id} can not be sent: {error}")
+                delivered = False
+            with self._lock:
+                if delivered:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+
+    def statistics(self) -> dict[str, int]:
+        """
+        :return: the numbers of sent, failed, retried, coalesced, dropped and waiting messages
+        """
+        return {"sent": self.sent, "failed": self.failed, "retried": self.retried,
+                "coalesced": self.coalesced, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """
+        Send the waiting messages and stop the workers
+        :param timeout: the maximum time in seconds to wait. Then the waiting messages and retries are abandoned
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                self._stopped.set()
+                break
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if self._stopped.is_set() or any(thread.is_alive() for thread in self._threads):
+            # Waiting is interrupted, the waiting messages are abandoned, and the workers are daemons
+            self._stopped.set()
+            warnings.warn(f"{self._queue.qsize()} telegram messages were not sent before exit")
@@ -4,22 +4,24 @@ import telebot
 import threading
 
 from ..notification import Notificator
+from .notifier import BotApiTransport, TelegramNotifier, Transport
 
 class TelegramBot:
-    def __init__(self, token:str, notificator:Notificator):
+    def __init__(self, token:str, notificator:Notificator, notifier: TelegramNotifier):
         self.bot = telebot.TeleBot(token=token)
         self.notificator = notificator
+        self.notifier = notifier
         self.users_collection = set()
         #self.dp.middleware.setup(LoggingMiddleware())
 
     def start(self, message) -> None:
         user_id = message.from_user.id
         self.users_collection.add(user_id)
-        self.bot.send_message(user_id, "I will add you in the users list")
+        self.notifier.notify("I will add you in the users list", [user_id], coalesce=False)
 
     def send_messages(self, text: str):
-        for user_id in self.users_collection:
-            self.bot.send_message(user_id, text)
+        # The users are added by the polling thread
+        self.notifier.notify(text, list(self.users_collection))
 
     def update(self, update_values: dict[str, tp.Any]):
         self.notificator.update(update_values)
@@ -33,8 +35,18 @@ class TelegramBot:
 
 
 class TelegramApi:
-    def __init__(self, token:str, notificator:Notificator):
-        self.bot = TelegramBot(token, notificator)
+    def __init__(self, token:str, notificator:Notificator, transport: Transport | None = None,
+                 **notifier_kwargs):
+        """
+        :param token: the token of the bot
+        :param notificator: the notificator which makes messages from values
+        :param transport: the transport of messages. None means Telegram Bot API
+        :param notifier_kwargs: the parameters of TelegramNotifier: coalesce_window, rate, max_retries and so on.
+        Messages are sent by its worker threads, so update never waits for the network
+        """
+        transport = BotApiTransport(token) if transport is None else transport
+        self.notifier = TelegramNotifier(transport, **notifier_kwargs)
+        self.bot = TelegramBot(token, notificator, self.notifier)
 
     def run(self) -> None:
         thread = threading.Thread(target=self.bot.start_polling, args=())
@@ -43,6 +55,12 @@ class TelegramApi:
     def update(self, update_values: dict[str, tp.Any]):
         self.bot.update(update_values)
 
+    def close(self) -> None:
+        """
+        Send the waiting messages and stop the notifier
+        """
+        self.notifier.close()
+
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
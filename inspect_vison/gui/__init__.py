@@ -1 +1,12 @@
-from .gui_monitor import GuiHandler, WidgetType, WidgetInterface
\ No newline at end of file
+from .widget_types import WidgetType
+from .remote import RemoteGuiHandler
+
+# GuiHandler and WidgetInterface need PyQt6 and pyqtgraph. They are imported on the first access,
+# so the program without gui does not load Qt. RemoteGuiHandler loads Qt only in the gui process
+
+
+def __getattr__(name: str):
+    if name in ("GuiHandler", "WidgetInterface"):
+        from . import gui_monitor
+        return getattr(gui_monitor, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
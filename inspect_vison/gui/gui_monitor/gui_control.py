@@ -2,6 +2,7 @@ import sys
 import typing as tp
 import warnings
 
+import cv2
 import numpy as np
 
 from PyQt6.QtWidgets import (QApplication, QMainWindow)
@@ -33,13 +34,22 @@ class MainWindow(QMainWindow):
 
     def update_screen(self, frame: np.ndarray):
         """
-        :param frame: in (width, height, channels) format with values from 0 to 1
+        :param frame: in (height, width, channels) format with float values from 0 to 1 or uint8 values from 0 to 255
         :return:
         """
-        transformed_frame = (frame * 255).copy()
-        #transformed_frame = np.require(transformed_frame, np.uint8, 'C')
-        transformed_frame = transformed_frame.astype(np.uint8)
-        convert = QImage(transformed_frame, transformed_frame.shape[1], transformed_frame.shape[0], QImage.Format.Format_BGR888)
+        # The frame is downscaled to the size of screen before the conversion to pixmap
+        screen_width, screen_height = self.ui.screenView.width(), self.ui.screenView.height()
+        height, width = frame.shape[:2]
+        scale = min(screen_width / width, screen_height / height)
+        if 0 < scale < 1:
+            frame = cv2.resize(frame, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                               interpolation=cv2.INTER_AREA)
+        if frame.dtype == np.uint8:
+            transformed_frame = np.ascontiguousarray(frame)
+        else:
+            transformed_frame = (frame * 255).astype(np.uint8)
+        convert = QImage(transformed_frame, transformed_frame.shape[1], transformed_frame.shape[0],
+                         transformed_frame.strides[0], QImage.Format.Format_BGR888)
         pixmap = QPixmap.fromImage(convert)
         self.ui.screenView.setPixmap(pixmap)
 
@@ -58,6 +68,12 @@ class GuiHandler:
     def __enter__(self):
         return self
 
+    def screen_size(self) -> tuple[int, int]:
+        """
+        :return: the (width, height) of the screen with frames
+        """
+        return self.window.ui.screenView.width(), self.window.ui.screenView.height()
+
     def _get_existing_keys(self, init_names: tp.Iterable[str], update_names: tp.Iterable[str]):
         existing_keys = [key for key in update_names if key in init_names]
         return existing_keys
@@ -1,4 +1,3 @@
-from enum import Enum
 from dataclasses import dataclass
 from datetime import datetime
 import typing as tp
@@ -7,24 +6,8 @@ import pyqtgraph as pg
 from PyQt6.QtCore import QCoreApplication, QMetaObject, QRect
 from PyQt6.QtWidgets import QGraphicsView, QLineEdit, QMainWindow, QLCDNumber, QWidget, QLabel
 
-
-class MC(type(Enum)):
-  def __repr__(self):
-      text = """
-      Class with types of widget.
-      Available Widgets Representations.
-      ..............................................
-      Plot is a simple plot with dependence on time.
-      Display is a LCD Display with seven-segment digits.
-      Binary is a status widget with only two value: On, OFF.
-      ..............................................
-      """
-      return text
-
-class WidgetType(Enum, metaclass=MC):
-    Plot = 0
-    Display = 1
-    Binary = 2
+from ..time_series import TimeSeriesBuffer
+from ..widget_types import WidgetType
 
 
 def split_box(box: QRect, attitude: float = 0.6) -> tuple[QRect, QRect]:
@@ -77,23 +60,34 @@ class BinaryStatusWidget(QWidget):
 
 
 class PlotWidget(pg.PlotWidget):
-    def __init__(self, central_widget: QWidget, title: str, time_delta: float=6):
+    def __init__(self, central_widget: QWidget, title: str, time_delta: float=6, capacity: int = 100_000):
+        """
+        :param central_widget: the parent widget
+        :param title: the title of the plot
+        :param time_delta: the time window of the plot in hours
+        :param capacity: the maximum number of stored points
+        """
         super().__init__(central_widget, title=title)
         self.time_delta = time_delta * 60 * 60  # To seconds
         self.setLabel("bottom", "Time (minutes)")
         self.addLegend()
         self.showGrid(x=True, y=True)
-        self.previous_data = datetime.now()
-        self.data = {"x": [], "y": []}
+        self.data = TimeSeriesBuffer(capacity=capacity, time_delta=self.time_delta)
 
         axis = pg.DateAxisItem()
         self.setAxisItems({'bottom': axis})
-
-    def display(self, data: tuple[datetime, float]):
-        if (data[0] - self.previous_data).total_seconds() >= self.time_delta:
-            self.data["x"].pop(0), self.data["y"].pop(0)
-        self.data["x"].append(data[0].timestamp()), self.data["y"].append(data[1])
-        self.plot(self.data["x"], self.data["y"], clear=True)
+        # One curve is updated by setData. Only visible points are drawn, and they are downsampled to the width
+        self.setDownsampling(auto=True, mode="peak")
+        self.setClipToView(True)
+        self.curve = self.plot(connect="finite")
+
+    def display(self, data: list[tuple[datetime, tp.Any]]):
+        """
+        :param data: the (time, value) points received since the last update. The curve is redrawn once
+        """
+        for point_time, value in data:
+            self.data.append(point_time.timestamp(), value)
+        self.curve.setData(*self.data.data(), connect="finite")
 
 
 class TitledLCDWidget(QWidget):
@@ -0,0 +1,97 @@
+from multiprocessing import shared_memory
+import queue
+import typing as tp
+
+import numpy as np
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6 import QtCore
+
+from .gui_control import MainWindow
+from ..remote import SharedFrameBuffer
+from ..widget_types import WidgetType
+
+
+class RemoteViewer:
+    """
+    The window of the gui process. It polls the queue of messages, shows all readings and only the latest frame
+    """
+    def __init__(self, name_type: dict[str, WidgetType], messages: tp.Any, locks: tp.Sequence[tp.Any],
+                 poll_interval: int = 10):
+        """
+        :param name_type: the names of gui widgets and their types
+        :param messages: the queue of messages from the monitor process
+        :param locks: the locks of the slots of shared frames buffer
+        :param poll_interval: the interval of queue polling in ms
+        """
+        self.name_type = name_type
+        self.messages = messages
+        self.locks = locks
+        self.window = MainWindow(name_type)
+        self.window.show()
+        self.stopped = False
+        self._shm: shared_memory.SharedMemory | None = None
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(poll_interval)
+
+    def _get_frame(self, shm_name: str, slot: int, shape: tuple[int, ...]) -> np.ndarray:
+        if self._shm is None or self._shm.name != shm_name:
+            self.close()
+            # The monitor process owns the shared memory and unlinks it
+            self._shm = shared_memory.SharedMemory(name=shm_name)
+        return np.ndarray((SharedFrameBuffer.Slots, *shape), dtype=np.uint8, buffer=self._shm.buf)[slot]
+
+    def _show_frame(self, frame_info: tuple[str, int, tuple[int, ...]]) -> None:
+        shm_name, slot, shape = frame_info
+        with self.locks[slot]:
+            try:
+                frame = self._get_frame(shm_name, slot, shape)
+            except FileNotFoundError:
+                # The buffer was reallocated for another shape after the message was sent, the frame is stale
+                return
+            # QImage maps the shared memory directly, and the pixmap is the only copy
+            self.window.update_screen(frame)
+
+    def poll(self) -> None:
+        if self.stopped:
+            return
+        frame_info = None
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "stop":
+                self.stopped = True
+                break
+            _, message_frame_info, update_data = message
+            if update_data is not None:
+                self.window.update_values(
+                    {name: value for name, value in update_data.items() if name in self.name_type})
+            if message_frame_info is not None:
+                frame_info = message_frame_info
+        if frame_info is not None:
+            self._show_frame(frame_info)
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+
+def run_viewer(name_type: dict[str, WidgetType], messages: tp.Any, info: tp.Any, locks: tp.Sequence[tp.Any]) -> None:
+    """
+    The entry point of the gui process
+    :param name_type: the names of gui widgets and their types
+    :param messages: the queue of messages from the monitor process
+    :param info: the queue to report the size of the screen
+    :param locks: the locks of the slots of shared frames buffer
+    """
+    app = QApplication([])
+    viewer = RemoteViewer(name_type, messages, locks)
+    screen_view = viewer.window.ui.screenView
+    info.put((screen_view.width(), screen_view.height()))
+    app.exec()
+    viewer.close()
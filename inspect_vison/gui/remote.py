@@ -0,0 +1,157 @@
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+import queue
+import time
+import typing as tp
+import warnings
+
+import numpy as np
+
+from .widget_types import WidgetType
+
+
+class SharedFrameBuffer:
+    """
+    Double buffer of uint8 frames in shared memory. Each slot has its own lock: the writer skips the frame
+    if the slot is read by the viewer, and the viewer holds the lock only while it converts the slot to a pixmap
+    """
+    Slots = 2
+
+    def __init__(self, locks: tp.Sequence[tp.Any]):
+        """
+        :param locks: one multiprocessing lock for each slot. They are shared with the viewer process
+        """
+        self.locks = locks
+        self.shm: shared_memory.SharedMemory | None = None
+        self.shape: tuple[int, ...] | None = None
+        self._frames: np.ndarray | None = None
+        self._slot = 0
+
+    def _allocate(self, shape: tuple[int, ...]) -> None:
+        self.close()
+        self.shm = shared_memory.SharedMemory(create=True, size=self.Slots * int(np.prod(shape)))
+        self.shape = shape
+        self._frames = np.ndarray((self.Slots, *shape), dtype=np.uint8, buffer=self.shm.buf)
+
+    def write(self, frame: np.ndarray) -> tuple[str, int, tuple[int, ...]] | None:
+        """
+        :param frame: the frame in uint8 with shape (height, width, channels)
+        :return: the name of shared memory, the slot and the shape of the written frame,
+        or None if the slot is busy and the frame is dropped. The buffer is reallocated if the shape is changed
+        """
+        if frame.shape != self.shape:
+            self._allocate(frame.shape)
+        slot = 1 - self._slot
+        if not self.locks[slot].acquire(block=False):
+            return None
+        try:
+            np.copyto(self._frames[slot], frame)
+        finally:
+            self.locks[slot].release()
+        self._slot = slot
+        return self.shm.name, slot, self.shape
+
+    def close(self) -> None:
+        """
+        Free the shared memory. The viewer can still use its own mapping of it
+        """
+        if self.shm is not None:
+            self._frames = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+            self.shape = None
+
+
+def _run_viewer(*args) -> None:
+    # Qt is imported only in the gui process
+    from .gui_monitor.remote_viewer import run_viewer
+    run_viewer(*args)
+
+
+class RemoteGuiHandler:
+    """
+    The gui in a separate process. Frames are written into shared memory, and readings are sent through a queue.
+    Nothing here waits for the viewer: if it is busy, frames and readings are dropped,
+    and if it is closed or crashed, the measurements go on without gui. It has the interface of GuiHandler
+    """
+    def __init__(self, name_type: dict[str, WidgetType], queue_size: int = 64, start_method: str | None = None,
+                 timeout: float = 30.0, exit_timeout: float = 10.0):
+        """
+        :param name_type: the names of gui widgets and their types
+        :param queue_size: the maximum number of messages waiting for the viewer
+        :param start_method: the start method of multiprocessing. None means the default method of the platform
+        :param timeout: the time in seconds to wait for the viewer window
+        :param exit_timeout: the time in seconds to wait on exit until the gui window is closed.
+        Then the gui process is terminated, so a hung viewer does not block the exit of the monitor
+        """
+        context = mp.get_context(start_method)
+        self.name_type = name_type
+        self.timeout = timeout
+        self.exit_timeout = exit_timeout
+        self.dropped_messages = 0
+        self.messages = context.Queue(maxsize=queue_size)
+        self._info = context.Queue()
+        locks = [context.Lock() for _ in range(SharedFrameBuffer.Slots)]
+        self.frame_buffer = SharedFrameBuffer(locks)
+        # The viewer must share the resource tracker of this process, which owns the shared memory
+        resource_tracker.ensure_running()
+        self.process = context.Process(target=_run_viewer, args=(dict(name_type), self.messages, self._info, locks),
+                                       name="inspect_vision_gui", daemon=True)
+        self.process.start()
+        self._screen_size: tuple[int, int] | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.exit()
+
+    def screen_size(self) -> tuple[int, int] | None:
+        """
+        :return: the (width, height) of the screen with frames. It is reported by the viewer once it is started
+        """
+        start = time.perf_counter()
+        while self._screen_size is None and self.is_alive() and time.perf_counter() - start < self.timeout:
+            try:
+                self._screen_size = tuple(self._info.get(timeout=0.1))
+            except queue.Empty:
+                pass
+        if self._screen_size is None:
+            warnings.warn("The gui process did not report the size of its screen")
+        return self._screen_size
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def _send(self, message: tuple) -> None:
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            self.dropped_messages += 1
+
+    def update(self, screen: np.ndarray | None, update_data: dict[str, tp.Any] | None = None) -> None:
+        if not self.is_alive():
+            return
+        frame_info = None
+        if screen is not None:
+            if screen.dtype != np.uint8:
+                screen = (screen * 255).astype(np.uint8)
+            frame_info = self.frame_buffer.write(screen)
+        if frame_info is not None or update_data is not None:
+            self._send(("update", frame_info, update_data))
+
+    def exit(self) -> None:
+        """
+        Wait until the gui window is closed, but not longer than exit_timeout, and free the shared memory
+        """
+        self._send(("stop",))
+        self.process.join(self.exit_timeout)
+        if self.process.is_alive():
+            warnings.warn("The gui process did not stop in time. I terminate it")
+            self.process.terminate()
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.frame_buffer.close()
@@ -0,0 +1,60 @@
+import typing as tp
+
+import numpy as np
+
+
+class TimeSeriesBuffer:
+    """
+    Fixed-capacity ring buffer of (time, value) points. Each point is written twice, at index i and
+    i + capacity, so the last points are always a contiguous slice and can be given to plot without copying.
+    Points older than time_delta relatively to the last point are not returned
+    """
+    def __init__(self, capacity: int = 100_000, time_delta: float | None = None):
+        """
+        :param capacity: the maximum number of stored points
+        :param time_delta: the time window in seconds. None means all stored points
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.time_delta = time_delta
+        self._times = np.empty(2 * capacity, dtype=np.float64)
+        self._values = np.empty(2 * capacity, dtype=np.float64)
+        self._index = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, value: tp.Any) -> None:
+        """
+        :param timestamp: the time of the point in seconds. Points must be appended in time order
+        :param value: the value of the point. Values which are not numbers are stored as nan,
+        so the curve has a gap there
+        """
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = np.nan
+        self._times[self._index] = self._times[self._index + self.capacity] = timestamp
+        self._values[self._index] = self._values[self._index + self.capacity] = value
+        self._index = (self._index + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def clear(self) -> None:
+        self._index = 0
+        self._size = 0
+
+    def data(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: the times and values of the points in the time window. They are views of the buffer,
+        so they are valid until the next append
+        """
+        end = self._index + self.capacity if self._size == self.capacity else self._index
+        start = end - self._size
+        times = self._times[start: end]
+        values = self._values[start: end]
+        if self.time_delta is not None and self._size:
+            first = int(np.searchsorted(times, times[-1] - self.time_delta, side="left"))
+            times, values = times[first:], values[first:]
+        return times, values
@@ -0,0 +1,20 @@
+from enum import Enum
+
+
+class MC(type(Enum)):
+  def __repr__(self):
+      text = """
+      Class with types of widget.
+      Available Widgets Representations.
+      ..............................................
+      Plot is a simple plot with dependence on time.
+      Display is a LCD Display with seven-segment digits.
+      Binary is a status widget with only two value: On, OFF.
+      ..............................................
+      """
+      return text
+
+class WidgetType(Enum, metaclass=MC):
+    Plot = 0
+    Display = 1
+    Binary = 2
@@ -1,12 +1,16 @@
 import warnings
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
 
+import cv2
 import numpy as np
-from skimage.metrics import structural_similarity as ssim
 import typing as tp
 
 from . import models
 from . import gui
+from .processing.image_processing import normalize_image
+from .processing.tracking import TemplateTracker, TrackingResult, to_gray
 
 
 class DigitizingModel(tp.Protocol):
@@ -32,23 +36,179 @@ class Similarities:
     @staticmethod
     def structural_similarity(image_1: np.ndarray, image_2: np.ndarray) -> float:
         """
-        :param image_1: first image to calculate similarity.
-        :param image_2: second image to calculate similarity.
+        :param image_1: first image to calculate similarity in float (0, 1) with shape (height, width, channels).
+        :param image_2: second image to calculate similarity in float (0, 1) with shape (height, width, channels).
         :return: similarity of two pictures in terms of structure.
         """
-        similarity = ssim(image_1, image_2, multichannel=True)
+        from skimage.metrics import structural_similarity as ssim  # skimage loads scipy, so it is imported on use
+        similarity = ssim(image_1, image_2, channel_axis=-1, data_range=1.0)
         return similarity
 
 
+class ReferenceSimilarities:
+    """
+    Fast similarities of images to one fixed reference image.
+    The images are compared in float32 gray format. The box filtered statistics of the reference
+    (mean, variance) and its norm are computed once, so each comparison needs only three box filters.
+    The structural similarity is the same as skimage structural_similarity with default uniform window.
+    """
+    K1 = 0.01
+    K2 = 0.03
+    def __init__(self, reference: np.ndarray, win_size: int = 7, data_range: float = 1.0):
+        """
+        :param reference: the reference image with shape (height, width, channels) in float (0, 1) or uint8 (0, 255)
+        :param win_size: the side of the window for the structural similarity. It must be odd
+        :param data_range: the data range of gray images. Images are normalized to (0, 1), so it is 1 by default
+        """
+        if win_size % 2 == 0:
+            raise ValueError("win_size must be odd")
+        self.win_size = win_size
+        self.reference = to_gray(reference)
+        if min(self.reference.shape) < win_size:
+            raise ValueError("The reference image must be at least win_size in each side")
+        self.cov_norm = np.float32(win_size ** 2 / (win_size ** 2 - 1))
+        self.c1 = np.float32((self.K1 * data_range) ** 2)
+        self.c2 = np.float32((self.K2 * data_range) ** 2)
+
+        self.norm = float(np.sqrt(np.sum(self.reference ** 2)))
+        self.mean = self._filter(self.reference)
+        self.variance = self.cov_norm * (self._filter(self.reference * self.reference) - self.mean * self.mean)
+        self.mean_square = self.mean * self.mean
+
+    def _filter(self, image: np.ndarray) -> np.ndarray:
+        return cv2.boxFilter(image, -1, (self.win_size, self.win_size), normalize=True,
+                             borderType=cv2.BORDER_REFLECT)
+
+    def cosine_similarity(self, image: np.ndarray) -> float:
+        """
+        :param image: the gray image in float32 with the shape of the reference
+        :return: similarity to the reference in terms of cross-correlation
+        """
+        norm = self.norm * float(np.sqrt(np.sum(image * image)))
+        if norm == 0:
+            return 0.0
+        return float(np.sum(image * self.reference)) / norm
+
+    def structural_similarity(self, image: np.ndarray) -> float:
+        """
+        :param image: the gray image in float32 with the shape of the reference
+        :return: similarity to the reference in terms of structure
+        """
+        mean = self._filter(image)
+        variance = self.cov_norm * (self._filter(image * image) - mean * mean)
+        covariance = self.cov_norm * (self._filter(image * self.reference) - mean * self.mean)
+
+        numerator = (2 * mean * self.mean + self.c1) * (2 * covariance + self.c2)
+        denominator = (mean * mean + self.mean_square + self.c1) * (variance + self.variance + self.c2)
+        pad = (self.win_size - 1) // 2
+        structural = numerator / denominator
+        return float(structural[pad: -pad, pad: -pad].mean(dtype=np.float64))
+
+    def __call__(self, image: np.ndarray) -> tuple[float, float]:
+        """
+        :param image: the image with shape (height, width, channels) in float (0, 1) or uint8 (0, 255)
+        :return: cosine similarity and structural similarity to the reference.
+        If the image has another shape than the reference (for example near the frame border) both are 0
+        """
+        image = to_gray(image)
+        if image.shape != self.reference.shape:
+            return 0.0, 0.0
+        return self.cosine_similarity(image), self.structural_similarity(image)
+
+
+class CacheKey(tp.NamedTuple):
+    digest: bytes
+    thumbnail: np.ndarray
+
+
+class ValueCache:
+    """
+    Bounded LRU cache of model results keyed by the hash of the quantized gray thumbnail of the roi.
+    If there is no exact key, the closest stored thumbnail is used if no its pixel differs by more than eps,
+    so the camera noise that moves the thumbnail across the quantization levels doesn't cause the model call,
+    but a change of one segment of a display, which changes a few pixels strongly, does.
+    """
+    def __init__(self, max_size: int = 16, thumbnail_size: tuple[int, int] = (16, 16), levels: int = 32,
+                 eps: float = 1e-2):
+        """
+        :param max_size: maximum number of stored values. 0 disables the cache
+        :param thumbnail_size: the size (width, height) of the thumbnail of the roi
+        :param levels: the number of quantization levels of the thumbnail for hashing
+        :param eps: the maximum absolute difference of each pixel of thumbnails in (0, 1) to consider rois equal
+        """
+        self.max_size = max_size
+        self.thumbnail_size = thumbnail_size
+        self.levels = levels
+        self.eps = eps
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[np.ndarray, tp.Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def statistics(self) -> dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "size": len(self)}
+
+    def make_key(self, image: np.ndarray) -> CacheKey:
+        """
+        :param image: the roi with shape (height, width, channels) in float (0, 1) or uint8 (0, 255)
+        :return: the key of the roi
+        """
+        thumbnail = cv2.resize(to_gray(image), self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        quantized = (thumbnail * (self.levels - 1) + 0.5).astype(np.uint8)
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16).digest()
+        return CacheKey(digest, thumbnail)
+
+    def _find_closest(self, thumbnail: np.ndarray) -> bytes | None:
+        if not self._entries:
+            return None
+        digests = list(self._entries.keys())
+        thumbnails = np.stack([entry[0] for entry in self._entries.values()])
+        distances = np.abs(thumbnails - thumbnail).max(axis=(1, 2))
+        closest = int(np.argmin(distances))
+        return digests[closest] if distances[closest] <= self.eps else None
+
+    def get(self, key: CacheKey) -> tuple[bool, tp.Any]:
+        """
+        :param key: the key from make_key
+        :return: flag of hit and the stored value
+        """
+        digest = key.digest if key.digest in self._entries else self._find_closest(key.thumbnail)
+        if digest is None:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return True, self._entries[digest][1]
+
+    def put(self, key: CacheKey, value: tp.Any) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key.digest] = (key.thumbnail, value)
+        self._entries.move_to_end(key.digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
 class ControlObject(ABC):
-    CONV_STEPS = 8
     def __init__(self, coordinates: tuple[int, int, int, int], frame: np.ndarray, init_value: float,
                  name: str, gui_type: gui.WidgetType | None = None,
                  weights_similarity: tuple[float, float] = (0.5, 0.5), min_similarity: float=0.7,
-                 delta_pixel: int=1, eps: float = 1e-2) -> None:
+                 delta_pixel: int=1, eps: float = 1e-2, search_window: int = 20,
+                 fast_similarity: bool = False, cache_size: int = 16) -> None:
         """
         :param coordinates: square coordinates of an object
-        :param frame: the picture from the camera. It has shape (height,width, channels). And values are float (0, 1) in RGB format by default
+        :param frame: the picture from the camera. It has shape (height,width, channels).
+        Values are float (0, 1) or uint8 (0, 255)
         :param init_value: init value og the object. For digital sensor it is number
         :param name: the name of the object that will be shown in output
         :param weights_similarity: the similarities weights:
@@ -56,6 +216,14 @@ class ControlObject(ABC):
         :param min_similarity: minimum acceptable similarity of the first sensor image to all subsequent images.
         This parameter controls the acceptable shift of camera
         :param delta_pixel: the pixel step for update coordinates
+        :param search_window: the maximum shift of the object in pixels between two updates of coordinates
+        :param eps: the maximum absolute difference of each pixel of the roi thumbnails in (0, 1)
+        to reuse the cached value
+        :param fast_similarity: compute similarities in float32 gray format with cached statistics of init image.
+        Otherwise, they are computed by skimage for all channels. The gray scores differ from the multichannel ones,
+        so min_similarity may need another value with it
+        :param cache_size: the number of recent roi values which are cached to avoid the model work for each frame.
+        0 disables the cache
         """
         self.init_coordinates = coordinates
         self.current_coordinates = coordinates
@@ -66,12 +234,19 @@ class ControlObject(ABC):
         self.weights_similarity = weights_similarity
         self.min_similarity = min_similarity
         self.init_image = self._get_init_image(frame)
+        self._normalized_init_image: np.ndarray | None = None
+        self.fast_similarity = fast_similarity
+        self._reference_similarities: ReferenceSimilarities | None = None
+        self.tracker = TemplateTracker(search_window)
+        self._template: np.ndarray | None = None
+        self.last_tracking: TrackingResult | None = None
 
         self.current_similarity = 1.0
         self.model = self._init_model()
-        self.previous_image = self.init_image # To avoid the model work for each frame
         self.current_value: None | float = None
         self.eps = eps
+        self.value_cache = ValueCache(max_size=cache_size, eps=eps)  # To avoid the model work for each frame
+        self._cache_coordinates = tuple(self.current_coordinates)
 
         self.__name = name
         self.__gui_type = gui_type
@@ -103,9 +278,41 @@ class ControlObject(ABC):
         image = frame[y1: y1 + y2, x1: x1 + x2]
         return image
 
+    @property
+    def normalized_init_image(self) -> np.ndarray:
+        """
+        :return: init image in float (0, 1). It is computed once on the first call
+        """
+        if self._normalized_init_image is None:
+            self._normalized_init_image = normalize_image(self.init_image)
+        return self._normalized_init_image
+
+    @property
+    def template(self) -> np.ndarray:
+        """
+        :return: the template of init image for tracking. It is computed once on the first call
+        """
+        if self._template is None:
+            self._template = self.tracker.prepare_template(self.init_image)
+        return self._template
+
+    @property
+    def reference_similarities(self) -> ReferenceSimilarities:
+        """
+        :return: similarities to init image. The statistics of init image are computed once on the first call
+        """
+        if self._reference_similarities is None:
+            self._reference_similarities = ReferenceSimilarities(self.init_image)
+        return self._reference_similarities
+
     def _get_similarity(self, image: np.ndarray) -> float:
-        cross_correlation = Similarities.cosine_similarity(image, self.init_image)
-        structural = Similarities.structural_similarity(image, self.init_image)
+        if self.fast_similarity:
+            cross_correlation, structural = self.reference_similarities(image)
+        else:
+            image = normalize_image(image)
+            init_image = self.normalized_init_image
+            cross_correlation = Similarities.cosine_similarity(image, init_image)
+            structural = Similarities.structural_similarity(image, init_image)
         similarity = cross_correlation * self.weights_similarity[0] + structural * self.weights_similarity[1]
         return similarity
 
@@ -122,21 +329,26 @@ class ControlObject(ABC):
         image = frame[y1: y1 + y2, x1: x1 + x2]
         self.current_similarity = self._get_similarity(image)
 
-    def get_current_image(self, frame: np.ndarray) -> np.ndarray:
+    def get_current_image(self, frame: np.ndarray,
+                          coordinates: tuple[int, int, int, int] | None = None) -> np.ndarray:
         """
         :param frame: the picture from the camera. Has shape (height,width, channels)
+        :param coordinates: the coordinates of the object on this frame. None means current coordinates
         :return: Current image of the object relatively to current coordinates
         """
-        x1 = self.current_coordinates[0]
-        y1 = self.current_coordinates[1]
-        x2 = self.current_coordinates[2]
-        y2 = self.current_coordinates[3]
+        coordinates = self.current_coordinates if coordinates is None else coordinates
+        x1 = coordinates[0]
+        y1 = coordinates[1]
+        x2 = coordinates[2]
+        y2 = coordinates[3]
         image = frame[y1: y1 + y2, x1: x1 + x2]
         return image
 
     def update_coordinates(self, frame: np.ndarray) -> None:
         """
         Update coordinates of given object. It can be useful if the view was shifted.
+        The tracker finds the best offset in the search window in one pass,
+        and the weighted similarity only verifies the found location.
         :param frame: the picture from the camera (height,width, channels)
         :return:None
         """
@@ -146,50 +358,141 @@ class ControlObject(ABC):
         y2 = self.current_coordinates[3]
         old_image = frame[y1: y1 + y2, x1: x1 + x2]
         current_similarity = self._get_similarity(old_image)
-        x_shifts = [2, 2, 0, -2, -2, -2, 0, 2]
-        y_shifts = [0, 2, 2, 2, 0, -2, -2, -2]
-        similarities = []
-        for step in range(self.CONV_STEPS):
-            x1_shifted = x1 + x_shifts[step]
-            y1_shifted = y1 + y_shifts[step]
-            x2_shifted = x2
-            y2_shifted = y2
-            new_image = frame[y1_shifted: y1_shifted + y2_shifted, x1_shifted: x1_shifted + x2_shifted]
-            similarity = self._get_similarity(new_image)
-            similarities.append(similarity)
-        similarity_index_max = np.argmax(similarities)
-        similarity_max = similarities[similarity_index_max]
-        if similarity_max > current_similarity:
-            x1_shifted = x1 + x_shifts[similarity_index_max]
-            y1_shifted = y1 + y_shifts[similarity_index_max]
-            x2_shifted = x2
-            y2_shifted = y2
-            self.current_coordinates = (x1_shifted, y1_shifted, x2_shifted, y2_shifted)
-        self.current_similarity = max(similarity_max, current_similarity)
-
-    def _get_value_flag(self, image):
-        flag_value = (self.current_value is None)
-        flag_image = np.any(abs(self.previous_image - image) >= self.eps)
-        return flag_value or flag_image
-
-    def get_value(self, frame):
-        """
-        :param frame:
-        :return:
+
+        self.last_tracking = self.tracker.search(frame, self.template, self.current_coordinates)
+        x_shift, y_shift = self.last_tracking.pixel_offset()
+        if x_shift == 0 and y_shift == 0:
+            self.current_similarity = current_similarity
+            return
+
+        x1_shifted = x1 + x_shift
+        y1_shifted = y1 + y_shift
+        new_image = frame[y1_shifted: y1_shifted + y2, x1_shifted: x1_shifted + x2]
+        similarity = self._get_similarity(new_image)
+        if similarity > current_similarity:
+            self.current_coordinates = (x1_shifted, y1_shifted, x2, y2)
+        self.current_similarity = max(similarity, current_similarity)
+
+    def _lookup_value(self, image: np.ndarray,
+                      coordinates: tuple[int, int, int, int] | None = None) -> tuple[CacheKey, bool, tp.Any]:
         """
-        image = self.get_current_image(frame)
-        if self._get_value_flag(image):
-            value = self.model(image)
+        :param image: Current image of the object
+        :param coordinates: the coordinates of the image. None means current coordinates
+        :return: the cache key of the image, flag of hit and the cached value
+        """
+        coordinates = tuple(self.current_coordinates if coordinates is None else coordinates)
+        if coordinates != self._cache_coordinates:
+            self.value_cache.clear()
+            self._cache_coordinates = coordinates
+        key = self.value_cache.make_key(image)
+        found, value = self.value_cache.get(key)
+        return key, found, value
+
+    def _store_value(self, key: CacheKey, value: tp.Any) -> None:
+        self.value_cache.put(key, value)
+        self.current_value = value
+
+    def get_value(self, frame, coordinates: tuple[int, int, int, int] | None = None):
+        """
+        The model is called only if the image of the object is not in the cache of recent values
+        :param frame: the picture from the camera. Has shape (height,width, channels)
+        :param coordinates: the coordinates of the object on this frame. None means current coordinates.
+        They are given when the coordinates are already updated by the next frame
+        :return: the value of the object
+        """
+        image = self.get_current_image(frame, coordinates)
+        key, found, value = self._lookup_value(image, coordinates)
+        if found:
+            self.current_value = value
         else:
-            value = self.current_value
+            value = self.model(image)
+            self._store_value(key, value)
         return value
 
+    @classmethod
+    def get_values_batch(cls, control_objects: tp.Sequence["ControlObject"], frame: np.ndarray,
+                         coordinates: tp.Sequence[tuple[int, int, int, int]] | None = None,
+                         state: dict[str, tp.Any] | None = None) -> list[tp.Any]:
+        """
+        Get values of several objects of this class from one frame.
+        Subclasses can override it to process all objects by one model call
+        :param control_objects: the objects of this class
+        :param frame: the picture from the camera. Has shape (height,width, channels)
+        :param coordinates: the coordinates of the objects on this frame. None means current coordinates
+        :param state: the state of the caller for this class, which is kept between calls. Subclasses store
+        in it what is prepared for the group of objects. None means nothing is kept
+        :return: the values of the objects in the same order
+        """
+        coordinates = [None] * len(control_objects) if coordinates is None else coordinates
+        return [control_object.get_value(frame, coordinate)
+                for control_object, coordinate in zip(control_objects, coordinates)]
+
+    @classmethod
+    def _get_cached_values_batch(cls, control_objects: tp.Sequence["ControlObject"], frame: np.ndarray,
+                                 coordinates: tp.Sequence[tuple[int, int, int, int]] | None,
+                                 forward_batch: tp.Callable[[list[tp.Any], list[np.ndarray]], list[tp.Any]]
+                                 ) -> list[tp.Any]:
+        """
+        The implementation of get_values_batch for models with batch inference. The values of images
+        found in the caches of the objects are reused, and all other images are processed by one call
+        :param forward_batch: the function of the models of the objects and their images which returns the values
+        :return: the values of the objects in the same order
+        """
+        coordinates = [None] * len(control_objects) if coordinates is None else coordinates
+        values = []
+        changed_objects = []
+        changed_images = []
+        changed_keys = []
+        for control_object, coordinate in zip(control_objects, coordinates):
+            image = control_object.get_current_image(frame, coordinate)
+            key, found, value = control_object._lookup_value(image, coordinate)
+            if found:
+                control_object.current_value = value
+            else:
+                changed_objects.append(control_object)
+                changed_images.append(image)
+                changed_keys.append(key)
+            values.append(value)
+        if changed_objects:
+            new_values = forward_batch([control_object.model for control_object in changed_objects], changed_images)
+            for control_object, key, value in zip(changed_objects, changed_keys, new_values):
+                control_object._store_value(key, value)
+            values = [control_object.current_value for control_object in control_objects]
+        return values
+
 
 class Bulb(ControlObject):
+    """
+    The bulb with two states. In get_values_batch the value cache is not used, so its counters
+    are changed only by get_value
+    """
     def _init_model(self):
         base_model = models.BulbModel(self.init_value, self.init_image)
         return base_model
 
+    @classmethod
+    def get_values_batch(cls, control_objects: tp.Sequence["Bulb"], frame: np.ndarray,
+                         coordinates: tp.Sequence[tuple[int, int, int, int]] | None = None,
+                         state: dict[str, tp.Any] | None = None) -> list[tp.Any]:
+        """
+        All bulbs are evaluated by one numpy pass over the frame. The bank of the bulbs is kept in state
+        and rebuilt only if the set of bulbs is changed. The value cache is not used,
+        because the bank is cheaper than hashing the rois
+        """
+        state = {} if state is None else state
+        bulb_models = [control_object.model for control_object in control_objects]
+        bank = state.get("bank")
+        if bank is None or len(bank) != len(bulb_models) or \
+                any(bank_model is not model for bank_model, model in zip(bank.bulb_models, bulb_models)):
+            bank = models.BulbBank(bulb_models)
+            state["bank"] = bank
+        if coordinates is None:
+            coordinates = [control_object.current_coordinates for control_object in control_objects]
+        states = bank(frame, coordinates)
+        for control_object, value in zip(control_objects, states):
+            control_object.current_value = value
+        return list(states)
+
     def check_gui_type(self):
         if self.gui_type is not gui.WidgetType.Binary and self.gui_type is not None:
             warnings.warn("Git type for bulb must be Binary or None")
@@ -197,4 +500,14 @@ class Bulb(ControlObject):
 class LedDigits(ControlObject):
     def _init_model(self):
         base_model = models.LedNumbersModel(self.init_value, self.init_image)
-        return base_model
\ No newline at end of file
+        return base_model
+
+    @classmethod
+    def get_values_batch(cls, control_objects: tp.Sequence["LedDigits"], frame: np.ndarray,
+                         coordinates: tp.Sequence[tuple[int, int, int, int]] | None = None,
+                         state: dict[str, tp.Any] | None = None) -> list[tp.Any]:
+        """
+        All displays which images were changed are recognized by one inference of the digits detector
+        """
+        return cls._get_cached_values_batch(control_objects, frame, coordinates,
+                                            models.LedNumbersModel.forward_batch)
@@ -1,18 +1,27 @@
 from collections import OrderedDict
+import copy
 from datetime import datetime
 
 import typing as tp
 from pathlib import Path
+import queue
+import threading
 import time
+import warnings
 
 import cv2
 import numpy as np
 
 from . import handlers
 from . import gui
-from .data_logging import FileLogger
-from .data_logging import TelegramApi
-from .processing.image_processing import ImageProcessor
+from .data_logging import ChangeFilter, ColumnarLogger, Deadband, FileLogger, LogFormat, RollupAggregator
+from .processing.image_processing import FrameSource
+from .processing.overlay import OverlayRenderer
+from .processing.pipeline import Pipeline, Stage
+from .processing.tracking import GlobalShiftEstimator, TrackingResult
+
+if tp.TYPE_CHECKING:
+    from .data_logging import TelegramApi
 
 
 class ValueSerializator:
@@ -80,9 +89,28 @@ class ValueSerializator:
 
 class UpdateManager:
     def __init__(self, serilizator: ValueSerializator,
-                 log_path: None | str | Path, show: bool, telegram_api: TelegramApi | None,
-                 update_pos: bool, log_every: int
+                 log_path: None | str | Path, show: bool, telegram_api: "TelegramApi | None",
+                 update_pos: bool, log_every: int, display_fps: float | None = 10.0, gui_process: bool = False,
+                 log_async: bool = True, log_format: LogFormat = LogFormat.Tsv,
+                 deadbands: dict[str, Deadband] | None = None, heartbeat: float | None = 600.0,
+                 rollups: bool = False
                  ):
+        """
+        :param display_fps: the maximum rate of gui updates. The processing is not slowed down by gui:
+        between updates the frames are dropped, the points of plots are collected and sent with the next frame,
+        and other widgets show the latest values. None updates gui on every frame
+        :param gui_process: run gui in a separate process. Frames are passed through shared memory,
+        so slow repaint does not stall measurements, and closing or crash of gui does not stop logging
+        :param log_async: write log rows in a background thread. All rows are flushed on exit.
+        If the disk is slower than the rows, the loop waits for the writer, so no rows are lost
+        :param log_format: the format of log files
+        :param deadbands: enables change-only logging. Values are checked on every update, and a value is logged
+        only if it is changed beyond the deadband of its object. Objects without deadbands are logged on any change.
+        log_every is not used in this mode. None logs full rows every log_every seconds
+        :param heartbeat: the interval in seconds of full rows in change-only logging
+        :param rollups: maintain min, max, mean and count of objects per minute, hour and day
+        in the subfolder rollups of log_path. All values are aggregated, not only logged ones
+        """
         self.time = time.time()
         self.serilizator = serilizator
         self.log_path = log_path
@@ -90,21 +118,45 @@ class UpdateManager:
         self.update_pos = update_pos
         self.log_every = log_every
         self.telegram_api = telegram_api
+        self.display_fps = display_fps
+        self._display_time = -float("inf")
+        self._display_lock = threading.Lock()
+        self._pending_gui_repr: dict[str, tp.Any] | None = None
+        self._gui_names_type = serilizator.gui_names_type()
 
         if telegram_api is not None:
             self.telegram_api.run()
         if show:
-            self.gui_handler = gui.GuiHandler(serilizator.gui_names_type())
+            gui_handler_class = gui.RemoteGuiHandler if gui_process else gui.GuiHandler
+            self.gui_handler = gui_handler_class(self._gui_names_type)
         if self.log_path is not None:
             names = serilizator.logger_names()
-            self.file_logger = FileLogger(log_path, names)
+            logger_class = ColumnarLogger if log_format is LogFormat.Columnar else FileLogger
+            self.file_logger = logger_class(log_path, names, asynchronous=log_async)
+        self.rollup_aggregator = None
+        if rollups and self.log_path is not None:
+            self.rollup_aggregator = RollupAggregator(self.file_logger.subdir_path, serilizator.logger_names())
+        self.change_filter = None
+        if deadbands is not None:
+            self.change_filter = ChangeFilter(serilizator.logger_names(), deadbands, heartbeat=heartbeat)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.gui_handler.exit()
-        self.file_logger.close()
+        if self.log_path is not None:
+            self.file_logger.close()
+            if self.rollup_aggregator is not None:
+                self.rollup_aggregator.close()
+            dropped_rows = self.file_logger.statistics()["dropped"]
+            if dropped_rows:
+                warnings.warn(f"{dropped_rows} rows were not logged, because the disk was too slow")
+        if self.telegram_api is not None:
+            self.telegram_api.close()
+        if self.show:
+            if self._pending_gui_repr is not None:
+                self.gui_handler.update(None, self._pending_gui_repr)
+            self.gui_handler.exit()
 
     def _get_delta_time(self) -> float:
         now_time = time.time()
@@ -112,117 +164,189 @@ class UpdateManager:
         return delta_time
 
     def log_in_file(self, update_data):
+        if self.change_filter is not None:
+            sparse_data = self.change_filter(update_data)
+            if sparse_data is not None:
+                self.file_logger.write_results(sparse_data)
+            return
         if self._get_delta_time() >= self.log_every:
             self.file_logger.write_results(update_data)
             self.time = time.time()
 
-    def update(self, frame: np.ndarray, update_data: dict[str, float]) -> None:
+    def screen_size(self) -> tuple[int, int] | None:
+        """
+        :return: the (width, height) of the gui screen or None if gui is not shown
+        """
+        return self.gui_handler.screen_size() if self.show else None
+
+    def is_display_due(self) -> bool:
+        """
+        :return: True if gui is ready for the next frame according to display_fps
+        """
+        if not self.show:
+            return False
+        if self.display_fps is None:
+            return True
+        return time.perf_counter() - self._display_time >= 1 / self.display_fps
+
+    def reserve_display(self) -> bool:
+        """
+        Checks and takes the next gui update at once, so the frames are chosen in one place
+        also if the views are drawn in other threads
+        :return: True if the view of the frame must be drawn and passed to update
+        """
+        with self._display_lock:
+            if not self.is_display_due():
+                return False
+            self._display_time = time.perf_counter()
+            return True
+
+    def _collect_gui_repr(self, gui_repr: dict[str, tp.Any]) -> None:
+        """
+        Adds the values to the pending gui update. Plots get lists of all (time, value) points since
+        the last update, so no points are lost between frames, while other widgets get the latest values
+        """
+        if self._pending_gui_repr is None:
+            self._pending_gui_repr = dict()
+        for name, value in gui_repr.items():
+            if self._gui_names_type.get(name) is gui.WidgetType.Plot:
+                self._pending_gui_repr.setdefault(name, []).append(value)
+            else:
+                self._pending_gui_repr[name] = value
+
+    def update(self, frame: np.ndarray | None, update_data: dict[str, float]) -> None:
+        """
+        :param frame: the view for gui of a frame for which reserve_display returned True, otherwise None
+        :param update_data: the values of the objects
+        """
         if self.show:
-            gui_repr = self.serilizator.gui_out_repr(update_data)
-            self.gui_handler.update(frame, gui_repr)
+            self._collect_gui_repr(self.serilizator.gui_out_repr(update_data))
+            if frame is not None:
+                self.gui_handler.update(frame, self._pending_gui_repr)
+                self._pending_gui_repr = None
         if self.log_path is not None:
             logging_repr = self.serilizator.logger_out_repr(update_data)
             self.log_in_file(logging_repr)
+            if self.rollup_aggregator is not None:
+                self.rollup_aggregator.update(logging_repr)
         if self.telegram_api is not None:
             self.telegram_api.update(update_data)
 
 
 class Monitor:
-    def __init__(self, image_processor: ImageProcessor):
+    def __init__(self, image_processor: FrameSource, shift_downscale: float = 0.25, batch_inference: bool = True,
+                 display_size: tuple[int, int] | None = None):
+        """
+        :param image_processor: the source of frames: ImageProcessor for a camera,
+        VideoFileSource or ImageDirectorySource for recorded footage
+        :param shift_downscale: the factor of frame downsampling for the global shift estimation
+        :param batch_inference: get values of objects of the same class together,
+        so models can process all of them by one call
+        :param display_size: the maximum (width, height) of the view with objects.
+        None means the size of the gui screen in run_loop and the frame resolution otherwise
+        """
         self.vid = image_processor
         self.init_time = time.time()
+        self.frames_counter = 0
+        self.batch_inference = batch_inference
+
+        self.shift_downscale = shift_downscale
+        self.shift_estimator: GlobalShiftEstimator | None = None
+        self.global_shift: TrackingResult | None = None
+        self._base_coordinates: dict[str, tuple[int, int, int, int]] = {}
+        self._residual_offsets: dict[str, tuple[int, int]] = {}
+        self.overlay = OverlayRenderer(display_size=display_size)
+        self.pipeline: Pipeline | None = None
+        # The state of get_values_batch of each class of objects, like the bank of bulbs
+        self._batch_states: dict[type, dict[str, tp.Any]] = {}
+
+    def set_reference(self, frame: np.ndarray, control_objects: tp.Iterable[handlers.ControlObject]) -> None:
+        """
+        Set the reference frame for the global shift estimation.
+        The current coordinates of objects are considered as their coordinates on this frame.
+        If the reference is not set, the first processed frame is used.
+        :param frame: The picture in float (0, 1) or uint8 (0, 255) with shape (height,width, channels)
+        :param control_objects: The objects that controlled under program
+        :return:
+        """
+        self.shift_estimator = GlobalShiftEstimator(frame, downscale=self.shift_downscale)
+        self._base_coordinates = {
+            control_object.name: tuple(int(value) for value in control_object.current_coordinates)
+            for control_object in control_objects
+        }
+        self._residual_offsets = {}
+
+    def _apply_global_shift(self, frame: np.ndarray, control_objects: tp.Iterable[handlers.ControlObject]) -> None:
+        """
+        Estimate one shift of the frame and move all objects by it
+        """
+        if self.shift_estimator is None:
+            self.set_reference(frame, control_objects)
+        self.global_shift = self.shift_estimator.estimate(frame)
+        x_shift, y_shift = self.global_shift.pixel_offset()
+        frame_height, frame_width = frame.shape[:2]
+        for control_object in control_objects:
+            x, y, width, height = self._base_coordinates.setdefault(
+                control_object.name, tuple(int(value) for value in control_object.current_coordinates))
+            x_residual, y_residual = self._residual_offsets.get(control_object.name, (0, 0))
+            x = int(np.clip(x + x_shift + x_residual, 0, frame_width - width))
+            y = int(np.clip(y + y_shift + y_residual, 0, frame_height - height))
+            control_object.current_coordinates = (x, y, width, height)
+
+    def _refine_coordinates(self, control_object: handlers.ControlObject, frame: np.ndarray) -> None:
+        """
+        Search the object around the globally shifted position and remember its own offset
+        """
+        x_shifted, y_shifted = control_object.current_coordinates[:2]
+        self._update_coordinates(control_object, frame)
+        x_residual, y_residual = self._residual_offsets.get(control_object.name, (0, 0))
+        self._residual_offsets[control_object.name] = (
+            x_residual + control_object.current_coordinates[0] - x_shifted,
+            y_residual + control_object.current_coordinates[1] - y_shifted,
+        )
 
     def _update_coordinates(self, control_object: handlers.ControlObject, frame: np.ndarray):
-        control_object.update_similarity(frame)
-        old_similarity = control_object.current_similarity
+        """
+        The tracker searches the whole window in one pass, so one update is enough.
+        It also updates the similarity of the object
+        """
         control_object.update_coordinates(frame)
-        new_similarity = control_object.current_similarity
-
-        while not np.allclose(old_similarity, new_similarity):
-            old_similarity = new_similarity
-            control_object.update_coordinates(frame)
-            new_similarity = control_object.current_similarity
-
-    def _add_numbers(self, frame: np.ndarray, coordinates: tp.Iterable[tuple[int, int, int, int]],
-                    color: tuple[float, float, float] = (1.0, 0, 0), scale: float = 0.7,
-                    thickness: int = 1) -> np.ndarray:
-        shift_y = 20  # Hyperparameter
-        shift_x = 3  # Hyperparameter
-        font = cv2.FONT_HERSHEY_COMPLEX  # Hyperparameter
-        for i, coordinate in enumerate(coordinates):
-            cv2.putText(
-                frame, f"{i + 1}", (coordinate[0] + shift_x, coordinate[1] + shift_y),
-                font, scale, color, thickness)
-        return frame
-
-    def _highlight_boundaries(self, frame: np.ndarray, coordinates: tp.Iterable[tuple[int, int, int, int]],
-                             width=2, color: tuple[float, float, float] = (1.0, 0, 0)) -> np.ndarray:
-        """
-        :param frame: The picture in float (0, 1) with shape (height, width, channels)
-        :param coordinates: the coordinates of all objects
-        :param width: The width of boundary
-        :param color: the color of the boundary in r,g,b normalized (0,1)
-        :return: processed frame
-        """
-        mask = np.zeros_like(frame)
-        for coordinate in coordinates:
-            x1 = coordinate[0]
-            y1 = coordinate[1]
-            x2 = coordinate[2]
-            y2 = coordinate[3]
-            mask[(y1 - width):(y1 + y2 + width), (x1 - width):(x1 + x2 + width)] = 1
-            mask[y1:(y1 + y2), x1:(x1 + x2)] = 0
-        processed_frame = np.where(mask, color, frame)
-        return processed_frame
-
-    def _mark_objects_view(self, frame: np.ndarray, coordinates: tp.Iterable[tuple[int, int, int, int]],
-                          alpha: float = 0.5) -> np.ndarray:
-        """
-        :param frame: The picture in float (0, 1) with shape (height,width, channels)
-        :param coordinates: the coordinates of all objects
-        :param alpha: Transparency factor
-        :return: processed frame
-        """
-        processed_frame = (frame + alpha) / (1 + alpha)
-        mask = np.zeros_like(frame)
-        for coordinate in coordinates:
-            x1 = coordinate[0]
-            y1 = coordinate[1]
-            x2 = coordinate[2]
-            y2 = coordinate[3]
-            mask[y1:(y1 + y2), x1:(x1 + x2)] = 1
-        processed_frame = np.where(mask, frame, processed_frame)
-        return processed_frame
 
     def process_view(self, frame: np.ndarray,
                       control_objects: tp.Iterable[handlers.ControlObject]) -> np.ndarray:
         """
         Process the figure adding boundaries for objects, numbers and highlite objects on a picture
-        :param frame: The picture in float (0, 1) with shape (height,width, channels) in rgb format
+        :param frame: The picture in float (0, 1) or uint8 (0, 255) with shape (height,width, channels)
         :param control_objects: The objects that controlled under program
-        :return:
+        :return: the view in uint8 at display resolution
         """
         coordinates = [control_object.current_coordinates for control_object in control_objects]
-
-        processed_frame = self._mark_objects_view(frame, coordinates)
-        processed_frame = self._highlight_boundaries(processed_frame, coordinates, width=3, color=(1.0, 0, 0))
-        processed_frame = self._add_numbers(processed_frame, coordinates)
-        return processed_frame
+        return self.overlay.render(frame, coordinates)
 
     def process_similarities(self, frame: np.ndarray,
                              control_objects: tp.Iterable[handlers.ControlObject],
-                             update_pos: bool) -> None:
+                             update_pos: bool, global_shift: bool = False) -> None:
         """
         Process the figure adding boundaries for objects, numbers and highlight objects on a picture
-        :param frame: The picture in float (0, 1) with shape (height,width, channels)
+        :param frame: The picture in float (0, 1) or uint8 (0, 255) with shape (height,width, channels)
         :param control_objects: The objects that controlled under program
         :param update_pos: update positions of the objects
+        :param global_shift: estimate one shift of the frame and apply it to all objects.
+        Only objects with similarity below min_similarity are searched separately
         :return:
         """
+        global_shift = update_pos and global_shift
+        if global_shift:
+            self._apply_global_shift(frame, control_objects)
         for control_object in control_objects:
-            if update_pos:
+            if global_shift:
+                control_object.update_similarity(frame)
+                if control_object.current_similarity < control_object.min_similarity:
+                    self._refine_coordinates(control_object, frame)
+            elif update_pos:
                 self._update_coordinates(control_object, frame)
-            control_object.update_similarity(frame)
+            else:
+                control_object.update_similarity(frame)
             similarity = control_object.current_similarity
             if similarity < control_object.min_similarity:
                 warnings.warn(f"similarity for object {control_object.name} is too low {similarity}")
@@ -236,38 +360,160 @@ class Monitor:
         return values
 
     def _get_values(self, frame: np.ndarray,
-                    control_objects: tp.Iterable[handlers.ControlObject]
+                    control_objects: tp.Iterable[handlers.ControlObject],
+                    coordinates: tp.Sequence[tuple[int, int, int, int]] | None = None
                     ) -> dict[str, float]:
-        update_data = {
-            control_object.name: control_object.get_value(frame) for control_object in control_objects}
+        """
+        :param coordinates: the coordinates of the objects on this frame. None means current coordinates
+        """
+        control_objects = list(control_objects)
+        coordinates = [None] * len(control_objects) if coordinates is None else coordinates
+        if not self.batch_inference:
+            update_data = {control_object.name: control_object.get_value(frame, coordinate)
+                           for control_object, coordinate in zip(control_objects, coordinates)}
+            return update_data
+
+        objects_groups: dict[type, list[handlers.ControlObject]] = {}
+        groups_coordinates: dict[type, list[tuple[int, int, int, int] | None]] = {}
+        for control_object, coordinate in zip(control_objects, coordinates):
+            objects_groups.setdefault(type(control_object), []).append(control_object)
+            groups_coordinates.setdefault(type(control_object), []).append(coordinate)
+        values = {}
+        for object_type, objects_group in objects_groups.items():
+            group_coordinates = groups_coordinates[object_type]
+            group_values = object_type.get_values_batch(
+                objects_group, frame, None if group_coordinates[0] is None else group_coordinates,
+                self._batch_states.setdefault(object_type, {}))
+            values.update(zip(map(id, objects_group), group_values))
+        update_data = {control_object.name: values[id(control_object)] for control_object in control_objects}
         return update_data
 
-    def _procces_data(self, control_objects: tp.Iterable[handlers.ControlObject], update_pos: bool
-                      ) -> tuple[np.ndarray, dict[str, float]]:
+    @staticmethod
+    def cache_statistics(control_objects: tp.Iterable[handlers.ControlObject]) -> dict[str, dict[str, float]]:
+        """
+        :param control_objects: The objects that controlled under program
+        :return: hits, misses, hit rate and size of the value cache of each object. It shows how much inference is avoided.
+        Bulbs are not cached with batch_inference, so their counters are zero
+        """
+        return {control_object.name: control_object.value_cache.statistics() for control_object in control_objects}
+
+    def _procces_data(self, control_objects: tp.Iterable[handlers.ControlObject], update_pos: bool,
+                      global_shift: bool = False) -> tuple[np.ndarray, dict[str, float]] | None:
         frame = self.vid.capture_frame()
-        self.process_similarities(frame, control_objects, update_pos)
+        if frame is None:
+            return None
+        self.frames_counter += 1
+        self.process_similarities(frame, control_objects, update_pos, global_shift)
         update_data = self._get_values(frame, control_objects)
         return frame, update_data
 
     def run_loop(self, control_objects: tp.Iterable[handlers.ControlObject],
-                 log_path: None | str | Path=None, show: bool=True, telegram_api: TelegramApi | None=None,
-                 update_pos: bool=True, log_every:int=10) -> None:
+                 log_path: None | str | Path=None, show: bool=True, telegram_api: "TelegramApi | None"=None,
+                 update_pos: bool=True, log_every:int=10, global_shift: bool=False,
+                 display_fps: float | None = 10.0, gui_process: bool = False, log_async: bool = True,
+                 log_format: LogFormat = LogFormat.Tsv, deadbands: dict[str, Deadband] | None = None,
+                 heartbeat: float | None = 600.0, rollups: bool = False, pipelined: bool = False,
+                 render_workers: int = 1, queue_size: int = 2) -> None:
         """
         :param control_objects: The objects that we try to control
         :param show: Show figures with data
         :param telegram_api: telegram_api
         :param update_pos: update positions of the objects
         :param log_every: log every steps
-        :return:
+        :param global_shift: estimate one camera shift per frame for all objects instead of searching each object
+        :param display_fps: the maximum rate of gui updates. Frames between updates are not drawn.
+        None updates gui on every frame
+        :param gui_process: run gui in a separate process fed through shared memory
+        :param log_async: write log rows in a background thread, so short stalls of the disk do not stall the loop.
+        If the queue of rows is full, the loop waits for the writer, so no rows are lost
+        :param log_format: the format of log files. Columnar logs are smaller and can be read by ColumnarLogReader
+        :param deadbands: the deadbands of objects by names for change-only logging. None logs full rows
+        every log_every seconds. See UpdateManager
+        :param heartbeat: the interval in seconds of full rows in change-only logging
+        :param rollups: maintain min, max, mean and count of objects per minute, hour and day.
+        They are read by RollupReader
+        :param pipelined: run capture, tracking, inference, rendering and output in separate threads
+        connected by bounded queues, so the stages of consecutive frames overlap. See _run_pipeline
+        :param render_workers: the number of threads drawing the views in the pipelined mode
+        :param queue_size: the maximum number of frames waiting for each stage in the pipelined mode
+        :return: None. The loop is finished when the source of frames has no more frames
         """
         serilizator = ValueSerializator(control_objects)
         with UpdateManager(serilizator=serilizator,
                            log_path=log_path, show=show, telegram_api=telegram_api,
-                           update_pos=update_pos, log_every=log_every) as manager:
+                           update_pos=update_pos, log_every=log_every, display_fps=display_fps,
+                           gui_process=gui_process, log_async=log_async,
+                           log_format=log_format, deadbands=deadbands, heartbeat=heartbeat,
+                           rollups=rollups) as manager:
+            if show and self.overlay.display_size is None:
+                self.overlay.display_size = manager.screen_size()
+            if pipelined:
+                self._run_pipeline(manager, control_objects, update_pos, global_shift, render_workers, queue_size)
+                return
             while True:
-                frame, update_data = self._procces_data(control_objects, update_pos)
-                proccessed_frame = self.process_view(frame=frame, control_objects=control_objects)
+                result = self._procces_data(control_objects, update_pos, global_shift)
+                if result is None:
+                    break
+                frame, update_data = result
+                # The view is drawn only when gui is ready to show it
+                proccessed_frame = None
+                if manager.reserve_display():
+                    proccessed_frame = self.process_view(frame=frame, control_objects=control_objects)
                 manager.update(proccessed_frame, update_data)
 
+    def _run_pipeline(self, manager: UpdateManager, control_objects: tp.Iterable[handlers.ControlObject],
+                      update_pos: bool, global_shift: bool, render_workers: int = 1, queue_size: int = 2) -> None:
+        """
+        Capture, tracking, inference and rendering work in their own threads, and the output is done
+        in this thread, because gui must be updated from the main thread. Tracking and inference keep the state
+        of objects between frames, so each of them has one worker and gets frames in order.
+        Inference uses the coordinates of its frame, while tracking already moves objects on the next frame.
+        Tracking also decides which frames are shown, so the frames are chosen in order.
+        Rendering has no state, so it can have several workers, each with its own renderer.
+        The outputs are in the order of frames. The pipeline is stopped when the source has no more frames,
+        or on any exception, including KeyboardInterrupt
+        """
+        control_objects = list(control_objects)
+        renderers: queue.SimpleQueue[OverlayRenderer] = queue.SimpleQueue()
+        for _ in range(render_workers):
+            renderers.put(copy.deepcopy(self.overlay))
+
+        def capture() -> np.ndarray | None:
+            frame = self.vid.capture_frame()
+            if frame is not None:
+                self.frames_counter += 1
+            return frame
+
+        def track(frame: np.ndarray) -> tuple[np.ndarray, list[tuple[int, int, int, int]], bool]:
+            self.process_similarities(frame, control_objects, update_pos, global_shift)
+            coordinates = [tuple(control_object.current_coordinates) for control_object in control_objects]
+            return frame, coordinates, manager.reserve_display()
+
+        def infer(item: tuple[np.ndarray, list[tuple[int, int, int, int]], bool]) -> tuple[tp.Any, ...]:
+            frame, coordinates, display = item
+            return frame, coordinates, display, self._get_values(frame, control_objects, coordinates)
+
+        def render(item: tuple[tp.Any, ...]) -> tuple[np.ndarray | None, dict[str, float]]:
+            frame, coordinates, display, update_data = item
+            view = None
+            if display:
+                renderer = renderers.get()
+                try:
+                    # The buffers of the renderer are reused, and the view waits in the queue for the output
+                    view = renderer.render(frame, coordinates).copy()
+                finally:
+                    renderers.put(renderer)
+            return view, update_data
+
+        self.pipeline = Pipeline(capture, [Stage("tracking", track), Stage("inference", infer),
+                                           Stage("rendering", render, render_workers)], queue_size=queue_size)
+        results = iter(self.pipeline)
+        try:
+            for view, update_data in results:
+                manager.update(view, update_data)
+        finally:
+            # The threads are stopped also if the output fails
+            results.close()
+
     def release_camera(self):
         self.vid.release()
@@ -0,0 +1,2 @@
+from .models import BaseProcessModel, BulbBank, BulbModel, LedNumbersModel
+from .sessions import SessionConfig, SessionRegistry
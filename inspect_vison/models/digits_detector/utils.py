@@ -29,20 +29,60 @@ def nms(boxes, scores, iou_threshold):
 
     return keep_boxes
 
-def multiclass_nms(boxes, scores, class_ids, iou_threshold):
+def multiclass_nms(boxes, scores, class_ids, iou_threshold, top_k=None):
+    # Greedy NMS for all classes at once. OpenCV shifts boxes of each class by its own offset,
+    # so boxes of different classes never overlap, and runs one NMS in C++
+    if len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if not hasattr(cv2.dnn, "NMSBoxesBatched"):
+        return multiclass_nms_vectorized(boxes, scores, class_ids, iou_threshold, top_k)
+
+    boxes_xywh = np.concatenate([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]], axis=1).astype(np.float64)
+    score_threshold = float(np.min(scores)) - 1.0
+    indices = cv2.dnn.NMSBoxesBatched(boxes_xywh, scores.astype(np.float32), class_ids.astype(np.int32),
+                                      score_threshold, iou_threshold, top_k=top_k or 0)
+    return np.asarray(indices, dtype=np.int64).reshape(-1)
+
+def multiclass_nms_vectorized(boxes, scores, class_ids, iou_threshold, top_k=None):
+    # Boxes of different classes never suppress each other,
+    # so one pairwise IoU matrix with zeroed cross-class pairs replaces the loop over classes
+    if len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Sort by score and keep only top_k candidates
+    sorted_indices = np.argsort(-scores, kind="stable")
+    if top_k is not None:
+        sorted_indices = sorted_indices[:top_k]
+
+    sorted_boxes = boxes[sorted_indices]
+    sorted_class_ids = class_ids[sorted_indices]
+    ious = compute_pairwise_iou(sorted_boxes)
+    ious[sorted_class_ids[:, None] != sorted_class_ids[None, :]] = 0
+
+    # Each iteration keeps the best remaining box and removes all boxes it suppresses,
+    # so the number of iterations is equal to the number of kept boxes
+    remaining = np.arange(len(sorted_indices))
+    keep_boxes = []
+    while remaining.size > 0:
+        box_id = remaining[0]
+        keep_boxes.append(box_id)
+        remaining = remaining[1:][ious[box_id, remaining[1:]] < iou_threshold]
 
-    unique_class_ids = np.unique(class_ids)
+    return sorted_indices[keep_boxes]
 
-    keep_boxes = []
-    for class_id in unique_class_ids:
-        class_indices = np.where(class_ids == class_id)[0]
-        class_boxes = boxes[class_indices,:]
-        class_scores = scores[class_indices]
+def compute_pairwise_iou(boxes):
+    # IoU of all pairs of boxes in xyxy format
+    xmin = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    ymin = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    xmax = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    ymax = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
 
-        class_keep_boxes = nms(class_boxes, class_scores, iou_threshold)
-        keep_boxes.extend(class_indices[class_keep_boxes])
+    intersection_area = np.maximum(0, xmax - xmin) * np.maximum(0, ymax - ymin)
+    boxes_area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    union_area = boxes_area[:, None] + boxes_area[None, :] - intersection_area
 
-    return keep_boxes
+    return np.divide(intersection_area, union_area,
+                     out=np.zeros_like(intersection_area), where=union_area > 0)
 
 def compute_iou(box, boxes):
     # Compute xmin, ymin, xmax, ymax for both boxes
@@ -1,48 +1,77 @@
 import time
 
-import onnxruntime
 import numpy as np
 import cv2
 
 from . import utils
+from ..sessions import SessionConfig, SessionRegistry, run_in_chunks
 
 class YOLOv8:
 
-    def __init__(self, path, conf_thres=0.7, iou_thres=0.5):
+    def __init__(self, path, conf_thres=0.7, iou_thres=0.5, session_config: SessionConfig | None = None,
+                 top_k=None):
         self.conf_threshold = conf_thres
         self.iou_threshold = iou_thres
-
-        # Initialize model
-        self.initialize_model(path)
+        # Maximum number of candidates passed to NMS. None means all candidates above conf_thres
+        self.top_k = top_k
+        self.path = path
+        self.session_config = session_config
+        # The model is initialized lazily from the shared session registry
+        self.session = None
 
     def __call__(self, image):
         return self.detect_objects(image)
 
-    def initialize_model(self, path):
-        self.session = onnxruntime.InferenceSession(path,
-                                                    providers=onnxruntime.get_available_providers())
+    def initialize_model(self):
+        self.session = SessionRegistry.get_session(self.path, self.session_config)
         # Get model info
         self.get_input_details()
         self.get_output_details()
 
-
     def detect_objects(self, image):
-        input_tensor = self.prepare_input(image)
+        self.img_height, self.img_width = image.shape[:2]
+        # One image is a batch of one, so fixed batch models get it padded like in detect_objects_batch
+        predictions = self.infer_batch([image])[0]
+        self.boxes, self.scores, self.class_ids = self.process_predictions(
+            predictions, self.img_width, self.img_height)
 
-        # Perform inference on the image
-        outputs = self.inference(input_tensor)
+        return self.boxes, self.scores, self.class_ids
 
-        self.boxes, self.scores, self.class_ids = self.process_output(outputs)
+    def detect_objects_batch(self, images):
+        # Detect objects on several images with one inference
+        predictions = self.infer_batch(images)
+        return [self.process_predictions(image_predictions, image.shape[1], image.shape[0])
+                for image_predictions, image in zip(predictions, images)]
 
-        return self.boxes, self.scores, self.class_ids
+    def infer_batch(self, images):
+        # Returns raw predictions with shape (N, candidates, 4 + classes) for N images
+        if self.session is None:
+            self.initialize_model()
+        if len(images) == 0:
+            return np.empty((0, 0, 4 + len(utils.CLASS_NAMES)), dtype=np.float32)
+        input_tensor = self.prepare_batch(images)
+
+        outputs = run_in_chunks(lambda chunk: self.inference(chunk)[0], input_tensor, self.input_batch_size)
+        return outputs.transpose(0, 2, 1)
+
+    def _resize_input(self, image):
+        #input_img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return cv2.resize(image, (self.input_width, self.input_height))
+
+    def prepare_batch(self, images):
+        # Stack resized images in one N x 3 x H x W tensor scaled to 0 to 1
+        input_tensor = np.empty((len(images), 3, self.input_height, self.input_width), dtype=np.float32)
+        for i, image in enumerate(images):
+            input_tensor[i] = self._resize_input(image).transpose(2, 0, 1)
+        input_tensor *= np.float32(1 / 255.0)
+        return input_tensor
 
     def prepare_input(self, image):
         self.img_height, self.img_width = image.shape[:2]
-        #input_img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         input_img = image
 
         # Resize input image
-        input_img = cv2.resize(input_img, (self.input_width, self.input_height))
+        input_img = self._resize_input(input_img)
 
         # Scale input pixel values to 0 to 1
         input_img = input_img / 255.0
@@ -61,7 +90,9 @@ class YOLOv8:
 
     def process_output(self, output):
         predictions = np.squeeze(output[0]).T
+        return self.process_predictions(predictions, self.img_width, self.img_height)
 
+    def process_predictions(self, predictions, img_width, img_height):
         # Filter out object confidence scores below threshold
         scores = np.max(predictions[:, 4:], axis=1)
         predictions = predictions[scores > self.conf_threshold, :]
@@ -74,32 +105,34 @@ class YOLOv8:
         class_ids = np.argmax(predictions[:, 4:], axis=1)
 
         # Get bounding boxes for each object
-        boxes = self.extract_boxes(predictions)
+        boxes = self.extract_boxes(predictions, img_width, img_height)
 
         # Apply non-maxima suppression to suppress weak, overlapping bounding boxes
         # indices = nms(boxes, scores, self.iou_threshold)
-        indices = utils.multiclass_nms(boxes, scores, class_ids, self.iou_threshold)
+        indices = utils.multiclass_nms(boxes, scores, class_ids, self.iou_threshold, self.top_k)
 
         return boxes[indices], scores[indices], class_ids[indices]
 
-    def extract_boxes(self, predictions):
+    def extract_boxes(self, predictions, img_width=None, img_height=None):
         # Extract boxes from predictions
         boxes = predictions[:, :4]
 
         # Scale boxes to original image dimensions
-        boxes = self.rescale_boxes(boxes)
+        boxes = self.rescale_boxes(boxes, img_width, img_height)
 
         # Convert boxes to xyxy format
         boxes = utils.xywh2xyxy(boxes)
 
         return boxes
 
-    def rescale_boxes(self, boxes):
+    def rescale_boxes(self, boxes, img_width=None, img_height=None):
+        img_width = self.img_width if img_width is None else img_width
+        img_height = self.img_height if img_height is None else img_height
 
         # Rescale boxes to original image dimensions
         input_shape = np.array([self.input_width, self.input_height, self.input_width, self.input_height])
         boxes = np.divide(boxes, input_shape, dtype=np.float32)
-        boxes *= np.array([self.img_width, self.img_height, self.img_width, self.img_height])
+        boxes *= np.array([img_width, img_height, img_width, img_height])
         return boxes
 
     def draw_detections(self, image, draw_scores=True, mask_alpha=0.4):
@@ -112,6 +145,8 @@ class YOLOv8:
         self.input_names = [model_inputs[i].name for i in range(len(model_inputs))]
 
         self.input_shape = model_inputs[0].shape
+        # The batch dimension is a string or None for models exported with dynamic batch
+        self.input_batch_size = self.input_shape[0] if isinstance(self.input_shape[0], int) else None
         self.input_height = self.input_shape[2]
         self.input_width = self.input_shape[3]
 
@@ -1,10 +1,16 @@
 from abc import ABC, abstractmethod
 import typing as tp
-from matplotlib import pyplot as plt
+import warnings
+from pathlib import Path
 
 import numpy as np
 
 from . import digits_detector
+from . import numbers_processing
+from .sessions import SessionConfig
+from ..processing.image_processing import normalize_image, to_uint8_image
+
+DigitsDetectorPath = Path(__file__).parent / "digits_detector" / "yolo_digits.onnx"
 
 
 class BaseProcessModel:
@@ -22,17 +28,16 @@ class BaseProcessModel:
 
     def _init_transforms(self, image: np.ndarray) -> np.ndarray:
         """
-        :param image:  the image with shape (height, width, channels) in (0, 1)
+        :param image:  the image with shape (height, width, channels) in float (0, 1) or uint8 (0, 255)
         :return: transformed image with shape (channels, height, width) in (-0.5, 0.5)
         """
-        transformed_image= image.copy()
+        transformed_image = normalize_image(image) - 0.5
         transformed_image = np.moveaxis(transformed_image, -1, 0)
-        transformed_image -= 0.5
         return transformed_image
 
     def __call__(self, image: np.ndarray) -> tp.Any:
         """
-        :param image: the image with shape (height, width, channels) in (0, 1)
+        :param image: the image with shape (height, width, channels) in float (0, 1) or uint8 (0, 255)
         :return: the value of the object
         """
         transformed_image = self._init_transforms(image)
@@ -55,12 +60,11 @@ class BulbModel(BaseProcessModel):
 
     def _init_transforms(self, image: np.ndarray) -> np.ndarray:
         """
-        :param image:  the image with shape (height, width, channels) in (0, 1)
+        :param image:  the image with shape (height, width, channels) in float (0, 1) or uint8 (0, 255)
         :return: transformed image with shape (height, width) in (-0.5, 0.5)
         """
-        transformed_image = image.copy()
+        transformed_image = normalize_image(image) - 0.5
         transformed_image = np.moveaxis(transformed_image, -1, 0)
-        transformed_image = transformed_image - 0.5
         return self._get_bright_picture(transformed_image)
 
     def _get_rel_bright(self, image: np.ndarray) -> float:
@@ -83,14 +87,108 @@ class BulbModel(BaseProcessModel):
             return -margin > self.limit_margin
 
 
+class BulbBank:
+    """
+    The evaluation of many bulbs by one numpy pass over the frame. The pixels of all rois are gathered
+    by precomputed flat indices, and the brightness ranges of the rois are found by reduceat.
+    It gives the same states as BulbModel of each bulb
+    """
+    Coefficients = np.array([BulbModel.RED_COEFF, BulbModel.GREEN_COEFF, BulbModel.BLUE_COEFF], dtype=np.float32)
+
+    def __init__(self, bulb_models: tp.Sequence[BulbModel]):
+        """
+        :param bulb_models: the models of the bulbs
+        """
+        self.bulb_models = tuple(bulb_models)
+        self.init_rel_bright = np.array([model.init_rel_bright for model in self.bulb_models], dtype=np.float32)
+        self.limit_margin = np.array([model.limit_margin for model in self.bulb_models], dtype=np.float32)
+        self.init_value = np.array([bool(model.init_value) for model in self.bulb_models])
+        self._coordinates: tuple[tuple[int, int, int, int], ...] | None = None
+        self._frame_shape: tuple[int, ...] | None = None
+        self._flat_indices = np.empty(0, dtype=np.intp)
+        self._offsets = np.empty(0, dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.bulb_models)
+
+    def set_coordinates(self, coordinates: tp.Sequence[tuple[int, int, int, int]], frame_shape: tuple[int, ...]):
+        """
+        Precompute the flat indices of the rois pixels. Rois are clipped by the frame as slices do
+        :param coordinates: the coordinates (x, y, width, height) of the bulbs
+        :param frame_shape: the shape of the frame (height, width, channels)
+        """
+        height, width = frame_shape[:2]
+        indices = []
+        sizes = []
+        for x, y, w, h in coordinates:
+            rows = np.arange(max(y, 0), min(y + h, height))
+            columns = np.arange(max(x, 0), min(x + w, width))
+            if rows.size == 0 or columns.size == 0:
+                raise ValueError(f"The roi {(x, y, w, h)} is outside the frame")
+            indices.append((rows[:, np.newaxis] * width + columns).ravel())
+            sizes.append(rows.size * columns.size)
+        self._flat_indices = np.concatenate(indices)
+        self._offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        self._coordinates = tuple(tuple(coordinate) for coordinate in coordinates)
+        self._frame_shape = tuple(frame_shape)
+
+    def brightness_ranges(self, frame: np.ndarray) -> np.ndarray:
+        """
+        :param frame: the picture from the camera with shape (height, width, channels)
+        in float (0, 1) or uint8 (0, 255). The coordinates must be set
+        :return: the difference between max brightness and min brightness of each roi
+        """
+        pixels = frame.reshape(-1, frame.shape[-1])[self._flat_indices]
+        bright = pixels.astype(np.float32, copy=False) @ self.Coefficients
+        ranges = np.maximum.reduceat(bright, self._offsets) - np.minimum.reduceat(bright, self._offsets)
+        if frame.dtype == np.uint8:
+            ranges *= np.float32(1 / 255)
+        return ranges
+
+    def __call__(self, frame: np.ndarray, coordinates: tp.Sequence[tuple[int, int, int, int]]) -> np.ndarray:
+        """
+        :param frame: the picture from the camera with shape (height, width, channels)
+        in float (0, 1) or uint8 (0, 255)
+        :param coordinates: the coordinates (x, y, width, height) of the bulbs.
+        The indices are recomputed only if the coordinates are changed
+        :return: the states of the bulbs: False if OFF, True if ON
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=bool)
+        coordinates = tuple(tuple(coordinate) for coordinate in coordinates)
+        if coordinates != self._coordinates or frame.shape != self._frame_shape:
+            self.set_coordinates(coordinates, frame.shape)
+        margin = self.init_rel_bright - self.brightness_ranges(frame)
+        return np.where(self.init_value, margin < self.limit_margin, -margin > self.limit_margin)
+
+
 class LedNumbersModel(BaseProcessModel):
     """
     Models for detection the 7-segments digits. Usually it works fine on any kind of "accurate" digits.
     """
-    def __init__(self, init_value: float, init_image: np.ndarray):
+    def __init__(self, init_value: float, init_image: np.ndarray, model_path: str | Path = DigitsDetectorPath,
+                 session_config: SessionConfig | None = None, fast_decoder: bool = True,
+                 min_confidence: float = 0.6):
+        """
+        :param init_value: the value on init image
+        :param init_image: the image of the display
+        :param model_path: path to the onnx model of digits detector
+        :param session_config: the config of onnxruntime session. All models with the same path and config
+        share one session
+        :param fast_decoder: read the display with the classical seven-segment decoder first
+        and use the detector only if the decoder is not confident. The decoder is switched off
+        if it can not read init_value on init_image
+        :param min_confidence: the minimum confidence of the decoder to accept its reading
+        """
         super().__init__(init_value, init_image)
-        path = "inspect_vision/models/digits_detector/yolo_digits.onnx"
-        self.yolov8_detector = digits_detector.YOLOv8(path, conf_thres=0.2, iou_thres=0.3)
+        self.yolov8_detector = digits_detector.YOLOv8(model_path, conf_thres=0.2, iou_thres=0.3,
+                                                      session_config=session_config)
+        self.min_confidence = min_confidence
+        self.segment_decoder = numbers_processing.SevenSegmentDecoder() if fast_decoder else None
+        if self.segment_decoder is not None:
+            number, _ = self.segment_decoder(self._init_transforms(init_image))
+            if number != str(init_value):
+                self.segment_decoder = None
 
         if self(init_image) != str(init_value):
             warnings.warn("The wrong determination of digits on a picture. Reprocess image")
@@ -98,22 +196,68 @@ class LedNumbersModel(BaseProcessModel):
 
     def _init_transforms(self, image: np.ndarray, height: int=200) -> np.ndarray:
         """
-        :param image:  the image with shape (height, width, channels) in (0, 1)
+        :param image:  the image with shape (height, width, channels) in float (0, 1) or uint8 (0, 255)
         :param height:  the height of image for transformation
-        :return: transformed image with shape (height, width, channels) in (0, 1)
+        :return: transformed image with shape (height, width, channels) in uint8 (0, 255)
         """
-        transformed_image = (image.copy() * 255).astype(np.uint8)
-        return transformed_image
+        return to_uint8_image(image)
+
+    def _decode(self, image: np.ndarray) -> str | None:
+        """
+        :param image: the image with shape (height, width, channels) in uint8 (0, 255)
+        :return: the number read by the seven-segment decoder or None if the reading is not confident
+        """
+        if self.segment_decoder is None:
+            return None
+        number, confidence = self.segment_decoder(image)
+        if confidence < self.min_confidence:
+            return None
+        return number
 
     def forward(self, image: np.ndarray) -> str:
-        print(image.shape)
-        plt.imshow(image)
-        plt.show()
+        number = self._decode(image)
+        if number is not None:
+            return number
         boxes, _, class_ids = self.yolov8_detector(image)
+        return self._get_number(boxes, class_ids)
+
+    @staticmethod
+    def _get_number(boxes: tp.Sequence[np.ndarray], class_ids: tp.Sequence[int]) -> str:
+        """
+        :param boxes: boxes of the detected digits in xyxy format
+        :param class_ids: classes of the detected digits
+        :return: the number composed from the digits from left to right
+        """
         positions = [box[0] for box in boxes]
-        number = "".join([digits_detector.CLASS_NAMES[class_id] for _, class_id in sorted(zip(positions, class_ids))])
-        print(number)
-        print(1)
-        return number
+        return "".join([digits_detector.CLASS_NAMES[class_id] for _, class_id in sorted(zip(positions, class_ids))])
+
+    @staticmethod
+    def forward_batch(led_models: tp.Sequence["LedNumbersModel"], images: tp.Sequence[np.ndarray]) -> list[str]:
+        """
+        Recognize the numbers of several displays. Models with the same shared session are processed
+        by one inference, and each model applies its own thresholds to its part of the output.
+        Displays confidently read by the seven-segment decoder are not passed to the detector.
+        :param led_models: the models of the displays
+        :param images: the images of the displays with shape (height, width, channels)
+        in float (0, 1) or uint8 (0, 255). One image for each model
+        :return: the numbers of the displays
+        """
+        transformed_images = [model._init_transforms(image) for model, image in zip(led_models, images)]
+        numbers = [model._decode(image) for model, image in zip(led_models, transformed_images)]
+        groups: dict[tuple, list[int]] = {}
+        for i, model in enumerate(led_models):
+            if numbers[i] is not None:
+                continue
+            detector = model.yolov8_detector
+            groups.setdefault((str(detector.path), detector.session_config), []).append(i)
+
+        for indexes in groups.values():
+            group_images = [transformed_images[i] for i in indexes]
+            predictions = led_models[indexes[0]].yolov8_detector.infer_batch(group_images)
+            for i, image_predictions, image in zip(indexes, predictions, group_images):
+                boxes, _, class_ids = led_models[i].yolov8_detector.process_predictions(
+                    image_predictions, image.shape[1], image.shape[0])
+                numbers[i] = led_models[i]._get_number(boxes, class_ids)
+        return numbers
 
 
@@ -1,13 +1,13 @@
 import typing as tp
 
 import numpy as np
-import matplotlib.pyplot as plt
 import cv2
-import onnxruntime
 
 import imutils
 from imutils import contours
 
+from .sessions import SessionConfig, SessionRegistry, run_in_chunks
+
 def get_thresh_image(image: np.ndarray, marker_regime="auto") -> np.ndarray:
     """
     Make image intensive and
@@ -66,6 +66,8 @@ def find_contours(erosion: np.ndarray) -> list[np.ndarray]:
         if w >= w_image // 100 and (h_image // 2 <= h <= h_image):
             digitCnts.append(c)
             #image_w_bbox = cv2.rectangle(image_w_bbox, (x, y), (x + w, y + h), (0, 255, 0), 2.jpg)
+    if not digitCnts:
+        return []
     digitCnts = contours.sort_contours(digitCnts, method="left-to-right")[0]
     #return image_w_bbox, digitCnts
     return digitCnts
@@ -88,17 +90,223 @@ def pad_image(roi: np.ndarray):
     return roi
 
 
+# Segments are ordered as a, b, c, d, e, f, g:
+#  aaa
+# f   b
+#  ggg
+# e   c
+#  ddd
+SegmentsDigits = {
+    (1, 1, 1, 1, 1, 1, 0): "0",
+    (0, 1, 1, 0, 0, 0, 0): "1",
+    (1, 1, 0, 1, 1, 0, 1): "2",
+    (1, 1, 1, 1, 0, 0, 1): "3",
+    (0, 1, 1, 0, 0, 1, 1): "4",
+    (1, 0, 1, 1, 0, 1, 1): "5",
+    (1, 0, 1, 1, 1, 1, 1): "6",
+    (0, 0, 1, 1, 1, 1, 1): "6",
+    (1, 1, 1, 0, 0, 0, 0): "7",
+    (1, 1, 1, 0, 0, 1, 0): "7",
+    (1, 1, 1, 1, 1, 1, 1): "8",
+    (1, 1, 1, 1, 0, 1, 1): "9",
+    (1, 1, 1, 0, 0, 1, 1): "9",
+}
+
+# Sampling regions of segments relatively to the digit box: (x_start, x_end, y_start, y_end, horizontal)
+SegmentsRegions = (
+    (0.3, 0.7, 0.0, 0.2, True),
+    (0.6, 1.0, 0.15, 0.4, False),
+    (0.6, 1.0, 0.6, 0.85, False),
+    (0.3, 0.7, 0.8, 1.0, True),
+    (0.0, 0.4, 0.6, 0.85, False),
+    (0.0, 0.4, 0.15, 0.4, False),
+    (0.3, 0.7, 0.4, 0.6, True),
+)
+
+
+def deskew_image(thresh: np.ndarray, max_slant: float = 0.4, steps: int = 9) -> np.ndarray:
+    """
+    Remove the slant of digits. The slant is chosen as the shear that makes the vertical projection of the image
+    the sharpest, because then the vertical segments fall into the same columns
+    :param thresh: thresh image in the format: height, width in uint8 from 0 to 255 with white digits
+    :param max_slant: the maximum searched shear, the ratio of horizontal shift to height
+    :param steps: the number of searched shears
+    :return: the image with vertical digits and the same shape
+    """
+    height, width = thresh.shape
+    center_y = height / 2
+    best_sharpness = -1.0
+    best_image = thresh
+    for slant in np.linspace(-max_slant, max_slant, steps):
+        matrix = np.float32([[1, slant, -slant * center_y], [0, 1, 0]])
+        sheared = cv2.warpAffine(thresh, matrix, (width, height), flags=cv2.WARP_INVERSE_MAP | cv2.INTER_NEAREST)
+        projection = sheared.sum(axis=0, dtype=np.float64)
+        sharpness = float(np.dot(projection, projection))
+        if sharpness > best_sharpness:
+            best_sharpness = sharpness
+            best_image = sheared
+    return best_image
+
+
+def read_segments(digit: np.ndarray, margin: float = 0.3) -> tuple[tuple[int, ...], float]:
+    """
+    :param digit: thresh image of one digit in the format: height, width in uint8 from 0 to 255 with white segments
+    :param margin: the segment is read with full confidence if its lit fraction differs from 0.5 more than margin
+    :return: states of segments a, b, c, d, e, f, g and confidence of the reading in range (0, 1)
+    """
+    h, w = digit.shape
+    states = []
+    confidences = []
+    for x_start, x_end, y_start, y_end, horizontal in SegmentsRegions:
+        region = digit[int(y_start * h): max(int(y_end * h), int(y_start * h) + 1),
+                       int(x_start * w): max(int(x_end * w), int(x_start * w) + 1)] > 0
+        # Horizontal segments cross the columns of the region, vertical segments cross the rows
+        lit_lines = region.any(axis=0) if horizontal else region.any(axis=1)
+        fraction = float(lit_lines.mean())
+        states.append(int(fraction > 0.5))
+        confidences.append(min(abs(fraction - 0.5) / margin, 1.0))
+    return tuple(states), min(confidences)
+
+
+def read_digit(digit: np.ndarray, one_ratio: float = 0.4) -> tuple[str, float]:
+    """
+    :param digit: thresh image of one digit in the format: height, width in uint8 from 0 to 255 with white segments
+    :param one_ratio: digits with the ratio of width to height less than it are considered as 1
+    :return: the digit and confidence of the reading in range (0, 1). Unknown digits have confidence 0
+    """
+    h, w = digit.shape
+    if w < one_ratio * h:
+        lit_rows = (digit > 0).any(axis=1).mean()
+        return "1", float(np.clip((lit_rows - 0.5) / 0.3, 0, 1))
+    states, confidence = read_segments(digit)
+    if states not in SegmentsDigits:
+        return "", 0.0
+    return SegmentsDigits[states], confidence
+
+
+class SevenSegmentDecoder:
+    """
+    Classical reader of seven-segment displays. It thresholds the image, finds digits by contours
+    and reads each digit from the states of its seven segments. It is much faster than neural network,
+    so it can be used as the first tier, and the network is called only if the confidence is low.
+    """
+    def __init__(self, height: int = 100, marker_regime: str = "auto", deskew: bool = True):
+        """
+        :param height: the height which the image is resized to
+        :param marker_regime: reverse, direct, auto. See get_thresh_image
+        :param deskew: remove the slant of digits before reading
+        """
+        self.height = height
+        self.marker_regime = marker_regime
+        self.deskew = deskew
+
+    def _find_digit_boxes(self, thresh: np.ndarray) -> list[tuple[int, int, int, int]]:
+        erosion = erode_image(thresh, max(self.height // 10, 4))
+        return [cv2.boundingRect(c) for c in find_contours(erosion)]
+
+    def _find_marks(self, thresh: np.ndarray, digit_boxes: list[tuple[int, int, int, int]]
+                    ) -> list[tuple[float, str]]:
+        """
+        :return: positions and symbols of decimal points and minus signs
+        """
+        h_image = thresh.shape[0]
+        digit_height = np.median([h for _, _, _, h in digit_boxes])
+        digit_top = min(y for _, y, _, _ in digit_boxes)
+        digit_bottom = max(y + h for _, y, _, h in digit_boxes)
+        cnts = imutils.grab_contours(cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE))
+        marks = []
+        for c in cnts:
+            (x, y, w, h) = cv2.boundingRect(c)
+            if h >= digit_height / 4 or w >= digit_height / 2 or w * h < (h_image / 50) ** 2:
+                continue
+            center_x = x + w / 2
+            if any(bx <= center_x <= bx + bw for bx, _, bw, _ in digit_boxes):
+                continue
+            center_y = y + h / 2
+            # Decimal points are at the bottom between digits, minus is in the middle before digits
+            between_digits = digit_boxes[0][0] < center_x < digit_boxes[-1][0]
+            before_digits = center_x < digit_boxes[0][0]
+            if w < 2 * h and between_digits and center_y > digit_bottom - digit_height / 4:
+                marks.append((center_x, "."))
+            elif w >= 2 * h and before_digits and abs(center_y - (digit_top + digit_bottom) / 2) < digit_height / 8:
+                marks.append((center_x, "-"))
+        return marks
+
+    def __call__(self, image: np.ndarray) -> tuple[str, float]:
+        """
+        :param image: image in the format: height, width, channel, in uint8 from 0 to 255
+        :return: the number and confidence of the reading in range (0, 1)
+        """
+        image = imutils.resize(image, height=self.height)
+        thresh = get_thresh_image(image, self.marker_regime)
+        digit_boxes = self._find_digit_boxes(thresh)
+        if not digit_boxes:
+            return "", 0.0
+        if self.deskew:
+            thresh = deskew_image(thresh)
+            digit_boxes = self._find_digit_boxes(thresh)
+            if not digit_boxes:
+                return "", 0.0
+
+        symbols = []
+        confidences = []
+        for x, y, w, h in digit_boxes:
+            digit, confidence = read_digit(thresh[y: y + h, x: x + w])
+            symbols.append((x + w / 2, digit))
+            confidences.append(confidence)
+        symbols.extend(self._find_marks(thresh, digit_boxes))
+        number = "".join(symbol for _, symbol in sorted(symbols))
+        return number, min(confidences)
+
+
 class DigitClassifierModel:
     """
     model for classification numbers
     """
-    def __init__(self, path, shape: tuple):
+    def __init__(self, path, shape: tuple, session_config: SessionConfig | None = None, debug: bool = False):
         """
         :param path: path to onnx model to recognize digits
         :param shape: shape of input image
+        :param session_config: the config of onnxruntime session. The session is shared with the same path and config
+        :param debug: show each classified roi
         """
-        self.session = onnxruntime.InferenceSession(path, None)
+        self.session = SessionRegistry.get_session(path, session_config)
         self.shape = shape
+        self.debug = debug
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        # The batch dimension is a string or None for models exported with dynamic batch
+        self.input_batch_size = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def prepare_batch(self, rois: tp.Sequence[np.ndarray]) -> np.ndarray:
+        """
+        :param rois: rois of the digits. They must be 0, 255 images in shape (height, width)
+        :return: binary tensor with shape (N, *shape[1:]) in float32
+        """
+        batch = np.stack(rois).reshape(len(rois), *self.shape[1:])
+        return (batch >= 255 / 2).astype(np.float32)
+
+    def classify_batch(self, rois: tp.Sequence[np.ndarray]) -> list[int]:
+        """
+        Classify several digits by one inference
+        :param rois: rois of the digits. They must be 0, 255 images in shape (height, width).
+        height should be equal to width and interpolated to 28 size
+        :return: digits
+        """
+        if len(rois) == 0:
+            return []
+        input_tensor = self.prepare_batch(rois)
+        if self.debug:
+            import matplotlib.pyplot as plt
+            for roi in input_tensor:
+                plt.imshow(roi[0])
+                plt.show()
+
+        predictions = run_in_chunks(
+            lambda chunk: self.session.run([self.output_name], {self.input_name: chunk})[0].reshape(len(chunk), -1),
+            input_tensor, self.input_batch_size)
+        return np.argmax(predictions, axis=1).tolist()
 
     def __call__(self, roi: np.ndarray) -> int:
         """
@@ -106,36 +314,54 @@ class DigitClassifierModel:
         height should be equal to width and interpolated to 28 size
         :return: digit
         """
-        roi = roi.astype(np.float32)
-        roi[roi < 255 / 2] = 0.0
-        roi[roi >= 255 / 2] = 1.0
-        roi = np.resize(roi, new_shape=self.shape)
-        plt.imshow(roi[0, 0])
-        plt.show()
-        input_name = self.session.get_inputs()[0].name
-        output_name = self.session.get_outputs()[0].name
-        result = self.session.run([output_name], {input_name: roi})
-        prediction = int(np.argmax(np.array(result).squeeze(), axis=0))
-        print(prediction)
-        return prediction
+        return self.classify_batch([roi])[0]
 
 
-def get_digits(digitCnts: list[np.ndarray], erosion: np.ndarray, classifier: tp.Callable) -> list[int]:
+def get_digit_rois(digitCnts: list[np.ndarray], erosion: np.ndarray) -> list[np.ndarray]:
     """
     :param digitCnts: contour with digit
     :param erosion: eroded image with black digit on white background
-    :param classifier: model that classifies digits
-    :return: classified digits
+    :return: padded rois of the digits resized to 28 x 28
     """
-    digits = []
+    rois = []
     for c in digitCnts:
         (x, y, w, h) = cv2.boundingRect(c)
         roi = erosion[y:y + h, x:x + w]
         roi = pad_image(roi)
         roi = cv2.resize(roi, dsize=(28, 28), interpolation=cv2.INTER_AREA)
-        number = classifier(roi)
-        digits.append(number)
-    return digits
+        rois.append(roi)
+    return rois
+
+
+def get_digits(digitCnts: list[np.ndarray], erosion: np.ndarray, classifier: tp.Callable) -> list[int]:
+    """
+    :param digitCnts: contour with digit
+    :param erosion: eroded image with black digit on white background
+    :param classifier: model that classifies digits. If it has classify_batch, all digits are classified at once
+    :return: classified digits
+    """
+    rois = get_digit_rois(digitCnts, erosion)
+    if hasattr(classifier, "classify_batch"):
+        return classifier.classify_batch(rois)
+    return [classifier(roi) for roi in rois]
+
+
+def get_digits_batch(displays: tp.Sequence[tuple[list[np.ndarray], np.ndarray]],
+                     classifier: DigitClassifierModel) -> list[list[int]]:
+    """
+    Classify the digits of several displays by one inference
+    :param displays: pairs of digit contours and eroded image for each display
+    :param classifier: model that classifies digits
+    :return: classified digits for each display
+    """
+    displays_rois = [get_digit_rois(digitCnts, erosion) for digitCnts, erosion in displays]
+    digits = classifier.classify_batch([roi for rois in displays_rois for roi in rois])
+    result = []
+    start = 0
+    for rois in displays_rois:
+        result.append(digits[start: start + len(rois)])
+        start += len(rois)
+    return result
 
 def main():
     image = cv2.imread("test_pictures/digit_numbers_led_3")
@@ -143,7 +369,7 @@ def main():
     image = imutils.resize(image, height=height)
     thresh = get_thresh_image(image)
     erosion = erode_image(thresh, height // 50)
-    box, contiurs = find_contours(erosion)
+    contiurs = find_contours(erosion)
 
     path = "onnx_models/DigitClassifier.onnx"
     shape = (1, 1, 28, 28)
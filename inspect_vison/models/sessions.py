@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from pathlib import Path
+import threading
+import typing as tp
+
+import numpy as np
+
+GraphOptimizationLevels = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+@dataclass(frozen=True)
+class SessionConfig:
+    """
+    providers: onnxruntime execution providers. If None, all available providers are used
+    intra_op_num_threads: threads inside one operator. 0 means onnxruntime default
+    inter_op_num_threads: threads between operators. 0 means onnxruntime default
+    graph_optimization_level: disable, basic, extended or all
+    """
+    providers: tuple[str, ...] | None = None
+    intra_op_num_threads: int = 0
+    inter_op_num_threads: int = 0
+    graph_optimization_level: str = "all"
+
+    def __post_init__(self):
+        if self.graph_optimization_level not in GraphOptimizationLevels:
+            raise ValueError(f"graph_optimization_level must be one of {list(GraphOptimizationLevels)}")
+        if self.providers is not None:
+            object.__setattr__(self, "providers", tuple(self.providers))
+
+
+class SessionRegistry:
+    """
+    Process-wide cache of onnxruntime sessions keyed by the model path and the session config.
+    All models with the same path and config share one session, so the weights are loaded once.
+    The session is created lazily on the first request. InferenceSession.run is thread-safe,
+    so the shared session can be used from several threads.
+    """
+    default_config = SessionConfig()
+    _sessions: dict[tuple[str, SessionConfig], tp.Any] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls, path: str | Path, config: SessionConfig | None = None):
+        """
+        :param path: path to onnx model
+        :param config: the session config. If None, default_config is used
+        :return: the shared onnxruntime.InferenceSession
+        """
+        config = cls.default_config if config is None else config
+        key = (str(Path(path).resolve()), config)
+        with cls._lock:
+            session = cls._sessions.get(key)
+            if session is None:
+                session = cls._create_session(key[0], config)
+                cls._sessions[key] = session
+        return session
+
+    @staticmethod
+    def _create_session(path: str, config: SessionConfig):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = config.intra_op_num_threads
+        options.inter_op_num_threads = config.inter_op_num_threads
+        options.graph_optimization_level = getattr(
+            onnxruntime.GraphOptimizationLevel, GraphOptimizationLevels[config.graph_optimization_level])
+        providers = config.providers
+        if providers is None:
+            providers = onnxruntime.get_available_providers()
+        return onnxruntime.InferenceSession(path, sess_options=options, providers=list(providers))
+
+    @classmethod
+    def sessions_number(cls) -> int:
+        with cls._lock:
+            return len(cls._sessions)
+
+    @classmethod
+    def clear(cls) -> None:
+        """
+        Remove all sessions from the registry. Models that already have sessions keep them
+        """
+        with cls._lock:
+            cls._sessions.clear()
+
+
+def run_in_chunks(run: tp.Callable[[np.ndarray], np.ndarray], input_tensor: np.ndarray,
+                  batch_size: int | None) -> np.ndarray:
+    """
+    Dynamic batch models take all samples at once, fixed batch models take chunks of batch_size,
+    and the last chunk is padded by zeros
+    :param run: the function which returns the output of the model for the chunk, one item per sample
+    :param input_tensor: the samples with shape (N, ...)
+    :param batch_size: the fixed batch size of the model. None means dynamic batch
+    :return: the outputs of the N samples
+    """
+    batch_size = batch_size or len(input_tensor)
+    outputs = []
+    for start in range(0, len(input_tensor), batch_size):
+        chunk = input_tensor[start: start + batch_size]
+        chunk_size = len(chunk)
+        if chunk_size < batch_size:
+            padding = np.zeros((batch_size - chunk_size, *chunk.shape[1:]), dtype=chunk.dtype)
+            chunk = np.concatenate([chunk, padding])
+        outputs.append(run(chunk)[:chunk_size])
+    return np.concatenate(outputs)
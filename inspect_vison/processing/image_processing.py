@@ -1,21 +1,276 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from enum import Enum
+import os
+from pathlib import Path
+import threading
+import time
+import typing as tp
+import warnings
+
 import cv2
 import numpy as np
 
 ExpTime = 1e-7
+FrameDtypes = (np.uint8, np.float32, np.float64)
+
+
+def normalize_image(image: np.ndarray) -> np.ndarray:
+    """
+    Converts the image to float in range (0, 1). It is cheap for small rois, so call it only for crops that need it
+    :param image: the image in uint8 (0, 255) or in float (0, 1)
+    :return: the image in float32 (0, 1) for uint8 input or the same float image
+    """
+    if image.dtype == np.uint8:
+        return image.astype(np.float32) * np.float32(1 / 255)
+    return image
+
+
+def to_uint8_image(image: np.ndarray) -> np.ndarray:
+    """
+    :param image: the image in uint8 (0, 255) or in float (0, 1)
+    :return: the image in uint8 (0, 255). The uint8 image is returned without copying
+    """
+    if image.dtype == np.uint8:
+        return image
+    return np.rint(image * 255).astype(np.uint8)
+
+
+def convert_frame(frame: np.ndarray, frame_dtype: tp.Type[np.generic]) -> np.ndarray:
+    """
+    :param frame: the frame in uint8 (0, 255) as it was read from the camera
+    :param frame_dtype: uint8 to keep frame as it is, float32 or float64 to get values in range (0, 1)
+    :return: converted frame
+    """
+    if frame_dtype is np.uint8:
+        return frame
+    converted_frame = frame.astype(frame_dtype)
+    converted_frame *= frame_dtype(1 / 255)
+    return converted_frame
+
+
+class BufferPolicy(Enum):
+    """
+    Latest: the consumer always gets the newest frame, all older frames are dropped.
+    DropOldest: the consumer gets frames in capture order, the oldest frame is dropped when the buffer is full.
+    """
+    Latest = 0
+    DropOldest = 1
+
+
+class FrameGrabber:
+    """
+    Reads frames in a background thread and keeps the last of them in a ring buffer with capture timestamps.
+    So the processing loop never waits on the camera I/O and the driver buffer never backs up.
+    """
+    def __init__(self, read: tp.Callable[[], tuple[bool, np.ndarray | None]], buffer_size: int = 4,
+                 policy: BufferPolicy = BufferPolicy.Latest, timeout: float = 5.0):
+        """
+        :param read: function that returns the next frame like cv2.VideoCapture.read
+        :param buffer_size: the maximum number of the frames in the ring buffer
+        :param policy: the policy of getting frames from the buffer
+        :param timeout: the maximum time in seconds to wait for a new frame
+        """
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be positive")
+        self._read = read
+        self.policy = policy
+        self.timeout = timeout
+        self.buffer: deque[tuple[float, np.ndarray]] = deque(maxlen=buffer_size)
+        self.dropped_frames = 0
+        self.error: Exception | None = None
+        self._finished = False
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _grab_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                ret, frame = self._read()
+            except Exception as error:
+                # The error is raised in the thread of get, when the buffered frames are returned
+                with self._condition:
+                    self.error = error
+                    self._finished = True
+                    self._condition.notify_all()
+                break
+            timestamp = time.time()
+            with self._condition:
+                if not ret:
+                    self._finished = True
+                    self._condition.notify_all()
+                    break
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped_frames += 1
+                self.buffer.append((timestamp, frame))
+                self._condition.notify_all()
+
+    def get(self) -> tuple[float, np.ndarray] | None:
+        """
+        Waits for a frame that was not returned before.
+        :return: tuple of capture timestamp and frame or None if the stream is finished
+        """
+        with self._condition:
+            ready = self._condition.wait_for(lambda: self.buffer or self._finished, timeout=self.timeout)
+            if not ready:
+                raise TimeoutError("The camera didn't return a frame in time")
+            if not self.buffer:
+                if self.error is not None:
+                    raise self.error
+                return None
+            if self.policy is BufferPolicy.Latest:
+                item = self.buffer[-1]
+                self.dropped_frames += len(self.buffer) - 1
+                self.buffer.clear()
+            else:
+                item = self.buffer.popleft()
+            return item
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.timeout)
+
+
+class FrameSource(ABC):
+    """
+    The source of frames for Monitor. It can be a live camera, a video file or a directory with images.
+    All sources have the same capture_frame / release contract.
+    capture_frame returns None when the source has no more frames.
+    """
+    def __init__(self, threaded: bool=False, buffer_size: int=4, policy: BufferPolicy=BufferPolicy.Latest,
+                 frame_dtype: tp.Type[np.generic]=np.float64):
+        """
+        :param threaded: read frames in the background thread. Then capture_frame returns frames from the ring buffer
+        :param buffer_size: the size of the ring buffer in threaded mode
+        :param policy: the policy of getting frames from the ring buffer in threaded mode
+        :param frame_dtype: the dtype of frames from capture_frame. np.uint8 keeps frames as they are read
+        from the source in range (0, 255). np.float32 and np.float64 give values in range (0, 1)
+        """
+        frame_dtype = np.dtype(frame_dtype).type
+        if frame_dtype not in FrameDtypes:
+            raise ValueError("frame_dtype must be np.uint8, np.float32 or np.float64")
+        self.frame_dtype = frame_dtype
+        self.frame_timestamp: float | None = None
+        self.threaded = threaded
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.grabber: FrameGrabber | None = None
+
+    def _start_grabbing(self) -> None:
+        """
+        Starts the background reading in threaded mode. Subclasses call it when the source is ready
+        """
+        if self.threaded:
+            self.grabber = FrameGrabber(self._read, buffer_size=self.buffer_size, policy=self.policy)
+            self.grabber.start()
+
+    @abstractmethod
+    def _read(self) -> tuple[bool, np.ndarray | None]:
+        """
+        :return: flag of success and frame in BGR color format in uint8 like cv2.VideoCapture.read
+        """
+        pass
+
+    @abstractmethod
+    def check_open(self) -> bool:
+        pass
+
+    def release(self) -> None:
+        if self.grabber is not None:
+            self.grabber.stop()
+
+    def capture_frame(self) -> np.ndarray | None:
+        """
+        :return: frame in BGR color format with shape (height, width, channels).
+        Values are in range (0, 1) for float frame_dtype and in range (0, 255) for uint8 frame_dtype.
+        None if the source has no more frames
+        """
+        frame = self._read_frame()
+        if frame is None:
+            return None
+        return convert_frame(frame, self.frame_dtype)
 
-class ImageProcessor:
+    def capture_255_frame(self) -> np.ndarray | None:
+        """
+        :return: frame in BGR color format with shape (height, width, channels) in values in range (0, 255).
+        None if the source has no more frames
+        """
+        return self._read_frame()
+
+    def _read_frame(self) -> np.ndarray | None:
+        """
+        :return: the fresh frame from the source or from the ring buffer in threaded mode
+        """
+        if self.grabber is None:
+            ret, frame = self._read()
+            self.frame_timestamp = time.time()
+            return frame if ret else None
+        item = self.grabber.get()
+        if item is None:
+            return None
+        self.frame_timestamp, frame = item
+        return frame
+
+
+class FramePacer:
+    """
+    Keeps the frame rate of recorded sources. In max speed mode frames are returned as fast as possible
+    """
+    def __init__(self, fps: float, max_speed: bool=False):
+        """
+        :param fps: frame rate of the source
+        :param max_speed: ignore the frame rate of the source
+        """
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        self.period = 1 / fps
+        self.max_speed = max_speed
+        self._next_time: float | None = None
+
+    def wait(self) -> None:
+        if self.max_speed:
+            return
+        now = time.perf_counter()
+        if self._next_time is None:
+            self._next_time = now
+        delay = self._next_time - now
+        if delay > 0:
+            time.sleep(delay)
+        self._next_time = max(self._next_time, now) + self.period
+
+
+class ImageProcessor(FrameSource):
     _camera_ids = set()
-    def __new__(cls, camera_id: int=1, exp_time: float=ExpTime):
+    def __new__(cls, camera_id: int=1, *args, **kwargs):
         if camera_id in cls._camera_ids:
             raise ValueError("You have already created the ImageProcessor with current id. Please, use it")
         cls._camera_ids.add(camera_id)
         return super().__new__(cls)
 
-    def __init__(self, camera_id:int=1, exp_time:float=ExpTime):
+    def __init__(self, camera_id:int=1, exp_time:float=ExpTime, threaded: bool=False,
+                 buffer_size: int=4, policy: BufferPolicy=BufferPolicy.Latest,
+                 frame_dtype: tp.Type[np.generic]=np.float64):
+        """
+        :param camera_id: id of the camera
+        :param exp_time: exposure time
+        :param threaded: read frames in the background thread. Then capture_frame returns frames from the ring buffer
+        :param buffer_size: the size of the ring buffer in threaded mode
+        :param policy: the policy of getting frames from the ring buffer in threaded mode
+        :param frame_dtype: the dtype of frames from capture_frame. np.uint8 keeps frames as they are read
+        from the camera in range (0, 255). np.float32 and np.float64 give values in range (0, 1)
+        """
+        super().__init__(threaded=threaded, buffer_size=buffer_size, policy=policy, frame_dtype=frame_dtype)
+        self.camera_id = camera_id
         self.__vid = cv2.VideoCapture(camera_id)
         self.exp_time = exp_time
         self._set_properties()
         self._init_capturing()
+        self._start_grabbing()
 
     @property
     def vid(self) -> cv2.VideoCapture:
@@ -38,27 +293,17 @@ class ImageProcessor:
         _, _ = self.vid.read()
         _, _ = self.vid.read()
 
+    def _read(self) -> tuple[bool, np.ndarray | None]:
+        return self.vid.read()
+
     def release(self) -> None:
+        super().release()
         self.__vid.release()
+        self._camera_ids.discard(self.camera_id)
 
     def check_open(self) -> bool:
         return self.__vid.isOpened()
 
-    def capture_frame(self) -> np.ndarray:
-        """
-        :return: frame in RGB color format with shape (width, height, channels) in values in range (0, 1)
-        """
-        _, frame = self.vid.read()
-        frame = frame / 255
-        return frame
-
-    def capture_255_frame(self) -> np.ndarray:
-        """
-        :return: frame in BGR color format with shape (width, height, channels) in values in range (0, 1)
-        """
-        _, frame = self.vid.read()
-        return frame
-
     def show_video(self):
         while True:
             frame = self.capture_255_frame()
@@ -66,16 +311,130 @@ class ImageProcessor:
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
-def select_roi(image_processor: ImageProcessor):
+
+class VideoFileSource(FrameSource):
+    """
+    Replays the recorded video file. It can be used to reprocess archived footage without camera
+    """
+    def __init__(self, path: str | Path, max_speed: bool=False, loop: bool=False, threaded: bool=False,
+                 buffer_size: int=4, policy: BufferPolicy=BufferPolicy.DropOldest,
+                 frame_dtype: tp.Type[np.generic]=np.float64):
+        """
+        :param path: path to the video file
+        :param max_speed: return frames as fast as possible ignoring the frame rate of the video
+        :param loop: start the video from the beginning when it is finished
+        :param threaded: read frames in the background thread. Then capture_frame returns frames from the ring buffer
+        :param buffer_size: the size of the ring buffer in threaded mode
+        :param policy: the policy of getting frames from the ring buffer in threaded mode
+        :param frame_dtype: the dtype of frames from capture_frame
+        """
+        super().__init__(threaded=threaded, buffer_size=buffer_size, policy=policy, frame_dtype=frame_dtype)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"The video file {path} doesn't exist")
+        self.path = Path(path)
+        self.loop = loop
+        self.__vid = cv2.VideoCapture(str(self.path))
+        fps = self.__vid.get(cv2.CAP_PROP_FPS)
+        if not fps or fps <= 0:
+            warnings.warn("The video file doesn't contain the frame rate. I will use 25 fps")
+            fps = 25.0
+        self.fps = fps
+        self.pacer = FramePacer(fps, max_speed=max_speed)
+        self._start_grabbing()
+
+    def _read(self) -> tuple[bool, np.ndarray | None]:
+        self.pacer.wait()
+        ret, frame = self.__vid.read()
+        if not ret and self.loop:
+            self.__vid.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.__vid.read()
+        return ret, frame
+
+    def release(self) -> None:
+        super().release()
+        self.__vid.release()
+
+    def check_open(self) -> bool:
+        return self.__vid.isOpened()
+
+
+class ImageDirectorySource(FrameSource):
+    """
+    Replays the images from the directory in the order of their names
+    """
+    def __init__(self, path: str | Path, fps: float=25.0, max_speed: bool=False, loop: bool=False,
+                 extensions: tp.Iterable[str] | None = None, threaded: bool=False, buffer_size: int=4,
+                 policy: BufferPolicy=BufferPolicy.DropOldest, frame_dtype: tp.Type[np.generic]=np.float64):
+        """
+        :param path: path to the directory with images
+        :param fps: frame rate of the replay
+        :param max_speed: return frames as fast as possible ignoring fps
+        :param loop: start from the first image when all images are returned
+        :param extensions: the extensions of images, for example (".jpg", ".png"). If None all files are read.
+        Files that can not be read as images are skipped and removed from paths. ValueError is raised
+        when no readable files remain
+        :param threaded: read frames in the background thread. Then capture_frame returns frames from the ring buffer
+        :param buffer_size: the size of the ring buffer in threaded mode
+        :param policy: the policy of getting frames from the ring buffer in threaded mode
+        :param frame_dtype: the dtype of frames from capture_frame
+        """
+        super().__init__(threaded=threaded, buffer_size=buffer_size, policy=policy, frame_dtype=frame_dtype)
+        if not os.path.isdir(path):
+            raise NotADirectoryError(f"The directory {path} doesn't exist")
+        self.path = Path(path)
+        self.loop = loop
+        self.paths = self._get_paths(extensions)
+        if not self.paths:
+            raise ValueError(f"The directory {path} doesn't contain images")
+        self.pacer = FramePacer(fps, max_speed=max_speed)
+        self._position = 0
+        self._opened = True
+        self._start_grabbing()
+
+    def _get_paths(self, extensions: tp.Iterable[str] | None) -> list[Path]:
+        paths = sorted(path for path in self.path.iterdir() if path.is_file())
+        if extensions is not None:
+            extensions = {extension.lower() for extension in extensions}
+            paths = [path for path in paths if path.suffix.lower() in extensions]
+        return paths
+
+    def _read(self) -> tuple[bool, np.ndarray | None]:
+        self.pacer.wait()
+        while self._opened:
+            if self._position >= len(self.paths):
+                if not self.loop:
+                    return False, None
+                self._position = 0
+            path = self.paths[self._position]
+            frame = cv2.imread(str(path))
+            if frame is not None:
+                self._position += 1
+                return True, frame
+            warnings.warn(f"The file {path} can not be read as image. I skip it")
+            # The file is not tried again, so the loop over unreadable files is not endless
+            del self.paths[self._position]
+            if not self.paths:
+                raise ValueError(f"The directory {self.path} doesn't contain readable images")
+        return False, None
+
+    def release(self) -> None:
+        self._opened = False
+        super().release()
+
+    def check_open(self) -> bool:
+        return self._opened and (self.loop or self._position < len(self.paths))
+
+
+def select_roi(image_processor: FrameSource):
     """
     Give the interface to point roi on a frame
-    :param image_processor: ImageProcessor instant
-    :return:
+    :param image_processor: ImageProcessor or other FrameSource instant
+    :return: frame in the frame_dtype of image_processor and rois
     """
     frame = image_processor.capture_255_frame()
     rois = cv2.selectROIs("Select Rois", frame)
     frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    frame = frame / 255
+    frame = convert_frame(frame, image_processor.frame_dtype)
     return frame, rois
 
 def main():
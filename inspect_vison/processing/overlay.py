@@ -0,0 +1,129 @@
+import typing as tp
+
+import cv2
+import numpy as np
+
+
+class OverlayRenderer:
+    """
+    Draws the view of the objects on a frame: the frame is faded outside the objects,
+    and the objects have boundaries and numbers. The mask of the objects and the layer of boundaries
+    are cached and rebuilt only if the coordinates are changed. The numbers are antialiased, so they are blended
+    with each frame. The frame is scaled to the display resolution first, and all drawing is done in uint8 buffers
+    which are reused between frames.
+    """
+    def __init__(self, display_size: tuple[int, int] | None = None, alpha: float = 0.5, boundary_width: int = 3,
+                 color: tuple[float, float, float] = (1.0, 0, 0), text_scale: float = 0.7, text_thickness: int = 1):
+        """
+        :param display_size: the maximum (width, height) of the view. The frame is downscaled to fit it keeping
+        the aspect ratio. None means the resolution of the frame
+        :param alpha: Transparency factor of the fading outside the objects
+        :param boundary_width: The width of boundary
+        :param color: the color of boundaries and numbers in the channels order of the frame normalized (0,1)
+        :param text_scale: the scale of the numbers font
+        :param text_thickness: the thickness of the numbers font
+        """
+        self.display_size = display_size
+        self.alpha = alpha
+        self.boundary_width = boundary_width
+        self.color = tuple(int(round(channel * 255)) for channel in color)
+        self.text_scale = text_scale
+        self.text_thickness = text_thickness
+
+        self._key: tuple | None = None
+        self._objects_mask: np.ndarray | None = None
+        self._boundaries_layer: np.ndarray | None = None
+        self._boundaries_mask: np.ndarray | None = None
+        self._display_coordinates: tuple[tuple[int, int, int, int], ...] = ()
+        self._frame_buffer: np.ndarray | None = None
+        # Two output buffers, so the returned view is not overwritten by the next frame while it is displayed
+        self._output_buffers: list[np.ndarray] = []
+        self._output_index = 0
+
+    def get_display_scale(self, frame_shape: tuple[int, ...]) -> float:
+        """
+        :param frame_shape: the shape of the frame (height, width, channels)
+        :return: the factor of frame downscaling to the display resolution. It is not more than 1
+        """
+        if self.display_size is None:
+            return 1.0
+        height, width = frame_shape[:2]
+        return min(self.display_size[0] / width, self.display_size[1] / height, 1.0)
+
+    def _to_display_frame(self, frame: np.ndarray, scale: float) -> np.ndarray:
+        """
+        :param frame: The picture in float (0, 1) or uint8 (0, 255) with shape (height, width, channels)
+        :param scale: the factor of downscaling
+        :return: the frame in uint8 at display resolution. It is written in the reused buffer
+        """
+        if scale < 1.0:
+            height, width = frame.shape[:2]
+            size = (max(int(width * scale), 1), max(int(height * scale), 1))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if self._frame_buffer is None or self._frame_buffer.shape != frame.shape:
+            self._frame_buffer = np.empty(frame.shape, dtype=np.uint8)
+        if frame.dtype == np.uint8:
+            np.copyto(self._frame_buffer, frame)
+        else:
+            cv2.convertScaleAbs(frame, self._frame_buffer, alpha=255.0)
+        return self._frame_buffer
+
+    def _rebuild_layers(self, shape: tuple[int, ...], coordinates: tp.Sequence[tuple[int, int, int, int]]) -> None:
+        """
+        :param shape: the shape of the view (height, width, channels)
+        :param coordinates: the coordinates of all objects at display resolution
+        """
+        width = self.boundary_width
+        self._objects_mask = np.zeros(shape[:2], dtype=np.uint8)
+        self._boundaries_layer = np.zeros(shape, dtype=np.uint8)
+        self._boundaries_mask = np.zeros(shape[:2], dtype=np.uint8)
+        for x, y, w, h in coordinates:
+            cv2.rectangle(self._objects_mask, (x, y), (x + w - 1, y + h - 1), 255, cv2.FILLED)
+        # Boundaries are bands of the given width around the objects
+        for layer, color in ((self._boundaries_layer, self.color), (self._boundaries_mask, 255)):
+            for x, y, w, h in coordinates:
+                cv2.rectangle(layer, (x - width, y - width), (x + w + width - 1, y + h + width - 1), color,
+                              cv2.FILLED)
+                cv2.rectangle(layer, (x, y), (x + w - 1, y + h - 1), 0, cv2.FILLED)
+        self._display_coordinates = tuple(coordinates)
+
+    def _add_numbers(self, view: np.ndarray) -> None:
+        """
+        :param view: the view with boundaries. The numbers of objects are drawn on it
+        """
+        shift_y = 20  # Hyperparameter
+        shift_x = 3  # Hyperparameter
+        font = cv2.FONT_HERSHEY_COMPLEX  # Hyperparameter
+        for i, (x, y, _, _) in enumerate(self._display_coordinates):
+            cv2.putText(view, f"{i + 1}", (x + shift_x, y + shift_y), font, self.text_scale, self.color,
+                        self.text_thickness)
+
+    def _get_output_buffer(self, shape: tuple[int, ...]) -> np.ndarray:
+        if not self._output_buffers or self._output_buffers[0].shape != shape:
+            self._output_buffers = [np.empty(shape, dtype=np.uint8) for _ in range(2)]
+        self._output_index = 1 - self._output_index
+        return self._output_buffers[self._output_index]
+
+    def render(self, frame: np.ndarray, coordinates: tp.Iterable[tuple[int, int, int, int]]) -> np.ndarray:
+        """
+        :param frame: The picture in float (0, 1) or uint8 (0, 255) with shape (height, width, channels)
+        :param coordinates: the coordinates (x, y, width, height) of all objects on the frame
+        :return: the view in uint8 at display resolution. The buffer of the view is reused on the call after next
+        """
+        scale = self.get_display_scale(frame.shape)
+        display_frame = self._to_display_frame(frame, scale)
+        display_coordinates = tuple(
+            tuple(int(round(value * scale)) for value in coordinate[:4]) for coordinate in coordinates)
+        key = (display_frame.shape, display_coordinates)
+        if key != self._key:
+            self._rebuild_layers(display_frame.shape, display_coordinates)
+            self._key = key
+
+        view = self._get_output_buffer(display_frame.shape)
+        # (frame + alpha * 255) / (1 + alpha) outside the objects, the frame itself inside them
+        cv2.addWeighted(display_frame, 1 / (1 + self.alpha), display_frame, 0, 255 * self.alpha / (1 + self.alpha),
+                        dst=view)
+        cv2.copyTo(display_frame, self._objects_mask, view)
+        cv2.copyTo(self._boundaries_layer, self._boundaries_mask, view)
+        self._add_numbers(view)
+        return view
@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+import queue
+import threading
+import time
+import typing as tp
+
+
+@dataclass
+class Stage:
+    """
+    name: the name of the stage in statistics and thread names
+    function: the processing of one item. It gets the result of the previous stage
+    workers: the number of threads of the stage. The stage with one worker gets items in order,
+    so it can keep state between items, like tracking. Stages with more workers get items in any order
+    """
+    name: str
+    function: tp.Callable[[tp.Any], tp.Any]
+    workers: int = 1
+
+
+class _End:
+    """
+    The marker of the end of items
+    """
+    pass
+
+
+class Pipeline:
+    """
+    Stages connected by bounded queues. The source and each stage work in their own threads, so the stages
+    of different items overlap, and the rate is limited by the slowest stage instead of the sum of all of them.
+    OpenCV, numpy and onnxruntime release the GIL, so the stages run on several cores.
+    Each item carries its sequence number, and the results are yielded in the order of the source.
+    The queues are bounded, so a slow stage stops the source instead of collecting items in memory.
+    Iteration is finished when the source returns None. If a stage raises an exception,
+    or the iteration is stopped early, all threads are stopped, and the exception is raised in the caller
+    """
+    PollInterval = 0.1
+
+    def __init__(self, source: tp.Callable[[], tp.Any | None], stages: tp.Sequence[Stage], queue_size: int = 2,
+                 join_timeout: float = 10.0):
+        """
+        :param source: the function which returns the next item or None at the end. It is called in its own thread
+        :param stages: the stages in order
+        :param queue_size: the maximum number of items waiting for each stage
+        :param join_timeout: the maximum time in seconds to wait for each thread on stop
+        """
+        if any(stage.workers < 1 for stage in stages):
+            raise ValueError("Each stage must have at least one worker")
+        self.source = source
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.join_timeout = join_timeout
+        self.error: BaseException | None = None
+        self.processed = {stage.name: 0 for stage in self.stages}
+        self.busy_time = {stage.name: 0.0 for stage in self.stages}
+
+        self._queues: list[queue.Queue] = []
+        self._threads: list[threading.Thread] = []
+        self._alive: list[int] = []
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def _get(self, input_queue: queue.Queue) -> tp.Any | None:
+        """
+        :return: the next item or None if the pipeline is stopped
+        """
+        while not self._stopped.is_set():
+            try:
+                return input_queue.get(timeout=self.PollInterval)
+            except queue.Empty:
+                pass
+        return None
+
+    def _put(self, output_queue: queue.Queue, item: tp.Any) -> bool:
+        """
+        :return: False if the pipeline is stopped before the item is put
+        """
+        while not self._stopped.is_set():
+            try:
+                output_queue.put(item, timeout=self.PollInterval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self.error is None:
+                self.error = error
+        self._stopped.set()
+
+    def _end_count(self, stage_index: int) -> int:
+        """
+        :return: the number of end markers for the queue before the stage. Each worker gets one
+        """
+        return self.stages[stage_index].workers if stage_index < len(self.stages) else 1
+
+    def _read_source(self) -> None:
+        sequence = 0
+        try:
+            while not self._stopped.is_set():
+                item = self.source()
+                if item is None:
+                    break
+                if not self._put(self._queues[0], (sequence, item)):
+                    return
+                sequence += 1
+        except BaseException as error:
+            self._fail(error)
+            return
+        for _ in range(self._end_count(0)):
+            self._put(self._queues[0], _End)
+
+    def _process(self, stage: Stage, sequence: int, item: tp.Any, output_queue: queue.Queue) -> bool:
+        start = time.perf_counter()
+        result = stage.function(item)
+        with self._lock:
+            self.busy_time[stage.name] += time.perf_counter() - start
+            self.processed[stage.name] += 1
+        return self._put(output_queue, (sequence, result))
+
+    def _work(self, stage_index: int) -> None:
+        stage = self.stages[stage_index]
+        input_queue, output_queue = self._queues[stage_index], self._queues[stage_index + 1]
+        # The only worker of the stage restores the order of items, which is lost by stages with several workers
+        ordered = stage.workers == 1
+        pending: dict[int, tp.Any] = {}
+        next_sequence = 0
+        try:
+            while True:
+                entry = self._get(input_queue)
+                if entry is None:
+                    return
+                if entry is _End:
+                    break
+                sequence, item = entry
+                if not ordered:
+                    if not self._process(stage, sequence, item, output_queue):
+                        return
+                    continue
+                pending[sequence] = item
+                while next_sequence in pending:
+                    if not self._process(stage, next_sequence, pending.pop(next_sequence), output_queue):
+                        return
+                    next_sequence += 1
+        except BaseException as error:
+            self._fail(error)
+            return
+        # The last worker of the stage passes the end to the next stage, when all results of the stage are put
+        with self._lock:
+            self._alive[stage_index] -= 1
+            last = self._alive[stage_index] == 0
+        if last:
+            for _ in range(self._end_count(stage_index + 1)):
+                self._put(output_queue, _End)
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        self._alive = [stage.workers for stage in self.stages]
+        self._threads = [threading.Thread(target=self._read_source, name="pipeline_source", daemon=True)]
+        for stage_index, stage in enumerate(self.stages):
+            self._threads.extend(
+                threading.Thread(target=self._work, args=(stage_index,), name=f"pipeline_{stage.name}_{i}",
+                                 daemon=True)
+                for i in range(stage.workers))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop all threads. The items in the queues are abandoned
+        """
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(self.join_timeout)
+        self._threads = []
+
+    def __iter__(self) -> tp.Iterator[tp.Any]:
+        """
+        :return: the results of the last stage in the order of the source
+        """
+        self.start()
+        pending: dict[int, tp.Any] = {}
+        next_sequence = 0
+        try:
+            while True:
+                entry = self._get(self._queues[-1])
+                if entry is None or entry is _End:
+                    break
+                sequence, result = entry
+                pending[sequence] = result
+                while next_sequence in pending:
+                    yield pending.pop(next_sequence)
+                    next_sequence += 1
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def statistics(self) -> dict[str, dict[str, float]]:
+        """
+        :return: the number of processed items and the total busy time in seconds of each stage.
+        The stage with the largest busy time per worker limits the rate
+        """
+        return {stage.name: {"processed": self.processed[stage.name], "busy_time": self.busy_time[stage.name],
+                             "workers": stage.workers} for stage in self.stages}
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .image_processing import normalize_image
+
+
+@dataclass
+class TrackingResult:
+    """
+    offset: the shift (dx, dy) of the object relatively to the given coordinates with sub-pixel accuracy
+    score: normalized cross-correlation of the template and the frame at the best offset in range (-1, 1)
+    """
+    offset: tuple[float, float]
+    score: float
+
+    def pixel_offset(self) -> tuple[int, int]:
+        return int(round(self.offset[0])), int(round(self.offset[1]))
+
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    """
+    :param image: the image with shape (height, width, channels) in BGR format or (height, width).
+    Values are in float (0, 1) or in uint8 (0, 255)
+    :return: the gray image with shape (height, width) in float32 (0, 1)
+    """
+    image = normalize_image(image).astype(np.float32, copy=False)
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _parabolic_peak(left: float, center: float, right: float) -> float:
+    """
+    :return: the sub-pixel position of the peak relatively to the center from three neighbour values
+    """
+    denominator = left - 2 * center + right
+    if denominator >= 0:
+        return 0.0
+    return float(np.clip(0.5 * (left - right) / denominator, -0.5, 0.5))
+
+
+class TemplateTracker:
+    """
+    Finds the object in the window around its coordinates in one pass.
+    It uses normalized cross-correlation computed by cv2.matchTemplate and refines the peak to sub-pixel accuracy.
+    """
+    def __init__(self, search_window: int = 20):
+        """
+        :param search_window: the maximum shift in pixels in each direction which is searched
+        """
+        if search_window < 0:
+            raise ValueError("search_window must be non-negative")
+        self.search_window = search_window
+
+    @staticmethod
+    def prepare_template(image: np.ndarray) -> np.ndarray:
+        """
+        :param image: the image of the object. It has shape (height, width, channels)
+        :return: the template for the search
+        """
+        return to_gray(image)
+
+    def search(self, frame: np.ndarray, template: np.ndarray,
+               coordinates: tuple[int, int, int, int]) -> TrackingResult:
+        """
+        :param frame: the picture from the camera. It has shape (height, width, channels)
+        :param template: the template from prepare_template
+        :param coordinates: current coordinates of the object (x, y, width, height)
+        :return: the best offset and its score
+        """
+        x, y = int(coordinates[0]), int(coordinates[1])
+        height, width = template.shape
+        frame_height, frame_width = frame.shape[:2]
+        x_start = max(x - self.search_window, 0)
+        y_start = max(y - self.search_window, 0)
+        x_end = min(x + width + self.search_window, frame_width)
+        y_end = min(y + height + self.search_window, frame_height)
+        if (x_end - x_start) < width or (y_end - y_start) < height:
+            return TrackingResult((0.0, 0.0), -1.0)
+
+        region = to_gray(frame[y_start: y_end, x_start: x_end])
+        response = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+        response = np.nan_to_num(response, nan=-1.0, posinf=-1.0, neginf=-1.0)
+        _, score, _, (peak_x, peak_y) = cv2.minMaxLoc(response)
+
+        sub_x = sub_y = 0.0
+        if 0 < peak_x < response.shape[1] - 1:
+            sub_x = _parabolic_peak(response[peak_y, peak_x - 1], score, response[peak_y, peak_x + 1])
+        if 0 < peak_y < response.shape[0] - 1:
+            sub_y = _parabolic_peak(response[peak_y - 1, peak_x], score, response[peak_y + 1, peak_x])
+        offset = (x_start + peak_x + sub_x - x, y_start + peak_y + sub_y - y)
+        return TrackingResult(offset, float(score))
+
+
+class GlobalShiftEstimator:
+    """
+    Estimates one translation of the whole frame relatively to the reference frame.
+    It uses phase correlation on the downsampled gray frames, so it is cheap and
+    doesn't depend on the number of objects.
+    """
+    def __init__(self, reference_frame: np.ndarray, downscale: float = 0.25):
+        """
+        :param reference_frame: the frame where the coordinates of objects are known.
+        It has shape (height, width, channels)
+        :param downscale: the factor of frame downsampling before the phase correlation
+        """
+        if not 0 < downscale <= 1:
+            raise ValueError("downscale must be in range (0, 1]")
+        self.downscale = downscale
+        self.reference = self._prepare(reference_frame)
+        self.window = cv2.createHanningWindow(self.reference.shape[::-1], cv2.CV_32F)
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        gray = to_gray(frame)
+        if self.downscale != 1:
+            gray = cv2.resize(gray, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def estimate(self, frame: np.ndarray) -> TrackingResult:
+        """
+        :param frame: the picture from the camera with the same shape as the reference frame
+        :return: the shift (dx, dy) of the frame content relatively to the reference in full resolution pixels
+        and the phase correlation response in range (0, 1)
+        """
+        current = self._prepare(frame)
+        if current.shape != self.reference.shape:
+            raise ValueError("The frame must have the same shape as the reference frame")
+        (x_shift, y_shift), response = cv2.phaseCorrelate(self.reference, current, self.window)
+        offset = (x_shift / self.downscale, y_shift / self.downscale)
+        return TrackingResult(offset, float(response))
@@ -0,0 +1,50 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from inspect_vison.models.sessions import SessionRegistry
+
+
+class StubSession:
+    """
+    onnxruntime session which computes the output of each sample by a function instead of a model.
+    It records the batch sizes of calls, and checks the batch size of models with fixed batch
+    """
+    def __init__(self, function, input_shape):
+        self.function = function
+        self.input_shape = input_shape
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input", shape=self.input_shape)]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="output", shape=None)]
+
+    def run(self, output_names, inputs):
+        (tensor,) = inputs.values()
+        assert tensor.shape[1:] == tuple(self.input_shape[1:])
+        if isinstance(self.input_shape[0], int):
+            assert len(tensor) == self.input_shape[0]
+        self.batches.append(tensor.copy())
+        return [np.stack([self.function(sample) for sample in tensor])]
+
+
+@pytest.fixture
+def stub_session(monkeypatch):
+    """
+    :return: the function which makes StubSession and returns it for the model file with the given name
+    """
+    sessions = {}
+    monkeypatch.setattr(SessionRegistry, "_create_session",
+                        staticmethod(lambda path, config: sessions[Path(path).name]))
+    SessionRegistry.clear()
+
+    def make(name, function, input_shape):
+        sessions[name] = StubSession(function, input_shape)
+        return sessions[name]
+
+    yield make
+    SessionRegistry.clear()
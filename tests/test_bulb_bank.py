@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+import pytest
+
+from inspect_vison import handlers
+from inspect_vison.managing import Monitor
+from inspect_vison.models.models import BulbBank, BulbModel
+
+
+def make_frame(rng, dtype):
+    # Smooth background with bright spots, so rois have different brightness ranges
+    frame = cv2.GaussianBlur(rng.random((240, 320, 3), dtype=np.float32), (0, 0), 5)
+    for x, y in rng.integers(0, (320, 240), size=(30, 2)):
+        cv2.circle(frame, (int(x), int(y)), int(rng.integers(3, 12)), rng.random(3).tolist(), -1)
+    return (frame * 255).astype(np.uint8) if dtype == np.uint8 else frame
+
+
+def random_rois(rng, number):
+    sizes = rng.integers(4, 60, size=(number, 2))
+    positions = rng.integers(0, (320, 240) - sizes)
+    return [(int(x), int(y), int(w), int(h)) for (x, y), (w, h) in zip(positions, sizes)]
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.float32])
+def test_bank_matches_models(dtype):
+    rng = np.random.default_rng(0)
+    init_frame, frame = make_frame(rng, dtype), make_frame(rng, dtype)
+    rois = random_rois(rng, 50)
+    bulb_models = [BulbModel(int(rng.integers(0, 2)), init_frame[y: y + h, x: x + w], rng.uniform(0.05, 0.3))
+                   for x, y, w, h in rois]
+    expected = [bool(model(frame[y: y + h, x: x + w])) for model, (x, y, w, h) in zip(bulb_models, rois)]
+    assert 0 < sum(expected) < len(expected)
+    assert BulbBank(bulb_models)(frame, rois).tolist() == expected
+
+
+def test_bank_per_monitor():
+    rng = np.random.default_rng(1)
+    frame = make_frame(rng, np.uint8)
+    bulbs = [handlers.Bulb(roi, frame, init_value=1, name=str(i)) for i, roi in enumerate(random_rois(rng, 5))]
+    monitors = [Monitor(None), Monitor(None)]
+    for monitor in monitors:
+        values = monitor._get_values(frame, bulbs)
+        assert values == {bulb.name: bulb.get_value(frame) for bulb in bulbs}
+    bank = monitors[0]._batch_states[handlers.Bulb]["bank"]
+    assert bank is not monitors[1]._batch_states[handlers.Bulb]["bank"]
+    monitors[0]._get_values(frame, bulbs)
+    assert monitors[0]._batch_states[handlers.Bulb]["bank"] is bank
+    monitors[0]._get_values(frame, bulbs[1:])
+    assert len(monitors[0]._batch_states[handlers.Bulb]["bank"]) == 4
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from inspect_vison.data_logging import ChangeFilter, ColumnarLogger, ColumnarLogReader, Deadband, reconstruct_rows
+
+
+def make_rows(rows_number, start):
+    return [{"time": start + timedelta(seconds=i), "bulb": 100 <= i < 300, "display": "1.5" if i < 500 else "2.5",
+             "temperature": 20 + 0.01 * np.sin(i) + (1 if i >= 700 else 0)} for i in range(rows_number)]
+
+
+def test_change_filter():
+    rows = make_rows(1000, datetime(2024, 5, 6, 12, 0))
+    change_filter = ChangeFilter(["time", "bulb", "display", "temperature"],
+                                 {"temperature": Deadband(absolute=0.1)}, heartbeat=None)
+    sparse_rows = [row for row in map(change_filter, rows) if row is not None]
+    assert [row["time"] for row in sparse_rows] == [rows[i]["time"] for i in (0, 100, 300, 500, 700)]
+    full_rows = list(reconstruct_rows(sparse_rows))
+    assert full_rows[-1]["display"] == "2.5" and full_rows[-1]["bulb"] is False
+    assert abs(full_rows[-1]["temperature"] - 21) < 0.1
+
+
+def test_columnar_fill(tmp_path):
+    start = datetime(2024, 5, 6, 12, 0)
+    rows = make_rows(1000, start)
+    names = ["time", "bulb", "display", "temperature"]
+    change_filter = ChangeFilter(names, {"temperature": Deadband(absolute=0.1)}, heartbeat=60)
+    logger = ColumnarLogger(tmp_path, names)
+    for row in rows:
+        sparse_row = change_filter(row)
+        if sparse_row is not None:
+            logger.write_results(sparse_row)
+    logger.close()
+
+    data = ColumnarLogReader(tmp_path).read(start=start + timedelta(seconds=250), fill=True)
+    expected = {row["time"]: row for row in rows}
+    times = list(data["time"].astype("datetime64[s]").astype(datetime))
+    assert len(times) < len(rows) // 10
+    assert list(data["bulb"]) == [expected[time]["bulb"] for time in times]
+    assert list(data["display"]) == [expected[time]["display"] for time in times]
+    assert np.allclose(data["temperature"], [expected[time]["temperature"] for time in times], atol=0.1)
+
+
+def test_absolute_or_relative_deadband():
+    deadband = Deadband(absolute=0.5, relative=0.1)
+    # 0.6 is beyond the absolute band, but within 10% of 100
+    assert deadband.exceeded(0.6, 100.0)
+    # 0.2 is within the absolute band, but beyond 10% of 1
+    assert deadband.exceeded(0.2, 1.0)
+    assert not deadband.exceeded(0.4, 100.0)
+    assert Deadband().exceeded(1e-6, 1.0) and not Deadband().exceeded(0.0, 1.0)
+    assert not Deadband(absolute=0.5).exceeded(0.4, 0.1)
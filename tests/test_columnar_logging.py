@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from inspect_vison.data_logging import ColumnarLogger, ColumnarLogReader, convert_tsv_log
+from inspect_vison.data_logging.columnar_logging import IndexDtype
+
+tsv_log_path = "data/2024_5_6"
+
+
+def write_rows(path, rows_number, start, batch_size=100):
+    names = ["time", "bulb", "display", "temperature"]
+    logger = ColumnarLogger(path, names, batch_size=batch_size, flush_interval=float("inf"))
+    rows = []
+    for i in range(rows_number):
+        row = {"time": start + timedelta(minutes=i), "bulb": i % 3 == 0, "display": f"{i % 7}.5",
+               "temperature": 20 + i / 10}
+        logger.write_results(row)
+        rows.append(row)
+    logger.close()
+    return rows
+
+
+def test_round_trip_over_days(tmp_path):
+    start = datetime(2024, 5, 6, 23, 0)
+    rows = write_rows(tmp_path, 200, start)
+    data = ColumnarLogReader(tmp_path).read()
+    assert len(data["time"]) == len(rows)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["2024_5_6.columns", "2024_5_7.columns"]
+    assert np.array_equal(data["bulb"], [row["bulb"] for row in rows])
+    assert list(data["display"]) == [row["display"] for row in rows]
+    assert np.allclose(data["temperature"], [row["temperature"] for row in rows])
+
+
+def test_time_range_and_names(tmp_path):
+    start = datetime(2024, 5, 6, 12, 0)
+    rows = write_rows(tmp_path, 500, start)
+    range_start, range_end = start + timedelta(minutes=123), start + timedelta(minutes=321)
+    data = ColumnarLogReader(tmp_path).read(["temperature"], start=range_start, end=range_end)
+    expected = [row for row in rows if range_start <= row["time"] < range_end]
+    assert set(data) == {"time", "temperature"}
+    assert list(data["time"].astype(datetime)) == [row["time"] for row in expected]
+    assert np.allclose(data["temperature"], [row["temperature"] for row in expected])
+
+
+def test_convert_tsv_log(tmp_path):
+    convert_tsv_log(tsv_log_path, tmp_path)
+    data = ColumnarLogReader(tmp_path).read()
+    assert data["time"][0] == np.datetime64("2024-05-06T18:50:20")
+    assert data["bulb_1"].dtype == bool and data["bulb_1"].all()
+    assert not data["bulb_2"].any()
+
+
+def test_resume_day(tmp_path):
+    start = datetime(2024, 5, 6, 12, 0)
+    logger = ColumnarLogger(tmp_path, ["time", "temperature", "bulb"])
+    for i in range(5):
+        logger.write_results({"time": start + timedelta(minutes=i), "temperature": 20.0 + i, "bulb": True})
+    logger.close()
+    log_path = tmp_path / "2024_5_6.columns"
+    # The program was stopped after a chunk was appended, but before the schema was replaced
+    for name, garbage in (("time.bin", np.zeros(3, "<i8")), ("temperature.bin", np.zeros(3, "<f4")),
+                          ("index.bin", np.zeros(1, IndexDtype))):
+        with open(log_path / name, "ab") as file:
+            garbage.tofile(file)
+
+    # The program is restarted on the same day with one object removed and one added
+    logger = ColumnarLogger(tmp_path, ["time", "temperature", "display"])
+    for i in range(5, 8):
+        logger.write_results({"time": start + timedelta(minutes=i), "temperature": 20.0 + i, "display": "1.5"})
+    logger.close()
+
+    data = ColumnarLogReader(tmp_path).read()
+    assert len(data["time"]) == 8
+    assert np.allclose(data["temperature"], 20.0 + np.arange(8))
+    assert list(data["bulb"]) == [True] * 5 + [False] * 3
+    assert list(data["display"]) == [""] * 5 + ["1.5"] * 3
+    data = ColumnarLogReader(tmp_path).read(["temperature"], start=start + timedelta(minutes=3))
+    assert np.allclose(data["temperature"], 20.0 + np.arange(3, 8))
@@ -0,0 +1,60 @@
+import cv2
+import imutils
+import numpy as np
+import pytest
+
+from inspect_vison.models import numbers_processing
+from inspect_vison.models.numbers_processing import DigitClassifierModel, get_digits, get_digits_batch
+
+led_paths = ["tests/test_pictures/digit_numbers_led_3.jpg", "tests/test_pictures/digit_numbers_led_4.jpg"]
+Shape = (1, 1, 28, 28)
+
+
+def classifier_output(sample):
+    """
+    The class of the stub classifier depends on the roi, so mixed up rois give other digits
+    """
+    logits = np.zeros(10, dtype=np.float32)
+    logits[int(sample.sum() * 7 + sample[0, :, :14].sum()) % 10] = 1
+    return logits
+
+
+def read_display(path, height=100):
+    image = imutils.resize(cv2.imread(path), height=height)
+    erosion = numbers_processing.erode_image(numbers_processing.get_thresh_image(image), height // 50)
+    return numbers_processing.find_contours(erosion), erosion
+
+
+def random_rois(number, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(rng.random((28, 28)) > 0.5).astype(np.uint8) * 255 for _ in range(number)]
+
+
+@pytest.mark.parametrize("batch_size", ["batch", 3])
+def test_classify_batch(stub_session, batch_size):
+    session = stub_session("DigitClassifier.onnx", classifier_output, [batch_size, *Shape[1:]])
+    model = DigitClassifierModel("DigitClassifier.onnx", Shape)
+    rois = random_rois(7)
+    expected = [int(np.argmax(classifier_output(model.prepare_batch([roi])[0]))) for roi in rois]
+    assert len(set(expected)) > 2
+    assert [model(roi) for roi in rois] == expected
+    session.batches.clear()
+
+    assert model.classify_batch(rois) == expected
+    # The chunks and the padding of fixed batch models are tested with run_in_chunks
+    assert len(session.batches) == (1 if batch_size == "batch" else 3)
+    assert model.classify_batch([]) == []
+
+
+def test_get_digits_batch(stub_session):
+    session = stub_session("DigitClassifier.onnx", classifier_output, ["batch", *Shape[1:]])
+    model = DigitClassifierModel("DigitClassifier.onnx", Shape)
+    displays = [read_display(path) for path in led_paths]
+    assert all(len(contours) >= 3 for contours, _ in displays)
+    single_digits = [get_digits(contours, erosion, model) for contours, erosion in displays]
+    # A classifier without classify_batch is called for each roi
+    assert single_digits == [get_digits(contours, erosion, model.__call__) for contours, erosion in displays]
+    session.batches.clear()
+
+    assert get_digits_batch(displays, model) == single_digits
+    assert len(session.batches) == 1
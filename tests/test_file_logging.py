@@ -0,0 +1,163 @@
+import csv
+from datetime import datetime, timedelta
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from inspect_vison.data_logging import FileLogger
+from inspect_vison.managing import UpdateManager, ValueSerializator
+
+names = ["time", "value"]
+
+
+def read_rows(path):
+    with open(path, newline="") as file:
+        return list(csv.DictReader(file, delimiter="\t"))
+
+
+def make_rows(rows_number, start=None, step=timedelta(seconds=1)):
+    """
+    :param start: the time of the first row. None means today, so the file of today opened by the logger is used
+    """
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) if start is None else start
+    return [{"time": start + i * step, "value": i} for i in range(rows_number)]
+
+
+def today_path(path):
+    today = datetime.now()
+    return path / f"{today.year}_{today.month}_{today.day}"
+
+
+def count_calls(monkeypatch, logger, method_name):
+    """
+    :return: the list of names of threads which called the method of the logger
+    """
+    calls = []
+    method = getattr(logger, method_name)
+
+    def counted(*args):
+        calls.append(threading.current_thread().name)
+        return method(*args)
+
+    monkeypatch.setattr(logger, method_name, counted)
+    return calls
+
+
+def pause_writer(monkeypatch, logger):
+    """
+    The writer waits in the first batch until the returned event is set
+    :return: the event and the list of sizes of batches
+    """
+    resume = threading.Event()
+    batches = []
+    write_rows = logger._write_rows
+
+    def paused(rows):
+        rows = list(rows)
+        batches.append(len(rows))
+        resume.wait(5)
+        write_rows(rows)
+
+    monkeypatch.setattr(logger, "_write_rows", paused)
+    return resume, batches
+
+
+def test_flush_by_size(tmp_path, monkeypatch):
+    logger = FileLogger(tmp_path, names, batch_size=3, flush_interval=1000)
+    flushes = count_calls(monkeypatch, logger, "_flush")
+    for row in make_rows(7):
+        logger.write_results(row)
+    assert len(flushes) == 2
+    logger.close()
+    assert len(flushes) == 3
+    assert [int(row["value"]) for row in read_rows(today_path(tmp_path))] == list(range(7))
+
+
+def test_writer_batches(tmp_path, monkeypatch):
+    logger = FileLogger(tmp_path, names, asynchronous=True, batch_size=50, flush_interval=1000)
+    resume, batches = pause_writer(monkeypatch, logger)
+    rows = make_rows(121)
+    logger.write_results(rows[0])
+    while not batches:
+        time.sleep(0.001)
+    for row in rows[1:]:
+        logger.write_results(row)
+    resume.set()
+    logger.close()
+    # The rows waiting in the queue are taken by the writer at once, up to batch_size
+    assert batches == [1, 50, 50, 20]
+    assert [int(row["value"]) for row in read_rows(today_path(tmp_path))] == list(range(121))
+    assert logger.statistics()["written"] == 121
+
+
+def test_flush_by_time(tmp_path, monkeypatch):
+    logger = FileLogger(tmp_path, names, asynchronous=True, batch_size=1000, flush_interval=0.05)
+    flushed = threading.Event()
+    flush = logger._flush
+    monkeypatch.setattr(logger, "_flush", lambda: (flush(), flushed.set()))
+    logger.write_results(make_rows(1)[0])
+    # The writer flushes the row after flush_interval without new rows and without close
+    assert flushed.wait(2)
+    assert len(read_rows(today_path(tmp_path))) == 1
+    logger.close()
+
+
+def test_day_rollover_in_writer(tmp_path, monkeypatch):
+    logger = FileLogger(tmp_path, names, asynchronous=True)
+    opened = count_calls(monkeypatch, logger, "_open")
+    for row in make_rows(4, start=datetime(2024, 5, 6, 23, 59, 58)):
+        logger.write_results(row)
+    logger.close()
+    assert opened == ["file_logger", "file_logger"]
+    assert [int(row["value"]) for row in read_rows(tmp_path / "2024_5_6")] == [0, 1]
+    assert [int(row["value"]) for row in read_rows(tmp_path / "2024_5_7")] == [2, 3]
+
+
+def test_dropped_rows(tmp_path, monkeypatch):
+    logger = FileLogger(tmp_path, names, asynchronous=True, queue_size=2, block=False)
+    resume, _ = pause_writer(monkeypatch, logger)
+    rows = make_rows(6)
+    logger.write_results(rows[0])
+    while logger.statistics()["queued"]:
+        time.sleep(0.001)
+    with pytest.warns(UserWarning, match="rows are dropped"):
+        for row in rows[1:]:
+            logger.write_results(row)
+    statistics = logger.statistics()
+    assert statistics["dropped"] == 3 and statistics["queued"] == 2 and statistics["max_queued"] == 2
+    resume.set()
+    logger.close()
+    assert logger.statistics()["written"] == 3
+    assert [int(row["value"]) for row in read_rows(today_path(tmp_path))] == [0, 1, 2]
+
+
+def test_blocked_rows(tmp_path, monkeypatch):
+    logger = FileLogger(tmp_path, names, asynchronous=True, queue_size=2)
+    resume, _ = pause_writer(monkeypatch, logger)
+    threading.Timer(0.2, resume.set).start()
+    for row in make_rows(6):
+        logger.write_results(row)
+    statistics = logger.statistics()
+    assert statistics["dropped"] == 0 and statistics["blocked_time"] >= 0.1
+    logger.close()
+    assert len(read_rows(today_path(tmp_path))) == 6
+
+
+def test_update_manager_flushes_on_exit(tmp_path, monkeypatch):
+    write_row = FileLogger._write_row
+
+    def slow_write_row(self, row):
+        time.sleep(0.001)
+        write_row(self, row)
+
+    monkeypatch.setattr(FileLogger, "_write_row", slow_write_row)
+    serializator = ValueSerializator([SimpleNamespace(name="value", gui_type=None)])
+    with UpdateManager(serializator, tmp_path, show=False, telegram_api=None, update_pos=False,
+                       log_every=0) as manager:
+        for i in range(200):
+            manager.update(None, {"value": i})
+        assert manager.file_logger.asynchronous
+    rows = read_rows(today_path(tmp_path))
+    assert [int(row["value"]) for row in rows] == list(range(200))
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import onnxruntime
+import pytest
+
+from inspect_vison import handlers
+from inspect_vison.managing import Monitor
+from inspect_vison.models.digits_detector.utils import CLASS_NAMES
+from inspect_vison.models.sessions import SessionRegistry
+from inspect_vison.processing.image_processing import convert_frame
+
+frame_paths = ["tests/test_pictures/2.jpg", "tests/test_pictures/3.jpg", "tests/test_pictures/4.jpg"]
+CandidatesNumber = 8
+
+
+class FakeDetectorSession:
+    """
+    The digits detector without a model. The candidates depend on the content of the display,
+    so the other rounding of the display gives other digits
+    """
+    def __init__(self, path, sess_options=None, providers=None):
+        pass
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="images", shape=[1, 3, 32, 64])]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="output", shape=None)]
+
+    def run(self, output_names, inputs):
+        (tensor,) = inputs.values()
+        outputs = np.zeros((len(tensor), 4 + len(CLASS_NAMES), CandidatesNumber), dtype=np.float32)
+        candidates = np.arange(CandidatesNumber)
+        for output, sample in zip(outputs, tensor):
+            output[0] = 4 + 7 * candidates
+            output[1], output[2], output[3] = 16, 6, 20
+            classes = (candidates + int(sample.sum() * 1000)) % len(CLASS_NAMES)
+            output[4 + classes, candidates] = 0.9
+        return [outputs]
+
+
+def run_monitor(frame_dtype):
+    init_frame = convert_frame(cv2.imread("tests/test_pictures/base_frame.jpg"), frame_dtype)
+    control_objects = [handlers.Bulb((310, 360, 120, 80), init_frame, 1, "bulb"),
+                       handlers.Bulb((355, 440, 80, 80), init_frame, 0, "second bulb"),
+                       handlers.LedDigits((100, 700, 120, 60), init_frame, 12, "display")]
+    frames = iter(convert_frame(cv2.imread(path), frame_dtype) for path in frame_paths)
+    monitor = Monitor(SimpleNamespace(capture_frame=lambda: next(frames, None)))
+    results = []
+    for _ in frame_paths:
+        frame, update_data = monitor._procces_data(control_objects, True)
+        assert frame.dtype == frame_dtype
+        similarities = [control_object.current_similarity for control_object in control_objects]
+        coordinates = [tuple(control_object.current_coordinates) for control_object in control_objects]
+        view = monitor.process_view(frame, control_objects)
+        results.append((similarities, coordinates, update_data, view))
+    return results
+
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    monkeypatch.setattr(onnxruntime, "InferenceSession", FakeDetectorSession)
+    SessionRegistry.clear()
+    yield
+    # The fake session is not left in the registry for other tests
+    SessionRegistry.clear()
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_uint8_frames_match_float64_frames(fake_detector):
+    for uint8_result, float_result in zip(run_monitor(np.uint8), run_monitor(np.float64), strict=True):
+        uint8_similarities, uint8_coordinates, uint8_data, uint8_view = uint8_result
+        float_similarities, float_coordinates, float_data, float_view = float_result
+        assert np.allclose(uint8_similarities, float_similarities, atol=1e-4)
+        assert uint8_coordinates == float_coordinates
+        assert uint8_data == float_data
+        assert uint8_view.dtype == np.uint8
+        float_view = float_view if float_view.dtype == np.uint8 else np.rint(float_view * 255).astype(np.uint8)
+        assert np.abs(uint8_view.astype(int) - float_view).max() <= 1
@@ -0,0 +1,57 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from inspect_vison.processing import image_processing
+from inspect_vison.processing.image_processing import BufferPolicy, FrameGrabber
+
+
+def finite_reader(frames_number):
+    """
+    The value of each frame is its number
+    """
+    frames = iter(range(frames_number))
+
+    def read():
+        i = next(frames, None)
+        return (False, None) if i is None else (True, np.full((4, 4, 3), i, dtype=np.uint8))
+    return read
+
+
+@pytest.mark.parametrize("policy, numbers, dropped_frames", [(BufferPolicy.Latest, [6], 6),
+                                                             (BufferPolicy.DropOldest, [3, 4, 5, 6], 3)])
+def test_policies(monkeypatch, policy, numbers, dropped_frames):
+    # The capture timestamps are the numbers of readings of the clock, and only the grabber reads it
+    clock = itertools.count(100)
+    monkeypatch.setattr(image_processing, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    grabber = FrameGrabber(finite_reader(7), buffer_size=4, policy=policy)
+    grabber.start()
+    # The reader is finished before the first get, so the buffer keeps the last 4 frames
+    grabber._thread.join(timeout=5)
+    items = []
+    while (item := grabber.get()) is not None:
+        items.append(item)
+    assert [int(frame[0, 0, 0]) for _, frame in items] == numbers
+    assert [timestamp for timestamp, _ in items] == [100.0 + i for i in numbers]
+    assert grabber.dropped_frames == dropped_frames
+    grabber.stop()
+
+
+def test_thread_stops():
+    threads_number = threading.active_count()
+
+    def endless_read():
+        time.sleep(0.001)
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+    grabber = FrameGrabber(endless_read, buffer_size=2)
+    grabber.start()
+    assert grabber.get()[1].shape == (4, 4, 3)
+    # The sources stop their grabbers on release
+    grabber.stop()
+    assert not grabber._thread.is_alive()
+    assert threading.active_count() == threads_number
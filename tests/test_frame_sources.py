@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+import pytest
+
+from inspect_vison.processing.image_processing import ImageDirectorySource, VideoFileSource
+
+FramesNumber = 5
+
+
+def make_frame(i):
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[:, :, 1] = 40 * i + 20
+    return frame
+
+
+def frame_index(frame):
+    return int(round((float(frame[:, :, 1].mean()) - 20) / 40))
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 25.0, (64, 48))
+    for i in range(FramesNumber):
+        writer.write(make_frame(i))
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_video_file(video_path, threaded):
+    # The buffer keeps all frames, so the grabber does not drop them in max speed mode
+    source = VideoFileSource(video_path, max_speed=True, threaded=threaded, buffer_size=FramesNumber,
+                             frame_dtype=np.uint8)
+    frames = []
+    while (frame := source.capture_frame()) is not None:
+        frames.append(frame)
+    source.release()
+    assert [frame_index(frame) for frame in frames] == list(range(FramesNumber))
+
+
+def test_video_file_loop(video_path):
+    source = VideoFileSource(video_path, max_speed=True, loop=True, frame_dtype=np.float32)
+    frames = [source.capture_frame() for _ in range(2 * FramesNumber + 1)]
+    source.release()
+    assert frames[0].dtype == np.float32 and frames[0].max() <= 1
+    assert [frame_index(frame * 255) for frame in frames] == [i % FramesNumber for i in range(2 * FramesNumber + 1)]
+
+
+def test_directory_skips_unreadable(tmp_path):
+    for i in range(3):
+        cv2.imwrite(str(tmp_path / f"{i}.png"), make_frame(i))
+    (tmp_path / "1_broken.png").write_text("not an image")
+    source = ImageDirectorySource(tmp_path, max_speed=True, loop=True, frame_dtype=np.uint8)
+    with pytest.warns(UserWarning, match="1_broken.png"):
+        frames = [source.capture_frame() for _ in range(7)]
+    assert [frame_index(frame) for frame in frames] == [0, 1, 2, 0, 1, 2, 0]
+    assert [path.name for path in source.paths] == ["0.png", "1.png", "2.png"]
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_directory_without_readable_images(tmp_path, threaded):
+    for i in range(2):
+        (tmp_path / f"{i}.jpg").write_bytes(b"broken")
+    # In threaded mode the files are read as soon as the source is created
+    with pytest.warns(UserWarning), pytest.raises(ValueError, match="readable images"):
+        source = ImageDirectorySource(tmp_path, max_speed=True, loop=True, threaded=threaded)
+        try:
+            source.capture_frame()
+        finally:
+            source.release()
@@ -0,0 +1,45 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+RootPath = Path(__file__).parent.parent
+HeavyModules = ("PyQt6", "pyqtgraph", "matplotlib", "telebot", "onnxruntime", "skimage", "scipy")
+# The headless import takes about 0.2 s. The limit is generous to keep the test stable on slow machines
+MaxImportTime = 1.0
+
+
+def import_in_subprocess(statement: str) -> dict:
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "duration = time.perf_counter() - start\n"
+        f"print(json.dumps({{'time': duration, 'modules': [m for m in {HeavyModules!r} if m in sys.modules]}}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=RootPath, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("statement", [
+    "import inspect_vison.managing",
+    "from inspect_vison import handlers, managing, models, gui",
+    "from inspect_vison.data_logging import FileLogger, Notificator",
+])
+def test_headless_import_has_no_heavy_modules(statement):
+    result = import_in_subprocess(statement)
+    assert result["modules"] == []
+
+
+def test_headless_import_time():
+    result = import_in_subprocess("import inspect_vison.managing")
+    assert result["time"] < MaxImportTime
+
+
+def test_features_are_imported_on_access():
+    result = import_in_subprocess("from inspect_vison import gui; gui.GuiHandler")
+    assert {"PyQt6", "pyqtgraph"} <= set(result["modules"])
+    result = import_in_subprocess("from inspect_vison.data_logging import TelegramApi")
+    assert "telebot" in result["modules"]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from inspect_vison.models.digits_detector import utils
+
+
+def reference_multiclass_nms(boxes, scores, class_ids, iou_threshold):
+    keep_boxes = []
+    for class_id in np.unique(class_ids):
+        class_indices = np.where(class_ids == class_id)[0]
+        class_keep_boxes = utils.nms(boxes[class_indices, :], scores[class_indices], iou_threshold)
+        keep_boxes.extend(class_indices[class_keep_boxes])
+    return keep_boxes
+
+
+def random_detections(seed, number, classes_number=12, image_size=640):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, image_size, size=(number, 2))
+    sizes = rng.uniform(5, 120, size=(number, 2))
+    boxes = np.concatenate([centers - sizes / 2, centers + sizes / 2], axis=1).astype(np.float32)
+    scores = rng.uniform(0.2, 1.0, size=number).astype(np.float32)
+    class_ids = rng.integers(0, classes_number, size=number)
+    return boxes, scores, class_ids
+
+
+nms_functions = pytest.mark.parametrize("nms_function", [utils.multiclass_nms, utils.multiclass_nms_vectorized])
+
+
+@nms_functions
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("number", [1, 10, 300])
+@pytest.mark.parametrize("iou_threshold", [0.1, 0.3, 0.7])
+def test_multiclass_nms_equals_reference(nms_function, seed, number, iou_threshold):
+    boxes, scores, class_ids = random_detections(seed, number)
+    expected = reference_multiclass_nms(boxes, scores, class_ids, iou_threshold)
+    result = nms_function(boxes, scores, class_ids, iou_threshold)
+    assert sorted(result) == sorted(expected)
+
+
+@nms_functions
+def test_multiclass_nms_top_k(nms_function):
+    boxes, scores, class_ids = random_detections(0, 300)
+    result = nms_function(boxes, scores, class_ids, 0.3, top_k=50)
+    top_indices = np.argsort(-scores)[:50]
+    assert set(result) <= set(top_indices)
+    assert sorted(result) == sorted(
+        top_indices[reference_multiclass_nms(boxes[top_indices], scores[top_indices], class_ids[top_indices], 0.3)])
+
+
+@nms_functions
+def test_multiclass_nms_empty(nms_function):
+    boxes = np.empty((0, 4), dtype=np.float32)
+    assert len(nms_function(boxes, np.empty(0), np.empty(0, dtype=int), 0.5)) == 0
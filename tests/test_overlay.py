@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from inspect_vison.processing.overlay import OverlayRenderer
+
+coordinates = [(310, 360, 120, 80), (355, 440, 80, 80), (100, 700, 120, 60)]
+
+
+def reference_view(frame, coordinates, alpha=0.5, width=3, color=(1.0, 0, 0)):
+    """
+    The view of Monitor before OverlayRenderer: _mark_objects_view, _highlight_boundaries and _add_numbers
+    on a uint8 frame
+    """
+    faded = ((frame + alpha * 255.0) / (1 + alpha)).astype(np.uint8)
+    mask = np.zeros_like(frame)
+    for x, y, w, h in coordinates:
+        mask[y:(y + h), x:(x + w)] = 1
+    view = np.where(mask, frame, faded)
+
+    mask = np.zeros_like(frame)
+    for x, y, w, h in coordinates:
+        mask[(y - width):(y + h + width), (x - width):(x + w + width)] = 1
+        mask[y:(y + h), x:(x + w)] = 0
+    view = np.where(mask, np.array(color) * 255.0, view).astype(np.uint8)
+
+    for i, (x, y, _, _) in enumerate(coordinates):
+        cv2.putText(view, f"{i + 1}", (x + 3, y + 20), cv2.FONT_HERSHEY_COMPLEX, 0.7,
+                    tuple(channel * 255.0 for channel in color), 1)
+    return view
+
+
+@pytest.mark.parametrize("display_size", [None, (300, 700)])
+def test_matches_previous_view(display_size):
+    frame = cv2.imread("tests/test_pictures/base_frame.jpg")
+    renderer = OverlayRenderer(display_size=display_size)
+    scale = renderer.get_display_scale(frame.shape)
+    expected_frame = frame
+    expected_coordinates = coordinates
+    if display_size is not None:
+        # The previous view was drawn at the frame resolution, so it is compared at the display resolution
+        size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+        assert size[0] <= display_size[0] and size[1] <= display_size[1] and scale < 1
+        expected_frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        expected_coordinates = [tuple(int(round(value * scale)) for value in coordinate)
+                                for coordinate in coordinates]
+    expected = reference_view(expected_frame, expected_coordinates)
+
+    for view_frame in (frame, frame.astype(np.float64) / 255):
+        view = renderer.render(view_frame, coordinates)
+        assert view.shape == expected.shape and view.dtype == np.uint8
+        # The fading was truncated before, and it is rounded now
+        difference = np.abs(view.astype(int) - expected)
+        assert difference.max() <= 1
+        # Boundaries and numbers are drawn in the first channel, exactly as before
+        drawn = (expected == (255, 0, 0)).all(axis=2)
+        assert drawn.sum() > 0 and (difference[drawn] == 0).all()
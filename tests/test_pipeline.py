@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+
+import pytest
+
+from inspect_vison.processing.pipeline import Pipeline, Stage
+
+
+def counter(items_number):
+    items = iter(range(items_number))
+    return lambda: next(items, None)
+
+
+def sleeping(function, delay):
+    def stage(item):
+        # Sleep releases the GIL like OpenCV and onnxruntime do
+        time.sleep(delay)
+        return function(item)
+    return stage
+
+
+def test_stages_overlap():
+    stages = [Stage("first", sleeping(lambda x: x + 1, 0.01)), Stage("second", sleeping(lambda x: x * 2, 0.01)),
+              Stage("third", sleeping(lambda x: x - 1, 0.01))]
+    start = time.perf_counter()
+    results = list(Pipeline(counter(50), stages))
+    elapsed = time.perf_counter() - start
+    assert results == [(x + 1) * 2 - 1 for x in range(50)]
+    # The serial time is 50 * 0.03 s
+    assert elapsed < 1.0
+
+
+def test_order_with_several_workers():
+    seen = []
+
+    def stateful(item):
+        seen.append(item)
+        return item
+
+    stages = [Stage("random", lambda x: (time.sleep(random.uniform(0, 0.005)), x)[1], workers=4),
+              Stage("stateful", stateful)]
+    pipeline = Pipeline(counter(200), stages, queue_size=3)
+    assert list(pipeline) == list(range(200))
+    # The stage with one worker gets items in order
+    assert seen == list(range(200))
+    assert pipeline.statistics()["random"]["processed"] == 200
+
+
+def test_shutdown():
+    def failing(item):
+        if item == 20:
+            raise RuntimeError("stage failed")
+        return item
+
+    threads_number = threading.active_count()
+    with pytest.raises(RuntimeError, match="stage failed"):
+        list(Pipeline(counter(1000), [Stage("failing", failing, workers=2), Stage("last", lambda x: x)]))
+    assert threading.active_count() == threads_number
+
+    # The consumer stops early, and the source is infinite
+    pipeline = Pipeline(lambda: 1, [Stage("identity", lambda x: x, workers=3)])
+    for i, _ in enumerate(pipeline):
+        if i == 10:
+            break
+    assert threading.active_count() == threads_number
@@ -0,0 +1,122 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import time
+
+import numpy as np
+import pytest
+
+from inspect_vison.gui import WidgetType, remote
+from inspect_vison.gui.remote import RemoteGuiHandler, SharedFrameBuffer
+
+name_type = {"1) value": WidgetType.Display}
+
+
+def make_frame(value, shape=(4, 6, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def read_slot(frame_info):
+    name, slot, shape = frame_info
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray((SharedFrameBuffer.Slots, *shape), dtype=np.uint8, buffer=shm.buf)[slot].copy()
+    finally:
+        shm.close()
+
+
+def echo_viewer(name_type, messages, info, locks):
+    """
+    The viewer without Qt. It reports the sum of each received frame and the readings
+    """
+    info.put((640, 480))
+    while True:
+        message = messages.get()
+        if message[0] == "stop":
+            return
+        _, frame_info, update_data = message
+        info.put((None if frame_info is None else int(read_slot(frame_info).sum()), update_data))
+
+
+def hung_viewer(name_type, messages, info, locks):
+    time.sleep(60)
+
+
+@pytest.fixture
+def frame_buffer():
+    frame_buffer = SharedFrameBuffer([mp.Lock() for _ in range(SharedFrameBuffer.Slots)])
+    yield frame_buffer
+    frame_buffer.close()
+
+
+def test_slots_alternate(frame_buffer):
+    infos = [frame_buffer.write(make_frame(i)) for i in range(1, 4)]
+    assert [slot for _, slot, _ in infos] == [1, 0, 1]
+    assert len({name for name, _, _ in infos}) == 1
+    # The first slot is overwritten by the third frame, the second one keeps the second frame
+    assert (read_slot(infos[1]) == 2).all() and (read_slot(infos[2]) == 3).all()
+
+
+def test_busy_slot_is_skipped(frame_buffer):
+    first = frame_buffer.write(make_frame(1))
+    next_slot = 1 - first[1]
+    with frame_buffer.locks[next_slot]:
+        assert frame_buffer.write(make_frame(2)) is None
+    # The dropped frame did not change the slot and the content of the shown frame
+    assert (read_slot(first) == 1).all()
+    assert frame_buffer.write(make_frame(3))[1] == next_slot
+
+
+def test_reallocation_and_close(frame_buffer):
+    first = frame_buffer.write(make_frame(1))
+    second = frame_buffer.write(make_frame(2, shape=(8, 5, 3)))
+    assert second[0] != first[0] and second[2] == (8, 5, 3)
+    # The segment of the old shape is unlinked, so the messages with it are stale
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=first[0])
+    frame_buffer.close()
+    assert frame_buffer.shm is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=second[0])
+
+
+def test_handler_messages(monkeypatch):
+    monkeypatch.setattr(remote, "_run_viewer", echo_viewer)
+    handler = RemoteGuiHandler(name_type, start_method="fork", exit_timeout=5.0)
+    assert handler.screen_size() == (640, 480)
+    handler.update(make_frame(2), {"1) value": 1.5})
+    handler.update(None, {"1) value": 2.5})
+    handler.update(np.full((4, 6, 3), 0.5), None)
+    handler.update(None, None)
+    received = [handler._info.get(timeout=5) for _ in range(3)]
+    assert received == [(2 * 4 * 6 * 3, {"1) value": 1.5}), (None, {"1) value": 2.5}), (127 * 4 * 6 * 3, None)]
+    handler.exit()
+    assert not handler.is_alive() and handler.process.exitcode == 0
+    assert handler.frame_buffer.shm is None
+
+
+def test_hung_viewer(monkeypatch):
+    monkeypatch.setattr(remote, "_run_viewer", hung_viewer)
+    handler = RemoteGuiHandler(name_type, queue_size=2, start_method="fork", exit_timeout=0.2)
+    for i in range(3):
+        handler.update(None, {"1) value": i})
+    assert handler.dropped_messages == 1
+    start = time.perf_counter()
+    with pytest.warns(UserWarning, match="terminate"):
+        handler.exit()
+    assert time.perf_counter() - start < 5
+    assert not handler.is_alive()
+
+
+def test_viewer_skips_stale_frame(frame_buffer):
+    remote_viewer = pytest.importorskip("inspect_vison.gui.gui_monitor.remote_viewer")
+    shown = []
+    viewer = remote_viewer.RemoteViewer.__new__(remote_viewer.RemoteViewer)
+    viewer.locks = frame_buffer.locks
+    viewer.window = type("Window", (), {"update_screen": lambda self, frame: shown.append(frame.copy())})()
+    viewer._shm = None
+    stale = frame_buffer.write(make_frame(1))
+    current = frame_buffer.write(make_frame(2, shape=(8, 5, 3)))
+    viewer._show_frame(stale)
+    viewer._show_frame(current)
+    viewer.close()
+    assert len(shown) == 1 and (shown[0] == 2).all()
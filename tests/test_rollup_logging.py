@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import threading
+
+import numpy as np
+import pytest
+
+from inspect_vison.data_logging import ColumnarLogger, RollupAggregator, RollupReader, build_rollups
+
+names = ["time", "bulb", "display", "temperature"]
+
+
+def make_rows(rows_number, start, step=timedelta(seconds=23)):
+    return [{"time": start + i * step, "bulb": i % 5 == 0, "display": f"{i % 9}.5",
+             "temperature": 20 + np.sin(i / 100)} for i in range(rows_number)]
+
+
+def expected_rollups(rows, name, resolution):
+    buckets = {}
+    for row in rows:
+        moment = row["time"]
+        seconds = (moment - moment.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+        start = moment.replace(hour=0, minute=0, second=0, microsecond=0) + \
+            timedelta(seconds=seconds - seconds % resolution)
+        buckets.setdefault(start, []).append(float(row[name]))
+    return buckets
+
+
+def check(reader, rows, name, resolution, start=None, end=None):
+    data = reader.read(name, resolution, start=start, end=end)
+    selected = [row for row in rows if (start is None or row["time"] >= start) and (end is None or row["time"] < end)]
+    buckets = expected_rollups(selected, name, resolution)
+    assert list(data["time"].astype(datetime)) == sorted(buckets)
+    assert np.allclose(data["min"], [min(values) for _, values in sorted(buckets.items())])
+    assert np.allclose(data["max"], [max(values) for _, values in sorted(buckets.items())])
+    assert np.allclose(data["mean"], [np.mean(values) for _, values in sorted(buckets.items())])
+    assert list(data["count"]) == [len(values) for _, values in sorted(buckets.items())]
+
+
+@pytest.mark.parametrize("asynchronous", [True, False])
+def test_streaming_rollups(tmp_path, asynchronous):
+    rows = make_rows(10000, datetime(2024, 5, 6, 12, 0))
+    writer_threads = set()
+    # The program is restarted in the middle of buckets
+    for part in (rows[:4321], rows[4321:]):
+        aggregator = RollupAggregator(tmp_path, names, asynchronous=asynchronous)
+        write_records = aggregator._write_records
+
+        def record_thread(*args, write_records=write_records):
+            writer_threads.add(threading.current_thread().name)
+            write_records(*args)
+
+        aggregator._write_records = record_thread
+        for row in part:
+            aggregator.update(row)
+        aggregator.close()
+        assert aggregator.error is None
+    assert writer_threads == {"rollup_writer" if asynchronous else threading.current_thread().name}
+    reader = RollupReader(tmp_path)
+    assert reader.names() == names[1:]
+    for name in names[1:]:
+        for resolution in (60, 3600, 86400, 6 * 3600):
+            check(reader, rows, name, resolution)
+    check(reader, rows, "temperature", 3600, start=datetime(2024, 5, 7, 3), end=datetime(2024, 5, 8, 1))
+
+
+def test_build_rollups(tmp_path):
+    rows = make_rows(8000, datetime(2024, 5, 6, 12, 0))
+    logger = ColumnarLogger(tmp_path, names)
+    for row in rows:
+        logger.write_results(row)
+    logger.close()
+    build_rollups(tmp_path)
+    reader = RollupReader(tmp_path)
+    for name in names[1:]:
+        check(reader, rows, name, 60)
+        check(reader, rows, name, 86400)
@@ -0,0 +1,43 @@
+from inspect_vison.data_logging import Notificator, RateOfChange, Range, RuleNotificator, Stuck, Threshold
+
+
+def raised_names(notificator, values, now):
+    return [rule.name for rule, _ in notificator.evaluate(values, now)]
+
+
+def test_threshold_hysteresis_and_hold():
+    notificator = RuleNotificator([Threshold("temperature", above=10, hysteresis=1, hold=2)])
+    noisy = [9.0, 10.5, 9.6, 10.2, 9.4, 10.3, 8.5, 10.4, 10.6]
+    raised = [raised_names(notificator, {"temperature": value}, float(i)) for i, value in enumerate(noisy)]
+    # The noise above 9 does not clear the condition, so the alarm is raised once after the hold time
+    assert [i for i, names in enumerate(raised) if names] == [3]
+    assert not notificator.active[0]
+
+
+def test_range_rate_and_stuck():
+    notificator = RuleNotificator([Range("pressure", low=0, high=5), RateOfChange("pressure", max_rate=2),
+                                   Stuck("display", duration=3, tolerance=0.1)])
+    assert raised_names(notificator, {"pressure": 1, "display": "15.2"}, 0) == []
+    assert raised_names(notificator, {"pressure": 4, "display": "15.25"}, 1) == ["pressure"]
+    assert raised_names(notificator, {"pressure": 6, "display": "15.2"}, 2) == ["pressure"]
+    assert raised_names(notificator, {"pressure": 6, "display": "15.2"}, 3.5) == ["display"]
+    assert list(notificator.active) == [True, False, True]
+
+
+def test_notificator_cadence_and_messages():
+    notificator = RuleNotificator([Threshold("bulb", below=0.5, message="{name} is off")], every=60)
+    notificator.update({"bulb": False})
+    assert notificator.aware() == "bulb is off"
+    notificator.update({"bulb": True})
+    # The next evaluation is not due yet
+    assert notificator.aware() == "" and notificator.active[0]
+
+
+def test_custom_notificator():
+    class HighTemperature(Notificator):
+        def check_conditions(self):
+            return [(self.value["temperature"] > 17.8, "The temperature is high")]
+
+    notificator = HighTemperature()
+    notificator.update({"temperature": 18})
+    assert notificator.aware() == "The temperature is high"
@@ -0,0 +1,102 @@
+import threading
+import time
+from types import SimpleNamespace
+import warnings
+
+import cv2
+import numpy as np
+import onnxruntime
+import pytest
+
+from inspect_vison.models.digits_detector.utils import CLASS_NAMES
+from inspect_vison.models.models import LedNumbersModel
+from inspect_vison.models.sessions import SessionConfig, SessionRegistry, run_in_chunks
+
+led_path = "tests/test_pictures/digit_numbers_led_3.jpg"
+
+
+class FakeInferenceSession:
+    """
+    The session without a model. Its creation is slow, so concurrent requests overlap
+    """
+    created = []
+
+    def __init__(self, path, sess_options=None, providers=None):
+        time.sleep(0.01)
+        self.path = path
+        self.sess_options = sess_options
+        FakeInferenceSession.created.append(self)
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="images", shape=[1, 3, 32, 64])]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="output", shape=None)]
+
+    def run(self, output_names, inputs):
+        return [np.zeros((1, 4 + len(CLASS_NAMES), 8), dtype=np.float32)]
+
+
+@pytest.fixture
+def fake_sessions(monkeypatch):
+    monkeypatch.setattr(onnxruntime, "InferenceSession", FakeInferenceSession)
+    FakeInferenceSession.created = []
+    SessionRegistry.clear()
+    yield FakeInferenceSession.created
+    SessionRegistry.clear()
+
+
+def make_model(session_config=None):
+    with warnings.catch_warnings():
+        # The fake session finds no digits on the init image
+        warnings.simplefilter("ignore")
+        model = LedNumbersModel(12, cv2.imread(led_path), session_config=session_config)
+    model.yolov8_detector.initialize_model()
+    return model
+
+
+def test_models_share_session(fake_sessions):
+    first, second = make_model(), make_model()
+    assert first.yolov8_detector.session is second.yolov8_detector.session
+    assert len(fake_sessions) == 1 and SessionRegistry.sessions_number() == 1
+
+    config = SessionConfig(intra_op_num_threads=1, graph_optimization_level="basic")
+    third = make_model(SessionConfig(intra_op_num_threads=1, graph_optimization_level="basic"))
+    assert third.yolov8_detector.session is not first.yolov8_detector.session
+    assert make_model(config).yolov8_detector.session is third.yolov8_detector.session
+    assert len(fake_sessions) == 2 and SessionRegistry.sessions_number() == 2
+    assert fake_sessions[1].sess_options.intra_op_num_threads == 1
+
+
+def test_concurrent_creation(fake_sessions):
+    barrier = threading.Barrier(8)
+    sessions = []
+
+    def get_session():
+        barrier.wait()
+        sessions.append(SessionRegistry.get_session(led_path))
+
+    threads = [threading.Thread(target=get_session) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fake_sessions) == 1
+    assert all(session is fake_sessions[0] for session in sessions) and len(sessions) == 8
+
+
+@pytest.mark.parametrize("batch_size", ["batch", 1, 3, 7])
+def test_run_in_chunks(stub_session, batch_size):
+    # The output depends on the content of the sample, so mixed up or padded samples give other outputs
+    session = stub_session("model.onnx", lambda sample: sample.sum(axis=0), [batch_size, 2, 3])
+    samples = np.random.default_rng(0).random((7, 2, 3)).astype(np.float32)
+    outputs = run_in_chunks(lambda chunk: session.run(None, {"input": chunk})[0], samples,
+                            batch_size if isinstance(batch_size, int) else None)
+    assert np.allclose(outputs, samples.sum(axis=1))
+    if batch_size == "batch":
+        assert [len(batch) for batch in session.batches] == [len(samples)]
+    else:
+        # Fixed batch models get full chunks, and the last one is padded by zeros
+        assert [len(batch) for batch in session.batches] == [batch_size] * -(-len(samples) // batch_size)
+        padding = len(session.batches) * batch_size - len(samples)
+        assert not session.batches[-1][batch_size - padding:].any()
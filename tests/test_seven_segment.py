@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+import pytest
+
+from inspect_vison.models import models
+from inspect_vison.models.digits_detector import CLASS_NAMES
+from inspect_vison.models.numbers_processing import SevenSegmentDecoder
+
+led_3 = "tests/test_pictures/digit_numbers_led_3.jpg"
+led_4 = "tests/test_pictures/digit_numbers_led_4.jpg"
+DetectorShape = ["batch", 3, 32, 64]
+
+
+def detections(number):
+    """
+    :return: the function of the stub detector which finds the given number on any image
+    """
+    predictions = np.zeros((4 + len(CLASS_NAMES), len(number)), dtype=np.float32)
+    for i, symbol in enumerate(number):
+        predictions[:4, i] = (8 + 12 * i, 16, 8, 20)
+        predictions[4 + CLASS_NAMES.index(symbol), i] = 0.9
+    return lambda sample: predictions
+
+
+@pytest.mark.parametrize("path, number, confidence", [(led_3, "15.2", 1.0), (led_4, "17.9", 0.76)])
+def test_decoder(path, number, confidence):
+    result, result_confidence = SevenSegmentDecoder()(cv2.imread(path))
+    assert result == number
+    assert result_confidence == pytest.approx(confidence, abs=0.01)
+
+
+def test_detector_fallback(stub_session):
+    session = stub_session("yolo_digits.onnx", detections("17.9"), DetectorShape)
+    model = models.LedNumbersModel(15.2, cv2.imread(led_3), min_confidence=0.8)
+    assert model.segment_decoder is not None
+    # The decoder reads 15.2 with full confidence, so the detector is not called
+    assert model(cv2.imread(led_3)) == "15.2"
+    assert not session.batches
+    # The decoder reads 17.9 with the confidence below min_confidence
+    assert model(cv2.imread(led_4)) == "17.9"
+    assert len(session.batches) == 1
+
+    confident_model = models.LedNumbersModel(15.2, cv2.imread(led_3), min_confidence=0.6)
+    assert confident_model(cv2.imread(led_4)) == "17.9"
+    assert len(session.batches) == 1
+
+
+def test_decoder_disabled(stub_session):
+    session = stub_session("yolo_digits.onnx", detections("16.2"), DetectorShape)
+    # The decoder reads 15.2 instead of the init value, so it is not used for this display
+    model = models.LedNumbersModel(16.2, cv2.imread(led_3))
+    assert model.segment_decoder is None
+    assert len(session.batches) == 1
+    assert models.LedNumbersModel.forward_batch([model], [cv2.imread(led_3)]) == ["16.2"]
+    assert len(session.batches) == 2
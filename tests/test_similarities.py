@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import pytest
+
+from inspect_vison.handlers import Bulb, ReferenceSimilarities, Similarities
+from inspect_vison.processing.tracking import to_gray
+
+skimage_metrics = pytest.importorskip("skimage.metrics")
+
+base_frame_path = "tests/test_pictures/base_frame.jpg"
+similarity_parameters = pytest.mark.parametrize(
+    [
+        "coordinates",
+        "check_frame_path",
+    ],
+    [
+        (
+            (310, 360, 120, 80),
+            "tests/test_pictures/base_frame.jpg",
+        ),
+        (
+            (310, 360, 120, 80),
+            "tests/test_pictures/2.jpg",
+        ),
+        (
+            (310, 360, 120, 80),
+            "tests/test_pictures/3.jpg",
+        ),
+        (
+            (355, 440, 80, 80),
+            "tests/test_pictures/4.jpg",
+        ),
+        (
+            (100, 100, 33, 47),
+            "tests/test_pictures/2.jpg",
+        ),
+    ],
+)
+
+
+def _crop(frame, coordinates):
+    x1, y1, x2, y2 = coordinates
+    return frame[y1: y1 + y2, x1: x1 + x2]
+
+
+@similarity_parameters
+def test_fast_similarities_accuracy(coordinates, check_frame_path):
+    base_frame = cv2.imread(base_frame_path)
+    check_frame = cv2.imread(check_frame_path)
+    reference = _crop(base_frame, coordinates)
+    image = _crop(check_frame, coordinates)
+
+    similarities = ReferenceSimilarities(reference)
+    cosine, structural = similarities(image)
+
+    gray_reference = to_gray(reference).astype(np.float64)
+    gray_image = to_gray(image).astype(np.float64)
+    expected_structural = skimage_metrics.structural_similarity(gray_image, gray_reference, data_range=1.0)
+    expected_cosine = np.sum(gray_image * gray_reference) / np.sqrt(
+        np.sum(gray_image ** 2) * np.sum(gray_reference ** 2))
+
+    assert structural == pytest.approx(expected_structural, abs=1e-4)
+    assert cosine == pytest.approx(expected_cosine, abs=1e-5)
+
+
+def test_fast_similarities_uint8_and_float_are_equal():
+    base_frame = cv2.imread(base_frame_path)
+    check_frame = cv2.imread("tests/test_pictures/2.jpg")
+    coordinates = (310, 360, 120, 80)
+    reference = _crop(base_frame, coordinates)
+    image = _crop(check_frame, coordinates)
+
+    uint8_result = ReferenceSimilarities(reference)(image)
+    float_result = ReferenceSimilarities(reference / 255)(image / 255)
+    assert uint8_result == pytest.approx(float_result, abs=1e-5)
+    assert ReferenceSimilarities(reference)(reference) == pytest.approx((1.0, 1.0), abs=1e-5)
+
+
+def test_multichannel_similarity_is_default():
+    base_frame = cv2.imread(base_frame_path)
+    check_frame = cv2.imread("tests/test_pictures/2.jpg")
+    coordinates = (310, 360, 120, 80)
+    bulb = Bulb(coordinates, base_frame, init_value=1, name="bulb")
+    assert not bulb.fast_similarity
+    image = _crop(check_frame, coordinates)
+    expected = 0.5 * Similarities.cosine_similarity(image / 255, bulb.normalized_init_image) + \
+        0.5 * Similarities.structural_similarity(image / 255, bulb.normalized_init_image)
+    assert bulb._get_similarity(image) == pytest.approx(expected)
@@ -0,0 +1,81 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+from inspect_vison.data_logging import BotApiTransport, TelegramNotifier, Transport, TransportError
+
+
+class FakeTransport(Transport):
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def send(self, chat_id, text):
+        time.sleep(self.delay)
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise TransportError("network is down")
+            self.messages.append((chat_id, text))
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    # The first request of each chat gets 429 Too Many Requests
+    limited_chats = set()
+    messages = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body["chat_id"] not in self.limited_chats:
+            self.limited_chats.add(body["chat_id"])
+            answer, code = {"ok": False, "error_code": 429, "parameters": {"retry_after": 0.2}}, 429
+        else:
+            self.messages.append((self.path, body["chat_id"], body["text"]))
+            answer, code = {"ok": True, "result": {}}, 200
+        data = json.dumps(answer).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_notify_does_not_wait_and_coalesces():
+    transport = FakeTransport(failures=2, delay=0.1)
+    notifier = TelegramNotifier(transport, coalesce_window=0.5, backoff=0.01, chat_rate=100)
+    start = time.perf_counter()
+    for _ in range(100):
+        notifier.notify("Temperature is high", [1, 2, 3])
+    assert time.perf_counter() - start < 0.05
+    time.sleep(0.6)
+    notifier.notify("Temperature is high", [1])
+    notifier.close()
+    statistics = notifier.statistics()
+    assert statistics["sent"] == 4 and statistics["failed"] == 0
+    assert statistics["retried"] == 2 and statistics["coalesced"] == 99
+    assert sorted(chat_id for chat_id, _ in transport.messages) == [1, 1, 2, 3]
+    assert "repeated 99 times" in transport.messages[-1][1]
+
+
+def test_bot_api_transport_with_rate_limit():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        transport = BotApiTransport("token", base_url=f"http://127.0.0.1:{server.server_port}")
+        notifier = TelegramNotifier(transport, chat_rate=10)
+        start = time.perf_counter()
+        notifier.notify("Bulb is off", [10, 20])
+        notifier.close()
+        assert time.perf_counter() - start >= 0.2
+        assert notifier.statistics()["sent"] == 2
+        assert sorted(FakeBotApi.messages) == [("/bottoken/sendMessage", 10, "Bulb is off"),
+                                               ("/bottoken/sendMessage", 20, "Bulb is off")]
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,36 @@
+import numpy as np
+
+from inspect_vison.gui.time_series import TimeSeriesBuffer
+
+
+def test_wraparound_is_contiguous():
+    buffer = TimeSeriesBuffer(capacity=5)
+    for i in range(13):
+        buffer.append(float(i), 10.0 * i)
+        times, values = buffer.data()
+        expected = np.arange(max(0, i - 4), i + 1, dtype=np.float64)
+        assert len(buffer) == len(expected)
+        assert np.array_equal(times, expected)
+        assert np.array_equal(values, 10 * expected)
+        # The points are a view of the buffer, not a copy
+        assert times.base is not None and times.flags["C_CONTIGUOUS"]
+    buffer.clear()
+    assert len(buffer) == 0 and len(buffer.data()[0]) == 0
+
+
+def test_time_window():
+    buffer = TimeSeriesBuffer(capacity=100, time_delta=10.0)
+    assert len(buffer.data()[0]) == 0
+    for i in range(50):
+        buffer.append(2.0 * i, float(i))
+    times, values = buffer.data()
+    # The window includes the point exactly time_delta before the last one
+    assert np.array_equal(times, np.arange(88.0, 100.0, 2.0))
+    assert np.array_equal(values, np.arange(44.0, 50.0))
+
+
+def test_values_which_are_not_numbers_are_gaps():
+    buffer = TimeSeriesBuffer(capacity=6)
+    for i, value in enumerate([1, "2.5", None, "E-1", True, np.float32(4)]):
+        buffer.append(float(i), value)
+    assert np.array_equal(buffer.data()[1], [1.0, 2.5, np.nan, np.nan, 1.0, 4.0], equal_nan=True)
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+from inspect_vison import handlers
+from inspect_vison.managing import Monitor
+from inspect_vison.processing.tracking import GlobalShiftEstimator, TemplateTracker
+
+base_frame_path = "tests/test_pictures/base_frame.jpg"
+Shift = (7, -5)
+
+
+def shift_frame(frame, shift):
+    matrix = np.float32([[1, 0, shift[0]], [0, 1, shift[1]]])
+    return cv2.warpAffine(frame, matrix, frame.shape[1::-1], borderMode=cv2.BORDER_REFLECT)
+
+
+@pytest.mark.parametrize("coordinates", [(310, 360, 120, 80), (355, 440, 80, 80), (200, 800, 80, 80)])
+def test_template_tracker(coordinates):
+    base_frame = cv2.imread(base_frame_path)
+    x, y, width, height = coordinates
+    tracker = TemplateTracker(search_window=20)
+    template = tracker.prepare_template(base_frame[y: y + height, x: x + width])
+    result = tracker.search(shift_frame(base_frame, Shift), template, coordinates)
+    assert result.pixel_offset() == Shift
+    assert np.allclose(result.offset, Shift, atol=0.1)
+    assert result.score > 0.99
+
+
+@pytest.mark.parametrize("downscale, tolerance", [(1.0, 0.05), (0.5, 0.5), (0.25, 0.5)])
+def test_global_shift_estimator(downscale, tolerance):
+    base_frame = cv2.imread(base_frame_path)
+    estimator = GlobalShiftEstimator(base_frame, downscale=downscale)
+    result = estimator.estimate(shift_frame(base_frame, Shift))
+    assert np.allclose(result.offset, Shift, atol=tolerance)
+    assert np.allclose(estimator.estimate(base_frame).offset, (0, 0), atol=tolerance)
+
+
+def test_global_shift_fallback(monkeypatch):
+    base_frame = cv2.imread(base_frame_path)
+    fixed = handlers.Bulb((310, 360, 120, 80), base_frame, init_value=1, name="fixed", min_similarity=0.9)
+    x, y, width, height = 200, 800, 80, 80
+    moved = handlers.Bulb((x, y, width, height), base_frame, init_value=1, name="moved", min_similarity=0.9)
+    # The whole view is shifted, and the second object is moved further by (12, 9)
+    frame = shift_frame(base_frame, Shift)
+    x_moved, y_moved = x + Shift[0] + 12, y + Shift[1] + 9
+    frame[y_moved: y_moved + height, x_moved: x_moved + width] = base_frame[y: y + height, x: x + width]
+
+    monitor = Monitor(None, shift_downscale=1.0)
+    monitor.set_reference(base_frame, [fixed, moved])
+    refined = []
+    refine_coordinates = monitor._refine_coordinates
+    monkeypatch.setattr(monitor, "_refine_coordinates",
+                        lambda control_object, frame: (refined.append(control_object.name),
+                                                       refine_coordinates(control_object, frame)))
+    monitor.process_similarities(frame, [fixed, moved], update_pos=True, global_shift=True)
+    assert monitor.global_shift.pixel_offset() == Shift
+    # Only the object below min_similarity after the global shift is searched separately
+    assert refined == ["moved"]
+    assert fixed.current_coordinates == (317, 355, 120, 80)
+    assert moved.current_coordinates == (x_moved, y_moved, width, height)
+    assert moved.current_similarity > 0.99
+    assert monitor._residual_offsets == {"moved": (12, 9)}
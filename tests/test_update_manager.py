@@ -0,0 +1,109 @@
+import itertools
+import random
+from types import SimpleNamespace
+import time
+
+import numpy as np
+
+from inspect_vison import gui, managing
+from inspect_vison.managing import Monitor, UpdateManager, ValueSerializator
+from inspect_vison.processing.image_processing import FrameSource
+from inspect_vison.processing.overlay import OverlayRenderer
+
+
+class FakeGuiHandler:
+    def __init__(self, name_type):
+        self.name_type = name_type
+        self.updates = []
+        self.exited = False
+
+    def screen_size(self):
+        return 640, 480
+
+    def update(self, screen, update_data=None):
+        self.updates.append((screen, update_data))
+
+    def exit(self):
+        self.exited = True
+
+
+def test_display_fps_drops_frames_and_keeps_points(monkeypatch):
+    monkeypatch.setattr(gui, "GuiHandler", FakeGuiHandler, raising=False)
+    clock = [0.0]
+    monkeypatch.setattr(managing, "time", SimpleNamespace(time=time.time, perf_counter=lambda: clock[0]))
+    serializator = ValueSerializator([SimpleNamespace(name="level", gui_type=gui.WidgetType.Plot),
+                                      SimpleNamespace(name="digits", gui_type=gui.WidgetType.Display)])
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    with UpdateManager(serializator, None, show=True, telegram_api=None, update_pos=False, log_every=0,
+                       display_fps=10.0) as manager:
+        handler = manager.gui_handler
+        for i in range(25):
+            clock[0] = i * 0.01
+            due = manager.reserve_display()
+            # The loop draws the view only when the display is reserved
+            manager.update(frame if due else None, {"level": float(i), "digits": i})
+            assert due == (i % 10 == 0)
+        assert [screen is frame for screen, _ in handler.updates] == [True, True, True]
+    assert handler.exited
+    # The readings after the last frame are sent on exit
+    assert [screen for screen, _ in handler.updates[3:]] == [None]
+    points = [[value for _, value in update_data["1) level"]] for _, update_data in handler.updates]
+    assert points == [[0.0], list(range(1, 11)), list(range(11, 21)), list(range(21, 25))]
+    assert [update_data["2) digits"] for _, update_data in handler.updates] == [0, 10, 20, 24]
+
+
+def test_display_fps_none_shows_every_frame(monkeypatch):
+    monkeypatch.setattr(gui, "GuiHandler", FakeGuiHandler, raising=False)
+    serializator = ValueSerializator([SimpleNamespace(name="level", gui_type=gui.WidgetType.Plot)])
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    with UpdateManager(serializator, None, show=True, telegram_api=None, update_pos=False, log_every=0,
+                       display_fps=None) as manager:
+        for i in range(5):
+            assert manager.reserve_display()
+            manager.update(frame, {"level": float(i)})
+    assert [update_data["1) level"][0][1] for _, update_data in manager.gui_handler.updates] == list(range(5))
+
+
+class CountingSource(FrameSource):
+    """
+    The value of each frame is its number
+    """
+    def __init__(self, frames_number):
+        super().__init__(frame_dtype=np.uint8)
+        self.frames = iter(range(frames_number))
+
+    def _read(self):
+        number = next(self.frames, None)
+        if number is None:
+            return False, None
+        return True, np.full((4, 4, 3), number, dtype=np.uint8)
+
+    def check_open(self):
+        return True
+
+
+def test_pipeline_chooses_displayed_frames_in_order(monkeypatch):
+    created = []
+
+    class RecordedGuiHandler(FakeGuiHandler):
+        def __init__(self, name_type):
+            super().__init__(name_type)
+            created.append(self)
+
+    monkeypatch.setattr(gui, "GuiHandler", RecordedGuiHandler, raising=False)
+    # The clock ticks on every reading, and only the tracking thread reads it
+    ticks = itertools.count()
+    monkeypatch.setattr(managing, "time", SimpleNamespace(time=time.time, perf_counter=lambda: next(ticks)))
+    rendered = []
+
+    def render(self, frame, coordinates):
+        rendered.append(int(frame[0, 0, 0]))
+        time.sleep(random.uniform(0, 0.003))
+        return frame
+
+    monkeypatch.setattr(OverlayRenderer, "render", render)
+    monitor = Monitor(CountingSource(35), display_size=(4, 4))
+    monitor.run_loop([], show=True, display_fps=0.1, pipelined=True, render_workers=4)
+    screens = [int(screen[0, 0, 0]) for screen, _ in created[0].updates if screen is not None]
+    # The display is due 10 ticks after the reservation, and each reservation takes one more tick
+    assert sorted(rendered) == screens == [0, 10, 20, 30]
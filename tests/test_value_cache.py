@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+from inspect_vison import handlers
+from inspect_vison.handlers import ValueCache
+
+led_path = "tests/test_pictures/digit_numbers_led_3.jpg"
+
+
+def read_led():
+    return cv2.cvtColor(cv2.imread(led_path), cv2.COLOR_BGR2RGB)
+
+
+def add_noise(image, sigma, seed=0):
+    noise = np.random.default_rng(seed).normal(0, sigma, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def remove_segment(image):
+    # The middle segment of the last digit 2 is covered by the dark background
+    changed = image.copy()
+    changed[185:255, 715:865] = image[120:190, 760:910]
+    return changed
+
+
+def test_hits_and_misses():
+    cache = ValueCache()
+    image = read_led()
+    found, _ = cache.get(cache.make_key(image))
+    assert not found
+    cache.put(cache.make_key(image), "15.2")
+    for seed in range(3):
+        found, value = cache.get(cache.make_key(add_noise(image, 3, seed)))
+        assert found and value == "15.2"
+    assert cache.statistics() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 1}
+
+
+def test_one_segment_change_misses():
+    cache = ValueCache()
+    image = read_led()
+    cache.put(cache.make_key(image), "15.2")
+    found, _ = cache.get(cache.make_key(remove_segment(image)))
+    assert not found
+    assert cache.misses == 1
+
+
+def test_clear_on_coordinates_change():
+    frame = read_led()
+    bulb = handlers.Bulb(name="bulb", coordinates=(40, 100, 120, 120), init_value=1, frame=frame)
+    image = bulb.get_current_image(frame)
+    key, found, _ = bulb._lookup_value(image)
+    bulb._store_value(key, True)
+    assert bulb._lookup_value(image)[1]
+    assert len(bulb.value_cache) == 1
+    bulb.current_coordinates = (42, 100, 120, 120)
+    _, found, _ = bulb._lookup_value(bulb.get_current_image(frame))
+    assert not found and len(bulb.value_cache) == 0
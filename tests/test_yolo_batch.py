@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from inspect_vison.models.digits_detector import CLASS_NAMES, YOLOv8
+
+CandidatesNumber = 8
+
+
+def detector_output(sample):
+    """
+    Candidates of the stub detector depend on the content of the image, so mixed up images give other results
+    """
+    means = sample.mean(axis=(1, 2))
+    candidates = np.arange(CandidatesNumber)
+    output = np.zeros((4 + len(CLASS_NAMES), CandidatesNumber), dtype=np.float32)
+    output[0] = 4 + 7 * candidates + 4 * means[0]
+    output[1] = 16 + 4 * means[1]
+    output[2], output[3] = 6, 20
+    classes = (candidates + int(means[2] * 100)) % len(CLASS_NAMES)
+    output[4 + classes, candidates] = 0.1 + 0.8 * np.abs(np.sin(candidates + 10 * means.sum()))
+    return output
+
+
+def random_images(number, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, size=(rng.integers(40, 120), rng.integers(80, 200), 3), dtype=np.uint8)
+            for _ in range(number)]
+
+
+def check_detections(batch_detections, single_detections):
+    for (boxes, scores, class_ids), (single_boxes, single_scores, single_class_ids) in \
+            zip(batch_detections, single_detections, strict=True):
+        assert np.allclose(boxes, single_boxes, atol=1e-3)
+        assert np.allclose(scores, single_scores, atol=1e-6)
+        assert np.array_equal(class_ids, single_class_ids)
+
+
+@pytest.mark.parametrize("batch_size", ["batch", 2])
+def test_batch_matches_single_images(stub_session, batch_size):
+    session = stub_session("digits.onnx", detector_output, [batch_size, 3, 32, 64])
+    detector = YOLOv8("digits.onnx", conf_thres=0.2, iou_thres=0.3)
+    detector.initialize_model()
+    images = random_images(5)
+    # The reference is the stub output on each image prepared alone
+    single_detections = [detector.process_predictions(detector_output(detector.prepare_input(image)[0]).T,
+                                                      image.shape[1], image.shape[0]) for image in images]
+    assert sum(len(class_ids) for _, _, class_ids in single_detections) > len(images)
+    check_detections([detector(image) for image in images], single_detections)
+    session.batches.clear()
+
+    check_detections(detector.detect_objects_batch(images), single_detections)
+    # The chunks and the padding of fixed batch models are tested with run_in_chunks
+    assert len(session.batches) == (1 if batch_size == "batch" else 3)
+
+
+def test_prepare_batch(stub_session):
+    stub_session("digits.onnx", detector_output, ["batch", 3, 32, 64])
+    detector = YOLOv8("digits.onnx")
+    detector.initialize_model()
+    images = random_images(3, seed=1)
+    batch = detector.prepare_batch(images)
+    assert batch.shape == (3, 3, 32, 64) and batch.dtype == np.float32
+    for image, tensor in zip(images, batch):
+        assert np.allclose(tensor, detector.prepare_input(image)[0], atol=1e-6)
+    assert detector.infer_batch([]).shape == (0, 0, 4 + len(CLASS_NAMES))